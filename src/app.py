@@ -21,10 +21,14 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
+from typing import Any, Dict, List, Optional, Tuple
+
 from model.match import Match
 from nussschale.nussschale import Nussschale
 from nussschale.util.commands import Command
 from nussschale.util.heartbeat import Heartbeat
+from nussschale.util.metrics import Gauge
+from nussschale.util.workers import Affinity, WorkerSetup
 
 
 @Heartbeat
@@ -33,6 +37,56 @@ def housekeeping() -> None:
     Match.perform_housekeeping()
 
 
+@WorkerSetup
+def partition_matches(index: int, count: int) -> None:
+    """Lets every worker create matches with IDs of its own partition."""
+    Match.partition_ids(index, count)
+
+
+@Affinity
+def match_affinity(path: List[str], session: Dict[str, Any],
+                   params: Dict[str, str]) -> Optional[int]:
+    """Routes requests to the worker that owns the match of the player.
+
+    The worker owning a match is determined by the ID of the match, see
+    partition_matches. The match listing and its pages are merged from all
+    workers, see merge_list in the api pages.
+    """
+    if path == ["api", "list"]:
+        return Affinity.ALL
+    if path == ["api", "join"] and params.get("id", "").isdigit():
+        return int(params["id"])
+    return session.get("match", None)
+
+
+@Gauge("kgf_matches", "The live matches, by state.", ("state",))
+def count_matches() -> Dict[Tuple[str, ...], float]:
+    """Provides the number of matches in each state for the metrics."""
+    counts = {}  # type: Dict[Tuple[str, ...], float]
+    for match in Match.get_all():
+        state = (match.get_snapshot().state,)
+        counts[state] = counts.get(state, 0) + 1
+    return counts
+
+
+@Gauge("kgf_participants", "The participants of all matches, by role.",
+       ("role",))
+def count_participants() -> Dict[Tuple[str, ...], float]:
+    """Provides the number of players and spectators for the metrics."""
+    counts = {("player",): 0.0,
+              ("spectator",): 0.0}  # type: Dict[Tuple[str, ...], float]
+    for match in Match.get_all():
+        for part in match.get_snapshot().participants:
+            counts[("spectator",) if part.spectator else ("player",)] += 1
+    return counts
+
+
+@Gauge("kgf_chat_messages", "The chat messages of all matches.")
+def count_chat_messages() -> Dict[Tuple[str, ...], float]:
+    """Provides the total size of the match chats for the metrics."""
+    return {(): sum(match.get_chat_size() for match in Match.get_all())}
+
+
 @Command("freeze", "Freezes all match timers.")
 def freeze() -> None:
     """Freezes all matches."""
@@ -67,5 +121,7 @@ if __name__ == "__main__":
         (OptionsLeaf, "options")
     ])
 
+    ns.set_owned_leafs(["api", "match"])
+
     ns.start_server()
     ns.run()
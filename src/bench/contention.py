@@ -0,0 +1,132 @@
+"""Part of KgF.
+
+MIT License
+Copyright (c) 2017-2018 LordKorea
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+Lock contention benchmark for many clients polling the same match.
+
+Usage (from the source folder):
+    python3 -m bench.contention [pollers] [seconds]
+"""
+
+import sys
+from threading import Barrier, Event, Thread
+from time import perf_counter, sleep
+from typing import List
+
+from bench.memory import create_deck_source
+from model.match import Match
+from model.participant import Participant
+
+
+# The number of participants in the benchmarked match
+_PARTICIPANTS = 8
+
+
+def _poll(match: Match, pid: str, start: Barrier, stop: Event,
+          latencies: List[float]) -> None:
+    """Polls the match like a client does, until stopped.
+
+    One iteration corresponds to the accessors used by one round of
+    /api/status, /api/participants and /api/chat requests.
+
+    Args:
+        match: The match that is polled.
+        pid: The ID of the polling participant.
+        start: Waited on before polling starts.
+        stop: Stops polling when set.
+        latencies: Receives the duration of every iteration, in seconds.
+    """
+    offset = 0
+    start.wait()
+    while not stop.is_set():
+        begin = perf_counter()
+        match.has_participant(pid)
+        part = match.get_participant(pid)
+        match.user_can_skip_phase(part)
+        match.get_status()
+        match.count_gaps()
+        match.get_num_participants()
+        for other in match.get_participants():
+            other.score
+        for msg in match.retrieve_chat(offset):
+            offset = msg["id"] + 1
+        latencies.append(perf_counter() - begin)
+
+
+def _mutate(match: Match, start: Barrier, stop: Event) -> None:
+    """Mutates the match while the pollers are running.
+
+    Args:
+        match: The match that is mutated.
+        start: Waited on before mutating starts.
+        stop: Stops mutating when set.
+    """
+    start.wait()
+    while not stop.is_set():
+        match.check_participants()
+        match.check_timer()
+        match.send_message("NICK0", "message")
+        sleep(0.001)
+
+
+def run(pollers: int, seconds: float) -> None:
+    """Runs the benchmark and prints the results.
+
+    Args:
+        pollers: The number of polling threads.
+        seconds: The duration of the benchmark.
+    """
+    match = Match()
+    success, msg = match.create_deck(create_deck_source(300))
+    assert success, msg
+    for i in range(_PARTICIPANTS):
+        match.add_participant(Participant("ID%i" % i, "NICK%i" % i))
+    with match._lock:
+        match._set_state("CHOOSING")
+
+    # All threads are started before any of them touches the match, as
+    # starting threads is slow while the others are busy
+    start = Barrier(pollers + 2)
+    stop = Event()
+    latencies = [[] for _ in range(pollers)]  # type: List[List[float]]
+    threads = [Thread(target=_poll, args=(match, "ID%i" % (i % _PARTICIPANTS),
+                                          start, stop, latencies[i]))
+               for i in range(pollers)]
+    threads.append(Thread(target=_mutate, args=(match, start, stop)))
+    for thread in threads:
+        thread.start()
+    start.wait()
+    sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    merged = sorted(x for ls in latencies for x in ls)
+    print("Pollers:          %i" % pollers)
+    print("Poll rounds:      %.0f per second" % (len(merged) / seconds))
+    print("Latency p50:      %.3f ms" % (merged[len(merged) // 2] * 1000))
+    p99 = merged[len(merged) * 99 // 100]
+    print("Latency p99:      %.3f ms" % (p99 * 1000))
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 24,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 5)
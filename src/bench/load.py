@@ -0,0 +1,500 @@
+"""Part of KgF.
+
+MIT License
+Copyright (c) 2017-2018 LordKorea
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+Load test simulating full matches against a running local server.
+
+Synthetic users log in, form matches of a fixed size and play them like the
+browser client does: they poll the status, the events and the chat, reload
+the cards and participants on events, and choose cards and pick winners
+after a random think time. The host of each match skips the waiting phases
+and creates a new match once a match has ended. The random choices are
+seeded, so a run is reproducible for the same server configuration.
+
+Usage (from the source folder, with the server running):
+    python3 -m bench.load [--url URL] [--users N] [--seconds S] [--pid PID]
+"""
+
+import ssl
+from argparse import ArgumentParser
+from http.client import HTTPConnection, HTTPSConnection, HTTPException
+from http.cookies import SimpleCookie
+from json import loads
+from os import listdir
+from random import Random
+from threading import Condition, Event, Thread
+from time import perf_counter, sleep
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+from uuid import uuid4
+
+from bench.memory import create_deck_source
+
+
+# The number of users playing in one match
+_PLAYERS = 5
+
+# The number of cards in the uploaded decks
+_DECK_SIZE = 300
+
+# The think time of the users before acting, in seconds
+_THINK_MIN = 1.0
+_THINK_MAX = 4.0
+
+# The polling intervals of the browser client, in seconds
+_STATUS_INTERVAL = 1.0
+_EVENTS_INTERVAL = 0.5
+_CHAT_INTERVAL = 0.5
+
+# The events after which the client reloads its cards or participants
+_CARD_EVENTS = {"state", "join", "leave", "choose", "pick"}
+_PARTICIPANT_EVENTS = {"join", "leave", "picker", "score"}
+
+# A recorded request: endpoint, start time, latency in seconds, status code
+_Sample = Tuple[str, float, float, int]
+
+
+class _Client:
+    """A synthetic user talking to the server over a keep-alive connection.
+
+    Attributes:
+        samples: The requests made by this user.
+        errors: The number of failed requests.
+    """
+
+    def __init__(self, url: str, start: float) -> None:
+        """Constructor.
+
+        Args:
+            url: The base URL of the server.
+            start: The start time of the load test.
+        """
+        parts = urlsplit(url)
+        self._https = parts.scheme == "https"
+        self._netloc = parts.netloc
+        self._start = start
+        self._cookies = {}  # type: Dict[str, str]
+        self._connection = None  # type: Optional[HTTPConnection]
+        self.samples = []  # type: List[_Sample]
+        self.errors = 0
+
+    def request(self, method: str, path: str, body: bytes=b"",
+                content_type: str="application/x-www-form-urlencoded"
+                ) -> Tuple[int, Dict[str, str], bytes]:
+        """Makes a request and records its latency.
+
+        Args:
+            method: The HTTP method.
+            path: The path of the request.
+            body: The request body.
+            content_type: The content type of the request body.
+
+        Returns:
+            The status code, the lowercase response headers and the response
+            body. The status code is 0 when the request failed.
+        """
+        headers = {"Content-Type": content_type}
+        if self._cookies:
+            headers["Cookie"] = "; ".join("%s=%s" % item
+                                          for item in self._cookies.items())
+        begin = perf_counter()
+        try:
+            if self._connection is None:
+                self._connection = self._connect()
+            self._connection.request(method, path, body or None, headers)
+            response = self._connection.getresponse()
+            data = response.read()
+        except (OSError, HTTPException):
+            self.errors += 1
+            self.close()
+            self.samples.append((path, begin - self._start,
+                                 perf_counter() - begin, 0))
+            return 0, {}, b""
+        self.samples.append((path, begin - self._start,
+                             perf_counter() - begin, response.status))
+        if response.status >= 500:
+            self.errors += 1
+        for value in response.msg.get_all("set-cookie") or ():
+            for name, morsel in SimpleCookie(value).items():
+                self._cookies[name] = morsel.value
+        if response.will_close:
+            self.close()
+        return (response.status,
+                {k.lower(): v for k, v in response.getheaders()}, data)
+
+    def get_json(self, path: str) -> Any:
+        """Makes a GET request for a JSON resource.
+
+        Args:
+            path: The path of the request.
+
+        Returns:
+            The decoded response, or None if the request failed.
+        """
+        status, _, data = self.request("GET", path)
+        return loads(data.decode()) if status == 200 else None
+
+    def post_json(self, path: str, params: Dict[str, Any]) -> Any:
+        """Makes a POST request with form parameters for a JSON resource.
+
+        Args:
+            path: The path of the request.
+            params: The form parameters.
+
+        Returns:
+            The decoded response, or None if the request failed.
+        """
+        status, _, data = self.request("POST", path,
+                                       urlencode(params).encode())
+        return loads(data.decode()) if status == 200 else None
+
+    def close(self) -> None:
+        """Closes the connection to the server."""
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _connect(self) -> HTTPConnection:
+        """Opens a connection to the server.
+
+        Returns:
+            The connection. Certificates are not verified, as local instances
+            usually use self-signed ones.
+        """
+        if self._https:
+            context = ssl.create_default_context()
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+            return HTTPSConnection(self._netloc, timeout=30, context=context)
+        return HTTPConnection(self._netloc, timeout=30)
+
+
+class _Table:
+    """Announces the matches of a group of users to the joining users."""
+
+    def __init__(self) -> None:
+        """Constructor."""
+        self._condition = Condition()
+        self._matches = []  # type: List[int]
+
+    def publish(self, id: int) -> None:
+        """Announces the next match of the group.
+
+        Args:
+            id: The ID of the match.
+        """
+        with self._condition:
+            self._matches.append(id)
+            self._condition.notify_all()
+
+    def wait(self, n: int, stop: Event) -> Optional[int]:
+        """Waits for a match of the group to be announced.
+
+        Args:
+            n: The index of the match.
+            stop: Stops waiting when set.
+
+        Returns:
+            The ID of the match, or None if the load test was stopped.
+        """
+        with self._condition:
+            while len(self._matches) <= n:
+                if stop.is_set():
+                    return None
+                self._condition.wait(0.5)
+            return self._matches[n]
+
+
+def _login(client: _Client, password: str) -> None:
+    """Logs a user in, which also works if no login is required.
+
+    Args:
+        client: The user.
+        password: The site password.
+    """
+    client.request("POST", "/index", urlencode({"pw": password}).encode())
+
+
+def _create_match(client: _Client, deck: bytes) -> Optional[int]:
+    """Creates a match by uploading a deck.
+
+    Args:
+        client: The user creating the match.
+        deck: The deck source.
+
+    Returns:
+        The ID of the created match, or None if the creation failed.
+    """
+    boundary = uuid4().hex
+    body = b"".join((
+        b"--%s\r\n" % boundary.encode(),
+        b"Content-Disposition: form-data; name=\"deckupload\"; "
+        b"filename=\"deck.tsv\"\r\n",
+        b"Content-Type: text/tab-separated-values\r\n\r\n",
+        deck,
+        b"\r\n--%s--\r\n" % boundary.encode()))
+    status, headers, _ = client.request(
+        "POST", "/match/create", body,
+        "multipart/form-data; boundary=%s" % boundary)
+    if status != 303 or not headers.get("location", "").endswith("/match"):
+        return None
+
+    # The status names the match the creator was put into
+    status = client.get_json("/api/status")
+    if status is None:
+        return None
+    return status["id"]
+
+
+def _play(client: _Client, rng: Random, host: bool, stop: Event) -> None:
+    """Plays a match like the browser client, until the match ends.
+
+    Args:
+        client: The user.
+        rng: The random generator of the user.
+        host: Whether the user owns the match and skips waiting phases.
+        stop: Stops playing when set.
+    """
+    now = perf_counter()
+    next_status = next_events = next_chat = now
+    act_at = None  # type: Optional[float]
+    acted = False
+    status = {}  # type: Dict[str, Any]
+    sequence = None  # type: Optional[int]
+    offset = 0
+    while not stop.is_set():
+        now = perf_counter()
+        if now >= next_status:
+            next_status = now + _STATUS_INTERVAL
+            status = client.get_json("/api/status")
+            if status is None or status["ending"]:
+                return
+            can_act = (status["allowChoose"] or status["allowPick"]
+                       or (host and status["allowSkip"]))
+            if not can_act:
+                act_at, acted = None, False
+            elif act_at is None and not acted:
+                act_at = now + rng.uniform(_THINK_MIN, _THINK_MAX)
+        if now >= next_events:
+            next_events = now + _EVENTS_INTERVAL
+            params = {} if sequence is None else {"since": sequence}
+            events = client.post_json("/api/events", params)
+            if events is not None:
+                sequence = events["seq"]
+                types = {event["event"] for event in events["events"]}
+                if events["reset"] or types & _CARD_EVENTS:
+                    client.get_json("/api/cards")
+                if events["reset"] or types & _PARTICIPANT_EVENTS:
+                    client.get_json("/api/participants")
+        if now >= next_chat:
+            next_chat = now + _CHAT_INTERVAL
+            messages = client.post_json("/api/chat", {"offset": offset})
+            if messages:
+                offset = messages[-1]["id"] + 1
+        if act_at is not None and now >= act_at:
+            _act(client, rng, status)
+            act_at, acted = None, True
+        sleep(max(0.0, min(next_status, next_events, next_chat,
+                           act_at or next_status) - perf_counter()))
+
+
+def _act(client: _Client, rng: Random, status: Dict[str, Any]) -> None:
+    """Chooses cards, picks a winner or skips the phase, as allowed.
+
+    Args:
+        client: The user.
+        rng: The random generator of the user.
+        status: The last status of the match.
+    """
+    if status["allowChoose"] or status["allowPick"]:
+        cards = client.get_json("/api/cards")
+        if cards is None:
+            return
+        if status["allowChoose"]:
+            hand = [id for type in ("OBJECT", "VERB")
+                    for id in sorted(cards["hand"][type], key=int)]
+            for id in rng.sample(hand, min(status["gaps"], len(hand))):
+                client.post_json("/api/choose", {"handId": id})
+        else:
+            played = [i for i, choices in enumerate(cards["played"])
+                      if choices]
+            if played:
+                client.post_json("/api/pick",
+                                 {"playedId": rng.choice(played)})
+    elif status["allowSkip"]:
+        client.get_json("/api/skip")
+
+
+def _user(client: _Client, table: _Table, host: bool, seed: int,
+          password: str, stop: Event) -> None:
+    """Runs a synthetic user until the load test is stopped.
+
+    Args:
+        client: The user.
+        table: The table announcing the matches of the user's group.
+        host: Whether the user creates the matches of the group.
+        seed: The seed of the user's random generator.
+        password: The site password.
+        stop: Stops the user when set.
+    """
+    rng = Random(seed)
+    deck = create_deck_source(_DECK_SIZE, seed).encode()
+    _login(client, password)
+    n = 0
+    while not stop.is_set():
+        if host:
+            id = _create_match(client, deck)
+            if id is None:
+                stop.wait(1)
+                continue
+            table.publish(id)
+        else:
+            id = table.wait(n, stop)
+            if id is None:
+                return
+            client.post_json("/api/join", {"id": id, "spectator": "false"})
+        n += 1
+        _play(client, rng, host, stop)
+
+        # Wait until the ended match has been removed
+        while (not stop.wait(_STATUS_INTERVAL)
+               and client.get_json("/api/status") is not None):
+            pass
+    client.close()
+
+
+def _get_rss(pid: int) -> int:
+    """Retrieves the resident set size of a process and its children.
+
+    Args:
+        pid: The ID of the process.
+
+    Returns:
+        The resident set size in bytes, 0 if the process does not exist.
+    """
+    try:
+        with open("/proc/%i/status" % pid) as f:
+            rss = next((int(line.split()[1]) * 1024 for line in f
+                        if line.startswith("VmRSS:")), 0)
+        for task in listdir("/proc/%i/task" % pid):
+            with open("/proc/%i/task/%s/children" % (pid, task)) as f:
+                rss += sum(_get_rss(int(child)) for child in f.read().split())
+    except (OSError, ValueError):
+        return 0
+    return rss
+
+
+def _percentile(values: List[float], p: int) -> float:
+    """Retrieves a percentile of sorted values.
+
+    Args:
+        values: The sorted values.
+        p: The percentile.
+
+    Returns:
+        The percentile.
+    """
+    return values[min(len(values) - 1, len(values) * p // 100)]
+
+
+def run(url: str, users: int, seconds: float, password: str,
+        pid: Optional[int], seed: int) -> None:
+    """Runs the load test and prints the results.
+
+    Args:
+        url: The base URL of the server.
+        users: The number of synthetic users.
+        seconds: The duration of the load test.
+        password: The site password.
+        pid: The ID of the server process whose memory is sampled, if any.
+        seed: The seed for the random choices of the users.
+    """
+    start = perf_counter()
+    stop = Event()
+    clients = [_Client(url, start) for _ in range(users)]
+    threads = []  # type: List[Thread]
+    for i, client in enumerate(clients):
+        if i % _PLAYERS == 0:
+            table = _Table()
+        threads.append(Thread(target=_user, daemon=True, args=(
+            client, table, i % _PLAYERS == 0, seed + i, password, stop)))
+    for thread in threads:
+        thread.start()
+
+    rss = []  # type: List[Tuple[float, int]]
+    while perf_counter() - start < seconds:
+        if pid is not None:
+            rss.append((perf_counter() - start, _get_rss(pid)))
+        sleep(1)
+    stop.set()
+    for thread in threads:
+        thread.join(30)
+
+    samples = [sample for client in clients for sample in client.samples]
+    by_endpoint = {}  # type: Dict[str, List[float]]
+    for endpoint, _, latency, _ in samples:
+        by_endpoint.setdefault(endpoint, []).append(latency)
+    print("Users:            %i in matches of %i" % (users, _PLAYERS))
+    print("Requests:         %i (%.1f per second)"
+          % (len(samples), len(samples) / seconds))
+    print("Errors:           %i" % sum(client.errors for client in clients))
+    print()
+    print("%-20s %10s %10s %10s" % ("Endpoint", "Requests", "p50 (ms)",
+                                    "p99 (ms)"))
+    for endpoint, latencies in sorted(by_endpoint.items()):
+        latencies.sort()
+        print("%-20s %10i %10.2f %10.2f" % (
+            endpoint, len(latencies), _percentile(latencies, 50) * 1000,
+            _percentile(latencies, 99) * 1000))
+    if rss:
+        print()
+        print("%-10s %12s %14s" % ("Time (s)", "RSS (MiB)", "Requests/s"))
+        step = max(1, len(rss) // 20)
+        for t, size in rss[::step]:
+            window = sum(1 for _, begin, _, _ in samples
+                         if t - step <= begin < t)
+            print("%-10.0f %12.1f %14.1f" % (t, size / 1024 / 1024,
+                                             window / step))
+
+
+def main() -> None:
+    """Parses the command line and runs the load test."""
+    parser = ArgumentParser(description="Simulates full matches against a "
+                                        "running server.")
+    parser.add_argument("--url", default="http://127.0.0.1:8091",
+                        help="the base URL of the server")
+    parser.add_argument("--users", type=int, default=50,
+                        help="the number of synthetic users")
+    parser.add_argument("--seconds", type=float, default=60,
+                        help="the duration of the load test")
+    parser.add_argument("--password", default="loremipsum",
+                        help="the site password (site-pw)")
+    parser.add_argument("--pid", type=int, default=None,
+                        help="the server process to sample the RSS of")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="the seed for the random choices")
+    args = parser.parse_args()
+    run(args.url, args.users, args.seconds, args.password, args.pid,
+        args.seed)
+
+
+if __name__ == "__main__":
+    main()
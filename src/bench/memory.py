@@ -0,0 +1,123 @@
+"""Part of KgF.
+
+MIT License
+Copyright (c) 2017-2018 LordKorea
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+Memory benchmark for a single match using a maximum-size deck.
+
+Usage (from the source folder):
+    python3 -m bench.memory
+"""
+
+import tracemalloc
+from random import Random
+from typing import List, Tuple
+
+from model.match import Match
+from model.participant import Participant
+
+
+# The number of (non-spectating) participants in the benchmarked match
+_PARTICIPANTS = 10
+
+# Words used to build card texts of a realistic length
+_WORDS = ("a", "the", "cat", "meme", "server", "deck", "player", "round",
+          "winner", "card", "nothing", "everything", "tomorrow", "pizza")
+
+
+def create_deck_source(n: int, seed: int=0) -> str:
+    """Creates a deck source in the TSV deck format.
+
+    The cards are evenly distributed between all card types. Roughly every
+    tenth card is a duplicate of an earlier card, as it is the case for most
+    real-world decks that are merged from several sources.
+
+    Args:
+        n: The number of cards in the deck.
+        seed: The seed for the random generator.
+
+    Returns:
+        The deck source.
+    """
+    rng = Random(seed)
+    types = ("STATEMENT", "OBJECT", "VERB")
+    lines = []  # type: List[str]
+    for i in range(n):
+        type = types[i % len(types)]
+        if lines and rng.random() < 0.1:
+            lines.append(lines[rng.randrange(len(lines))])
+            continue
+        text = " ".join(rng.choice(_WORDS) for _ in range(rng.randint(3, 8)))
+        if type == "STATEMENT":
+            text += " _."
+        lines.append("%s %i\t%s" % (text, i, type))
+    return "\n".join(lines)
+
+
+def measure_match(source: str, participants: int) -> Tuple[int, int]:
+    """Measures the memory used by a match.
+
+    The match is created from the given deck source and the given number of
+    participants is added. Then the first round is started, which fills the
+    hands of all participants.
+
+    Args:
+        source: The deck source.
+        participants: The number of participants.
+
+    Returns:
+        The number of bytes retained by the match and the peak number of
+        bytes allocated while setting up the match.
+    """
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+
+    match = Match()
+    success, msg = match.create_deck(source)
+    assert success, msg
+    for i in range(participants):
+        match.add_participant(Participant("ID%i" % i, "NICK%i" % i))
+    with match._lock:
+        match._set_state("CHOOSING")
+
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # Only count allocations that are still alive, i.e. owned by the match
+    stats = after.compare_to(before, "filename")
+    retained = sum(stat.size_diff for stat in stats)
+    return retained, peak
+
+
+def main() -> None:
+    """Runs the benchmark and prints the results."""
+    n = Match._MAXIMUM_CARDS_IN_DECK
+    source = create_deck_source(n)
+    retained, peak = measure_match(source, _PARTICIPANTS)
+    print("Deck size:        %i cards" % n)
+    print("Participants:     %i" % _PARTICIPANTS)
+    print("Match footprint:  %.1f KiB (%.1f bytes per card)"
+          % (retained / 1024, retained / n))
+    print("Peak allocation:  %.1f KiB" % (peak / 1024))
+
+
+if __name__ == "__main__":
+    main()
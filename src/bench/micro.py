@@ -0,0 +1,391 @@
+"""Part of KgF.
+
+MIT License
+Copyright (c) 2017-2018 LordKorea
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+Micro-benchmarks for the hot paths of the model and the framework.
+
+Every benchmark is timed in several rounds of automatically calibrated
+length and the fastest round counts. The results can be saved as a JSON
+baseline, later runs are checked against it to catch regressions. Baselines
+are only comparable on the machine they were saved on, so they are not
+committed: make bench saves ./bench/baseline.json on its first run and checks
+against it on later runs.
+
+Usage (from the source folder):
+    python3 -m bench.micro [-k FILTER] [--save] [--check] [--baseline PATH]
+"""
+
+import gc
+import json
+import sys
+from argparse import ArgumentParser
+from os.path import exists, join
+from tempfile import mkdtemp
+from threading import Barrier, Thread
+from time import perf_counter
+from typing import Any, Callable, Dict, List
+
+from bench.memory import create_deck_source
+from model.match import Card, Match
+from model.multideck import MultiDeck
+from model.participant import Participant
+from nussschale.config import Config
+from nussschale.handler import ServerHandler
+from nussschale.nussschale import Nussschale
+from nussschale.session import Session, SessionData
+from nussschale.util.lcdict import LowerCaseDict
+from nussschale.util.template import Parser
+
+
+# A benchmarked operation
+_Operation = Callable[[], Any]
+
+# The minimum duration of a round, in seconds
+_ROUND_TIME = 0.2
+
+# The number of rounds of every benchmark
+_ROUNDS = 5
+
+# The default slowdown which is reported as a regression
+_TOLERANCE = 0.2
+
+# The number of threads contending for the session pool and the number of
+# sessions fetched by each of them
+_SESSION_THREADS = 8
+_SESSION_FETCHES = 1000
+
+
+class Benchmark:
+    """A benchmark decorator.
+
+    The decorated function sets up the benchmark and returns the operation
+    that is timed.
+
+    Attributes:
+        name: The name of the benchmark.
+        operations: The number of operations performed by one call of the
+            timed function.
+
+    Class Attributes:
+        benchmarks: The registered benchmarks, in registration order.
+    """
+
+    # The registered benchmarks
+    benchmarks = []  # type: List[Benchmark]
+
+    def __init__(self, name: str, operations: int=1) -> None:
+        """Constructor.
+
+        Args:
+            name: The name of the benchmark.
+            operations: The number of operations performed by one call of
+                the timed function.
+        """
+        self.name = name
+        self.operations = operations
+        self._setup = None  # type: Callable[[], _Operation]
+
+    def __call__(self, setup: Callable[[], _Operation]
+                 ) -> Callable[[], _Operation]:
+        """Decorates the setup function of the benchmark.
+
+        Args:
+            setup: The function that sets up the benchmark.
+        """
+        self._setup = setup
+        Benchmark.benchmarks.append(self)
+        return setup
+
+    def run(self) -> float:
+        """Runs the benchmark.
+
+        Returns:
+            The duration of one operation in the fastest round, in seconds.
+        """
+        operation = self._setup()
+
+        # Like timeit, the garbage collector does not interrupt the rounds
+        gc.collect()
+        gc.disable()
+        try:
+            return self._time(operation)
+        finally:
+            gc.enable()
+
+    def _time(self, operation: _Operation) -> float:
+        """Times an operation.
+
+        Args:
+            operation: The operation.
+
+        Returns:
+            The duration of one operation in the fastest round, in seconds.
+        """
+        # Calibrate the number of calls per round
+        loops = 1
+        while True:
+            start = perf_counter()
+            for _ in range(loops):
+                operation()
+            duration = perf_counter() - start
+            if duration >= _ROUND_TIME:
+                break
+            loops *= 2 if duration == 0 else max(2, min(
+                10, int(_ROUND_TIME / duration) + 1))
+
+        best = duration
+        for _ in range(_ROUNDS - 1):
+            start = perf_counter()
+            for _ in range(loops):
+                operation()
+            best = min(best, perf_counter() - start)
+        return best / loops / self.operations
+
+
+def _setup_environment() -> None:
+    """Sets up a throwaway configuration, as used by sessions and pages."""
+    Config._CONFIG_FILE = join(mkdtemp(), "nussschale.json")
+    Nussschale.nconfig = Config()
+
+
+def _create_cards(type: str, n: int) -> List[Card]:
+    """Creates cards of a single type.
+
+    Args:
+        type: The type of the cards.
+        n: The number of cards.
+
+    Returns:
+        The cards.
+    """
+    return [Card(i, type, "%s %i" % (type, i)) for i in range(n)]
+
+
+def _create_match(participants: int) -> Match:
+    """Creates a match in the choosing phase.
+
+    Args:
+        participants: The number of participants.
+
+    Returns:
+        The match.
+    """
+    match = Match()
+    success, msg = match.create_deck(create_deck_source(300))
+    assert success, msg
+    for i in range(participants):
+        match.add_participant(Participant("ID%i" % i, "NICK%i" % i))
+    with match._lock:
+        match._set_state("CHOOSING")
+    return match
+
+
+@Benchmark("match.create_deck")
+def bench_create_deck() -> _Operation:
+    """Creates the deck of a match from a maximum-size deck source."""
+    source = create_deck_source(Match._MAXIMUM_CARDS_IN_DECK)
+    return lambda: Match().create_deck(source)
+
+
+@Benchmark("multideck.request")
+def bench_multideck_request() -> _Operation:
+    """Draws a card while avoiding the cards of a full hand."""
+    deck = MultiDeck(_create_cards("OBJECT", 300))  # type: MultiDeck
+    banned = set(range(0, 300, 50))
+    return lambda: deck.request(banned)
+
+
+@Benchmark("participant.replenish_hand")
+def bench_replenish_hand() -> _Operation:
+    """Replenishes an empty hand and empties it again."""
+    decks = {type: MultiDeck(_create_cards(type, 300))
+             for type in ("OBJECT", "VERB")}  # type: Dict[str, MultiDeck]
+    part = Participant("ID", "NICK")
+
+    def operation() -> None:
+        part.replenish_hand(decks)
+        for hid, _, _ in part.get_hand():
+            part.toggle_chosen(hid, 100)
+        part.delete_chosen()
+    return operation
+
+
+@Benchmark("participant.get_hand")
+def bench_get_hand() -> _Operation:
+    """Retrieves the hand of a participant after a change."""
+    part = Participant("ID", "NICK")
+    part.add_hand_cards(_create_cards("OBJECT", 6))
+    hid = part.get_hand()[0][0]
+
+    def operation() -> None:
+        part.toggle_chosen(hid, 1)
+        part.get_hand()
+    return operation
+
+
+@Benchmark("participant.get_choose_data")
+def bench_get_choose_data() -> _Operation:
+    """Retrieves the choices of a participant, as shown to the others."""
+    part = Participant("ID", "NICK")
+    part.add_hand_cards(_create_cards("OBJECT", 6))
+    for hid, _, _ in part.get_hand()[:3]:
+        part.toggle_chosen(hid, 3)
+    return lambda: part.get_choose_data(False)
+
+
+@Benchmark("parser.parse_template")
+def bench_parse_template() -> _Operation:
+    """Renders all templates of the application."""
+    templates = []  # type: List[str]
+    for name in ("dashboard", "deckedit", "match", "start"):
+        with open("./res/tpl/%s.html" % name) as f:
+            templates.append(f.read())
+    symtab = {"theme": "light", "nickname": "Meme12345", "showLogout": ""}
+
+    def operation() -> None:
+        for raw in templates:
+            Parser.parse_template(raw, symtab)
+    return operation
+
+
+@Benchmark("session.get_session_contended", _SESSION_FETCHES)
+def bench_get_session() -> _Operation:
+    """Fetches existing sessions from several threads at once.
+
+    The duration is that of all threads fetching one session each.
+    """
+    sessions = [Session("127.0.0.1") for _ in range(_SESSION_THREADS)]
+
+    def fetch(sid: str, start: Barrier) -> None:
+        start.wait()
+        for _ in range(_SESSION_FETCHES):
+            Session.get_session("127.0.0.1", sid)
+
+    def operation() -> None:
+        start = Barrier(_SESSION_THREADS)
+        threads = [Thread(target=fetch, args=(session.sid, start))
+                   for session in sessions]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return operation
+
+
+@Benchmark("handler.get_path")
+def bench_get_path() -> _Operation:
+    """Parses the path of a request."""
+    handler = ServerHandler.__new__(ServerHandler)
+    handler.path = "/api/chat/send?offset=12"
+    return handler._get_path
+
+
+@Benchmark("handler.parse_type")
+def bench_parse_type() -> _Operation:
+    """Parses a content type with parameters."""
+    value = "multipart/form-data; boundary=\"----abcdef\"; charset=utf-8"
+    return lambda: ServerHandler._parse_type(value)
+
+
+@Benchmark("master.call_endpoint")
+def bench_call_endpoint() -> _Operation:
+    """Dispatches a status request of a participant to its endpoint."""
+    from nussschale.leafs.master import MasterController
+    from pages.api import APILeaf
+    from pages.dashboard import DashboardLeaf
+    from pages.index import IndexLeaf
+    from pages.match import MatchLeaf
+
+    master = MasterController()
+    for ctrl, leaf in ((APILeaf, "api"), (DashboardLeaf, "dashboard"),
+                       (IndexLeaf, "index"), (MatchLeaf, "match")):
+        master.add_leaf(leaf, ctrl)
+    match = _create_match(5)
+    match.put_in_pool()
+    session = SessionData({"login": True, "id": "ID0", "nickname": "NICK0",
+                           "theme": "light", "match": match.id})
+    headers = LowerCaseDict()  # type: LowerCaseDict[str]
+
+    def operation() -> None:
+        params = {}  # type: Dict[str, Any]
+        MasterController.decorate_params("api", params)
+        status, _, _ = master.call_endpoint(session, ["status"], params,
+                                            headers)
+        assert status == 200
+    return operation
+
+
+def main() -> None:
+    """Runs the benchmarks and saves or checks the baseline."""
+    parser = ArgumentParser(description="Runs the micro-benchmarks.")
+    parser.add_argument("-k", dest="filter", default="",
+                        help="only run benchmarks containing this text")
+    parser.add_argument("--baseline", default="./bench/baseline.json",
+                        help="the path of the JSON baseline")
+    parser.add_argument("--save", action="store_true",
+                        help="save the results as the baseline")
+    parser.add_argument("--check", action="store_true",
+                        help="fail if a benchmark regressed")
+    parser.add_argument("--tolerance", type=float, default=_TOLERANCE,
+                        help="the slowdown that counts as a regression")
+    args = parser.parse_args()
+
+    baseline = {}  # type: Dict[str, float]
+    if exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    elif args.check:
+        print("No baseline at %s, run with --save first." % args.baseline)
+        sys.exit(2)
+
+    _setup_environment()
+    results = {}  # type: Dict[str, float]
+    regressions = []  # type: List[str]
+    print("%-32s %14s %14s %9s" % ("Benchmark", "Time (us)",
+                                   "Baseline (us)", "Change"))
+    for benchmark in Benchmark.benchmarks:
+        if args.filter not in benchmark.name:
+            continue
+        duration = benchmark.run()
+        results[benchmark.name] = duration
+        if benchmark.name not in baseline:
+            print("%-32s %14.3f %14s %9s" % (benchmark.name, duration * 1e6,
+                                             "-", "-"))
+            continue
+        change = duration / baseline[benchmark.name] - 1
+        if change > args.tolerance:
+            regressions.append(benchmark.name)
+        print("%-32s %14.3f %14.3f %+8.1f%%%s" % (
+            benchmark.name, duration * 1e6, baseline[benchmark.name] * 1e6,
+            change * 100, " !" if change > args.tolerance else ""))
+
+    if args.save:
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=4, sort_keys=True)
+        print("Saved the baseline to %s." % args.baseline)
+    if args.check and regressions:
+        print("Regressions: %s" % ", ".join(regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
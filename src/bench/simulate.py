@@ -0,0 +1,193 @@
+"""Part of KgF.
+
+MIT License
+Copyright (c) 2017-2018 LordKorea
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+Headless simulation of many matches on a virtual clock.
+
+Bots play the matches directly on the model. The owner of every match
+skips each phase as soon as the bots have acted, and the virtual clock
+advances by one second per tick, so the matches cycle through their states
+as fast as the CPU allows. Ended matches are replaced by new ones. The
+simulation reports the state transitions per second and the memory used
+per match, for capacity planning.
+
+Usage (from the source folder):
+    python3 -m bench.simulate [--matches N] [--players N] [--seconds S]
+"""
+
+import random
+import resource
+import tracemalloc
+from argparse import ArgumentParser
+from random import Random
+from time import perf_counter, time
+from typing import Dict, List
+
+from bench.memory import create_deck_source
+from model.clock import Clock, VirtualClock
+from model.match import Match
+from model.participant import Participant
+
+
+# The virtual time that passes per tick, in seconds
+_TICK = 1.0
+
+
+class _Table:
+    """A match played by bots.
+
+    Attributes:
+        match: The match.
+        bots: The participants of the match, the owner first.
+        seq: The sequence number of the last seen event of the match.
+    """
+
+    # The number of created bots, for unique IDs
+    _bots = 0
+
+    def __init__(self, source: str, players: int) -> None:
+        """Constructor.
+
+        Args:
+            source: The deck source of the match.
+            players: The number of bots playing the match.
+        """
+        self.match = Match()
+        success, msg = self.match.create_deck(source)
+        assert success, msg
+        self.bots = []  # type: List[Participant]
+        for _ in range(players):
+            _Table._bots += 1
+            bot = Participant("BOT%i" % _Table._bots, "Bot%i" % _Table._bots)
+            self.match.add_participant(bot)
+            self.bots.append(bot)
+        self.match.put_in_pool()
+        self.seq = -1
+
+    def play(self, rng: Random) -> None:
+        """Lets the bots act on the match, like their clients would.
+
+        Args:
+            rng: The random generator of the bots.
+        """
+        match = self.match
+        gaps = match.count_gaps()
+        for bot in self.bots:
+            bot.refresh()
+        if match.is_choosing():
+            for bot in self.bots:
+                if bot.picking or bot.choose_count() >= gaps:
+                    continue
+                hand = [hid for hid, _, _ in bot.get_hand()]
+                for hid in rng.sample(hand, min(gaps, len(hand))):
+                    bot.toggle_chosen(hid, gaps)
+            match.check_choosing_done()
+        elif match.is_picking() and match.can_view_choices():
+            orders = [bot.order for bot in self.bots
+                      if not bot.picking and bot.choose_count() >= gaps]
+            if orders:
+                match.declare_round_winner(rng.choice(orders))
+        if match.user_can_skip_phase(self.bots[0]):
+            match.skip_to_next_phase()
+
+    def count_transitions(self) -> int:
+        """Counts the state transitions since the last call.
+
+        Returns:
+            The number of state transitions.
+        """
+        events, self.seq, _ = self.match.get_events(self.seq)
+        return sum(1 for event in events if event["event"] == "state")
+
+
+def run(matches: int, players: int, seconds: float, seed: int) -> None:
+    """Runs the simulation and prints the results.
+
+    Args:
+        matches: The number of concurrent matches.
+        players: The number of bots in every match.
+        seconds: The (real) duration of the simulation.
+        seed: The seed for the random choices.
+    """
+    random.seed(seed)
+    rng = Random(seed)
+    clock = VirtualClock(time())
+    Clock.set_source(clock)
+    source = create_deck_source(300, seed)
+
+    # Only the setup is traced, as tracing slows down the simulation
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    tables = [_Table(source, players) for _ in range(matches)]
+    footprint = (tracemalloc.get_traced_memory()[0] - before) / matches
+    tracemalloc.stop()
+
+    ticks = transitions = finished = 0
+    states = {}  # type: Dict[str, int]
+    start = perf_counter()
+    while perf_counter() - start < seconds:
+        for table in tables:
+            table.play(rng)
+        Match.perform_housekeeping()
+        for i, table in enumerate(tables):
+            transitions += table.count_transitions()
+            if Match.get_by_id(table.match.id) is None:
+                finished += 1
+                tables[i] = _Table(source, players)
+        clock.advance(_TICK)
+        ticks += 1
+    elapsed = perf_counter() - start
+    for table in tables:
+        state = table.match.get_snapshot().state
+        states[state] = states.get(state, 0) + 1
+    Clock.reset()
+
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    print("Matches:          %i with %i bots each" % (matches, players))
+    print("Ticks:            %i (%.0f virtual seconds in %.1f seconds)"
+          % (ticks, ticks * _TICK, elapsed))
+    print("Transitions:      %i (%.0f per second)"
+          % (transitions, transitions / elapsed))
+    print("Finished matches: %i" % finished)
+    print("Final states:     %s" % ", ".join(
+        "%s %i" % item for item in sorted(states.items())))
+    print("Match footprint:  %.1f KiB after setup" % (footprint / 1024))
+    print("Peak RSS:         %.1f MiB (%.1f KiB per match)"
+          % (rss / 1024 / 1024, rss / 1024 / matches))
+
+
+def main() -> None:
+    """Parses the command line and runs the simulation."""
+    parser = ArgumentParser(description="Simulates matches played by bots.")
+    parser.add_argument("--matches", type=int, default=1000,
+                        help="the number of concurrent matches")
+    parser.add_argument("--players", type=int, default=5,
+                        help="the number of bots in every match")
+    parser.add_argument("--seconds", type=float, default=10,
+                        help="the duration of the simulation")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="the seed for the random choices")
+    args = parser.parse_args()
+    run(args.matches, args.players, args.seconds, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Part of KgF.
+
+MIT License
+Copyright (c) 2017-2018 LordKorea
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+Module Deadlock Guarantees:
+    The clocks do not use any locks. Thus they can not be part of any
+    deadlock.
+"""
+
+from time import time
+from typing import Callable
+
+
+class Clock:
+    """Provides the current time to the model.
+
+    The model reads the time only through this class, so simulations can
+    replace the wall clock with a virtual clock.
+    """
+
+    # The source of the current time, in seconds since the epoch
+    _source = time  # type: Callable[[], float]
+
+    @staticmethod
+    def now() -> float:
+        """Retrieves the current time.
+
+        Returns:
+            The current time in seconds since the epoch.
+        """
+        return Clock._source()
+
+    @staticmethod
+    def set_source(source: Callable[[], float]) -> None:
+        """Replaces the source of the current time.
+
+        Args:
+            source: The function providing the current time in seconds since
+                the epoch, e.g. a virtual clock.
+        """
+        Clock._source = source
+
+    @staticmethod
+    def reset() -> None:
+        """Restores the wall clock as the source of the current time."""
+        Clock._source = time
+
+
+class VirtualClock:
+    """A time source which only advances when told to.
+
+    The virtual clock is meant for single-threaded simulations.
+    """
+
+    def __init__(self, start: float=0.0) -> None:
+        """Constructor.
+
+        Args:
+            start: The initial time in seconds since the epoch.
+        """
+        self._now = start
+
+    def __call__(self) -> float:
+        """Retrieves the current virtual time.
+
+        Returns:
+            The current time in seconds since the epoch.
+        """
+        return self._now
+
+    def advance(self, seconds: float) -> None:
+        """Advances the virtual time.
+
+        Args:
+            seconds: The number of seconds to advance the time by.
+        """
+        self._now += seconds
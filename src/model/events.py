@@ -0,0 +1,116 @@
+"""Part of KgF.
+
+MIT License
+Copyright (c) 2017-2018 LordKorea
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+Module Deadlock Guarantees:
+    When the mutex of an event log is locked no other locks can be
+    requested. Thus the event log lock can not be part of any deadlock.
+"""
+
+from collections import deque
+from itertools import islice
+from threading import RLock
+from typing import Any, Deque, Dict, List, Tuple
+
+from nussschale.util.locks import mutex
+
+
+# A logged event, as it is sent to clients
+_Event = Dict[str, Any]
+
+
+class EventLog:
+    """A bounded log of the events that happened in a match.
+
+    Every event has a type ('event') and a sequence number ('seq'). Sequence
+    numbers start at 1 and increase by one for every event. Only the most
+    recent events are kept.
+    Events must not be modified once they are logged.
+
+    Event types and their data:
+        state: The match changed its state to 'state'.
+        join: The participant 'id' with nickname 'name' joined, 'spectator'
+            tells whether the participant is a spectator.
+        leave: The participant 'id' left, 'reason' is 'left' or 'timeout'.
+        picker: The participant 'id' is now picking.
+        choose: The participant 'id' has now 'count' cards chosen.
+        pick: The participant 'id' with the order 'order' won the round.
+        score: The participant 'id' now has the score 'score'.
+        chat: The chat message 'message' of type 'type' with ID 'id' was sent.
+    """
+
+    # The maximum number of events that are kept
+    _CAPACITY = 256
+
+    def __init__(self) -> None:
+        """Constructor."""
+        # MutEx for this event log
+        # Locking this MutEx can't cause any other MutExes to be locked.
+        self._lock = RLock()
+
+        # The most recent events, oldest first
+        self._events = deque(maxlen=EventLog._CAPACITY)  # type: Deque[_Event]
+
+        # The sequence number of the most recent event
+        self._seq = 0
+
+    @mutex
+    def append(self, event: str, **data: Any) -> int:
+        """Logs an event.
+
+        Args:
+            event: The type of the event.
+            **data: The data of the event.
+
+        Returns:
+            The sequence number of the event.
+
+        Contract:
+            This method locks the event log's lock.
+        """
+        self._seq += 1
+        entry = {"seq": self._seq, "event": event}  # type: _Event
+        entry.update(data)
+        self._events.append(entry)
+        return self._seq
+
+    @mutex
+    def get_since(self, seq: int) -> Tuple[List[_Event], int, bool]:
+        """Retrieves all events after the given sequence number.
+
+        Args:
+            seq: The sequence number of the last event that is known.
+
+        Returns:
+            The events after the given sequence number, the sequence number of
+            the most recent event and whether the returned events are
+            complete. They are incomplete if events after the given sequence
+            number have already been discarded or if the sequence number is
+            invalid. The client has to reload the full state then.
+
+        Contract:
+            This method locks the event log's lock.
+        """
+        oldest = self._seq - len(self._events) + 1
+        if seq < oldest - 1 or seq > self._seq:
+            return [], self._seq, False
+        skip = seq - oldest + 1
+        return list(islice(self._events, skip, None)), self._seq, True
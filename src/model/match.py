@@ -24,8 +24,12 @@ SOFTWARE.
 Module Deadlock Guarantees:
     The following lock dependencies are introduced by this module:
         Match Instance Lock -> Participant Lock
+        Match Instance Lock -> Event Log Lock
+        Match Instance Lock -> Registry Shard Lock
+        Match Instance Lock -> Registry Listing Lock
+        Match Instance Lock -> Multideck Lock
 
-    The match pool mutex allows no other locks to be requested and therefor
+    The match ID mutex allows no other locks to be requested and therefor
     can not be part of any deadlock.
 """
 
@@ -35,10 +39,22 @@ from collections import OrderedDict
 from html import escape
 from random import shuffle
 from threading import RLock
-from time import time
 
+from model.clock import Clock
+from model.events import EventLog
 from model.multideck import MultiDeck
-from nussschale.util.locks import mutex, named_mutex
+from model.registry import MatchRegistry
+from model.snapshot import MatchSnapshot, ParticipantSnapshot
+from nussschale.util.locks import declare_order, locked, mutex, \
+    named_mutex
+
+
+# The lock dependencies of this module, see the deadlock guarantees
+declare_order("Match._lock", "Participant._lock")
+declare_order("Match._lock", "EventLog._lock")
+declare_order("Match._lock", "_Shard._lock")
+declare_order("Match._lock", "MatchRegistry._listing_lock")
+declare_order("Match._lock", "MultiDeck._lock")
 
 
 class Match:
@@ -83,19 +99,19 @@ class Match:
     _THRESHOLD_PENDING_REFRESH = 10
     _THRESHOLD_CHOOSING_FINISH = 10
 
-    # The match id -> match registry and the ID counter
-    _registry = OrderedDict()  # type: OrderedDict
+    # The match registry, the ID counter and the step between two IDs
+    _registry = MatchRegistry()
     _id_counter = 0
+    _id_step = 1
 
-    # MutEx for the match registry
+    # MutEx for the ID counter
     # Locking this MutEx can't cause any other MutExes to be locked.
-    _pool_lock = RLock()
+    _id_lock = RLock()
 
     # Whether matches are currently frozen
     frozen = False
 
     @classmethod
-    @named_mutex("_pool_lock")
     def get_by_id(cls, id):
         """Retrieves a match by its ID.
 
@@ -106,22 +122,84 @@ class Match:
             obj: The match with that ID or None.
 
         Contract:
-            This method locks the match pool lock.
+            This method locks a match registry shard lock.
         """
-        return Match._registry.get(id, None)
+        return Match._registry.get(id)
 
     @classmethod
-    @named_mutex("_pool_lock")
     def get_all(cls):
         """Retrieves all matches.
 
         Returns:
-            list: All matches that currently exist.
+            list: All matches that currently exist, ordered by their ID.
+
+        Contract:
+            This method locks the match registry shard locks.
+        """
+        return Match._registry.get_all()
+
+    @classmethod
+    def get_listing(cls):
+        """Retrieves the listing of all matches for the dashboard.
+
+        Returns:
+            bytes: The UTF-8 encoded JSON array of the match listing entries.
+
+        Contract:
+            This method locks the match registry listing lock.
+        """
+        return Match._registry.get_listing()
+
+    @classmethod
+    def get_listing_page(cls, limit, cursor=None, by_deadline=False,
+                         state=None, joinable=False, min_players=0,
+                         max_players=None):
+        """Retrieves a page of the listing of the matches.
+
+        Args:
+            limit (int): The maximum number of matches on the page.
+            cursor (str): The cursor returned with the previous page, None
+                for the first page.
+            by_deadline (bool): Whether the matches are ordered by their
+                remaining seconds instead of their ID.
+            state (str): The state the matches must be in, None for any.
+            joinable (bool): Whether only joinable matches are listed.
+            min_players (int): The minimum number of participants.
+            max_players (int): The maximum number of participants, None for
+                no limit.
+
+        Returns:
+            (list, str): The listing entries of the page and the cursor for
+                the next page (None if there is no next page).
+
+        Raises:
+            ValueError: If the cursor is malformed.
 
         Contract:
-            This method locks the match pool lock.
+            This method locks the match registry listing lock.
         """
-        return [match for match in Match._registry.values()]
+        return Match._registry.get_page(limit, cursor, by_deadline, state,
+                                        joinable, min_players, max_players)
+
+    @classmethod
+    def merge_listing_pages(cls, pages, limit, by_deadline=False):
+        """Merges pages of the listing retrieved from several processes.
+
+        Args:
+            pages (list): The pages as (entries, cursor) tuples, retrieved
+                with the same parameters.
+            limit (int): The maximum number of matches on the merged page.
+            by_deadline (bool): Whether the matches are ordered by their
+                remaining seconds instead of their ID.
+
+        Returns:
+            (list, str): The listing entries of the merged page and the
+                cursor for the next page (None if there is no next page).
+
+        Raises:
+            ValueError: If the pages are malformed.
+        """
+        return MatchRegistry.merge_pages(pages, limit, by_deadline)
 
     @classmethod
     def get_match_of_player(cls, pid):
@@ -140,7 +218,6 @@ class Match:
         return None
 
     @classmethod
-    @named_mutex("_pool_lock")
     def add_match(cls, id, match):
         """Adds a match to the pool.
 
@@ -149,12 +226,13 @@ class Match:
             match (obj): The match that will be added.
 
         Contract:
-            This method locks the match pool lock.
+            This method locks the match's instance lock, which locks the match
+            registry locks.
         """
-        Match._registry[id] = match
+        with locked(match, "add_match"):
+            Match._registry.add(id, match, match.get_snapshot().get_summary())
 
     @classmethod
-    @named_mutex("_pool_lock")
     def remove_match(cls, id):
         """Removes a match from the pool.
 
@@ -162,13 +240,12 @@ class Match:
             id (int): The ID of the match.
 
         Contract:
-            This method locks the match pool lock.
+            This method locks the match registry locks.
         """
-        if id in Match._registry:
-            del Match._registry[id]
+        Match._registry.remove(id)
 
     @classmethod
-    @named_mutex("_pool_lock")
+    @named_mutex("_id_lock")
     def get_next_id(cls):
         """Retrieves an unused id.
 
@@ -176,17 +253,35 @@ class Match:
             int: An unused ID.
 
         Contract:
-            This method locks the match pool lock.
+            This method locks the match ID lock.
         """
-        Match._id_counter += 1
+        Match._id_counter += Match._id_step
         return Match._id_counter
 
+    @classmethod
+    @named_mutex("_id_lock")
+    def partition_ids(cls, index, count):
+        """Restricts the IDs of new matches to one of several partitions.
+
+        The IDs of the partition with the given index are exactly the IDs
+        that are congruent to the index modulo the number of partitions.
+
+        Args:
+            index (int): The index of the partition.
+            count (int): The number of partitions.
+
+        Contract:
+            This method locks the match ID lock.
+        """
+        Match._id_counter = index
+        Match._id_step = count
+
     @classmethod
     def perform_housekeeping(cls):
         """Performs housekeeping tasks like checking timers.
 
         Contract:
-            This method locks the match pool lock and match instance locks
+            This method locks the match registry locks and match instance locks
             independently from each other.
         """
         matches = Match.get_all()
@@ -199,15 +294,21 @@ class Match:
     def __init__(self):
         """Constructor."""
         # MutEx for the current match
+        # Only mutations lock this MutEx. Accessors read data that is either
+        # immutable (and replaced as a whole) or append-only, so polling
+        # clients never wait for each other.
         # Locking this MutEx can cause the following mutexes to be locked:
         #  model.participant.Participant MutEx
+        #  model.events.EventLog MutEx
+        #  model.registry._Shard MutEx
+        #  model.registry.MatchRegistry listing MutEx
         self._lock = RLock()
 
         # The ID of this match
         self.id = Match.get_next_id()
 
         # The timer of the match
-        self._timer = time() + Match._TIMER_PENDING
+        self._timer = Clock.now() + Match._TIMER_PENDING
 
         # The current card of the match
         self.current_card = None
@@ -222,32 +323,72 @@ class Match:
         # One of: PENDING, CHOOSING, PICKING, COOLDOWN, ENDING
         self._state = "PENDING"
 
-        # The participants of the match (some of them may be spectators)
+        # The participants of the match (some of them may be spectators).
+        # The dictionary is never modified in place, but replaced by an
+        # updated copy, so that it can be read without locking.
         self._participants = OrderedDict()
 
+        # The events of this match, for clients that poll for changes
+        self._events = EventLog()
+
         # The chat of this match, tuples with type/message
-        self._chat = [("SYSTEM", "<b>Match was created.</b>")]
+        self._chat = []
+        self._append_chat("SYSTEM", "<b>Match was created.</b>")
+
+        # The most recently published snapshot and listing entry of this
+        # match
+        self._snapshot = None
+        self._summary = None
+        self._publish()
+
+    def get_snapshot(self):
+        """Retrieves the most recently published snapshot of this match.
+
+        The snapshot is immutable and replaced after every change of the
+        match, so that it can be read without any locking.
+
+        Returns:
+            MatchSnapshot: The current snapshot of the match.
+        """
+        # Locking is not needed here as access is atomic.
+        return self._snapshot
+
+    def _publish(self):
+        """Publishes a new snapshot of the current state of this match.
+
+        Contract:
+            The caller ensures that the match's lock is held when calling this
+            method (unless the match is still being constructed).
+        """
+        parts = tuple(ParticipantSnapshot(part.id, part.nickname, part.score,
+                                          part.picking, part.spectator,
+                                          part.order)
+                      for part in self._participants.values())
+        skippable = (self._state != "ENDING"
+                     and len(parts) >= Match._MINIMUM_PLAYERS)
+        self._snapshot = MatchSnapshot(self.id, self._state, self._timer,
+                                       self.current_card, parts, skippable)
+
+        # Update the listing entry of the match if it changed
+        summary = self._snapshot.get_summary()
+        if summary != self._summary:
+            self._summary = summary
+            Match._registry.update_summary(summary)
 
     def put_in_pool(self):
         """Puts this match into the match pool."""
         Match.add_match(self.id, self)
 
-    @mutex
     def get_owner_nick(self):
         """Retrieves the nickname of the owner (the first of the players).
 
         Returns:
             str: The nickname of the owner.
-
-        Contract:
-            This method locks the match's instance lock and the participant's
-            lock.
         """
         for part in self.get_participants(False):
             return part.nickname
         return "<unknown>"
 
-    @mutex
     def get_num_participants(self, include_specs=True):
         """Retrieves the number of participants in the match.
 
@@ -256,17 +397,10 @@ class Match:
 
         Returns:
             int: The number of participants in the match.
-
-        Contract:
-            This method locks the match's instance lock.
         """
-        if not include_specs:
-            return len(list(self.get_participants(False)))
-
-        # Default case: including spectators
-        return len(self._participants)
+        # Locking is not needed here as access is atomic.
+        return len(self.get_participants(include_specs))
 
-    @mutex
     def has_participant(self, pid):
         """Checks whether this match has a participant with the given ID.
 
@@ -275,25 +409,18 @@ class Match:
 
         Returns:
             bool: Whether a participant with the given ID exists.
-
-        Contract:
-            This method locks the match's instance lock.
         """
+        # Locking is not needed here as access is atomic.
         return pid in self._participants
 
-    @mutex
     def can_view_choices(self):
         """Whether participants can view others card choices.
 
         Returns:
             bool: Whether participants can see unredacted cards of others.
-
-        Contract:
-            This method locks the match's instance lock.
         """
-        return (self._state == "PICKING"
-                or self._state == "COOLDOWN"
-                or self._state == "ENDING")
+        # Locking is not needed here as access is atomic.
+        return self._state in ("PICKING", "COOLDOWN", "ENDING")
 
     def get_seconds_to_next_phase(self):
         """Retrieves the number of seconds to the next phase (state).
@@ -302,9 +429,8 @@ class Match:
             int: The number of remaining seconds to the next phase.
         """
         # Locking is not needed here as access is atomic.
-        return int(self._timer - time())
+        return int(self._timer - Clock.now())
 
-    @mutex
     def user_can_skip_phase(self, part):
         """Determine whether a user can skip to the next phase.
 
@@ -334,11 +460,12 @@ class Match:
         """
         # One second difference to prevent edge cases of timer change close to
         # game state transitions.
-        if self._timer - time() > 1:
-            self._timer = time()
-            self._chat.append(("SYSTEM",
-                               "<b>" + self.get_owner_nick()
-                               + " skipped to the next phase.</b>"))
+        if self._timer - Clock.now() > 1:
+            self._timer = Clock.now()
+            self._append_chat("SYSTEM",
+                              "<b>" + self.get_owner_nick()
+                              + " skipped to the next phase.</b>")
+            self._publish()
 
     def _set_state(self, state):
         """Updates the state for this match.
@@ -353,8 +480,10 @@ class Match:
         # Notification that the transition out of the old state takes place
         self._leave_state()
         self._state = state
+        self._events.append("state", state=state)
         # Notification that the transition into the new state is finished
         self._enter_state()
+        self._publish()
 
     def _leave_state(self):
         """Handles a transition out of the current state.
@@ -389,15 +518,15 @@ class Match:
             self._replenish_hands()
 
             # Update the timer
-            self._timer = time() + Match._TIMER_CHOOSING
+            self._timer = Clock.now() + Match._TIMER_CHOOSING
         elif self._state == "PICKING":
             # Remove all hands that are not completed for picking
             self._unchoose_incomplete()
 
             # If no pick is possible (too few valid hands) then skip the round
             if not self._pick_possible():
-                self._chat.append(("SYSTEM",
-                                   "<b>Too few valid choices!</b>"))
+                self._append_chat("SYSTEM",
+                                  "<b>Too few valid choices!</b>")
                 # If the round is skipped only unchoose the cards without
                 # deleting them
                 for part in self.get_participants(False):
@@ -409,61 +538,63 @@ class Match:
             pick_time = Match._TIMER_PICKING
             pick_time += (self.get_num_participants(False)
                           * Match._TIMER_PICKING_BONUS_PER_PLAYER)
-            self._timer = time() + pick_time
+            self._timer = Clock.now() + pick_time
         elif self._state == "COOLDOWN":
-            self._timer = time() + Match._TIMER_COOLDOWN
+            self._timer = Clock.now() + Match._TIMER_COOLDOWN
         elif self._state == "ENDING":
-            self._timer = time() + Match._TIMER_ENDING
+            self._timer = Clock.now() + Match._TIMER_ENDING
 
     def check_timer(self):
         """Checks the match timer and performs updates accordingly.
 
         Contract:
-            This method locks the match pool lock and match instance lock.
+            This method locks the match registry locks and match instance lock.
         """
         # Frozen matches regenerate their timer
         if Match.frozen:
-            self._timer = time() + 59 * 61  # Freeze timer to 59:59
+            self._timer = Clock.now() + 59 * 61  # Freeze timer to 59:59
         else:
-            with self._lock:
-                if self._timer - time() > 59 * 60:  # > 59 minutes
-                    self._timer = time() + 30  # Reset to 00:30
+            with locked(self, "check_timer"):
+                if self._timer - Clock.now() > 59 * 60:  # > 59 minutes
+                    self._timer = Clock.now() + 30  # Reset to 00:30
 
         n_players = self.get_num_participants(False)
 
         # Refresh the timer when there are not enough participants while
         # the match has not started yet
         threshold = Match._THRESHOLD_PENDING_REFRESH
-        with self._lock:
-            if self._state == "PENDING" and self._timer - time() < threshold:
+        with locked(self, "check_timer"):
+            remaining = self._timer - Clock.now()
+            if self._state == "PENDING" and remaining < threshold:
                 if n_players < Match._MINIMUM_PLAYERS:
-                    self._timer = time() + Match._TIMER_PENDING
-                    self._chat.append(("SYSTEM",
-                                       "<b>There are not enough players, "
-                                       "the timer has been restarted!</b>"))
+                    self._timer = Clock.now() + Match._TIMER_PENDING
+                    self._append_chat("SYSTEM",
+                                      "<b>There are not enough players, "
+                                      "the timer has been restarted!</b>")
 
         # Cancel matches with too few players
-        with self._lock:
+        with locked(self, "check_timer"):
             if n_players < Match._MINIMUM_PLAYERS:
                 if self._state != "PENDING" and self._state != "ENDING":
                     self._set_state("ENDING")
 
         # Handle state transitions
         delete_match = False
-        with self._lock:
-            if time() > self._timer:
+        with locked(self, "check_timer"):
+            if Clock.now() > self._timer:
                 if self._state == "PENDING":
                     self._set_state("CHOOSING")
                 elif self._state == "CHOOSING":
                     self._set_state("PICKING")
                 elif self._state == "PICKING":
-                    self._chat.append(("SYSTEM",
-                                       "<b>No winner was picked!</b>"))
+                    self._append_chat("SYSTEM",
+                                      "<b>No winner was picked!</b>")
                     self._set_state("COOLDOWN")
                 elif self._state == "COOLDOWN":
                     self._set_state("CHOOSING")
                 elif self._state == "ENDING":
                     delete_match = True
+            self._publish()
 
         # Delete the match if needed (note that it might already be deleted,
         # but deletion is idempotent)
@@ -478,15 +609,16 @@ class Match:
             This method locks the match's instance lock and the participant's
             lock.
         """
-        parts = [x for x in self._participants.items()]
-        for pid, part in parts:
+        for pid, part in self._participants.items():
             if part.has_timed_out():
-                self._chat.append((
-                    "SYSTEM",
-                    "<b>%s timed out.</b>" % part.nickname))
+                self._append_chat("SYSTEM",
+                                  "<b>%s timed out.</b>" % part.nickname)
                 if part.picking:
                     self.notify_picker_leave(pid)
-                del self._participants[pid]
+                self._remove_participant(pid)
+                part.set_event_log(None)
+                self._events.append("leave", id=pid, reason="timeout")
+                self._publish()
 
     @mutex
     def abandon_participant(self, pid):
@@ -499,14 +631,17 @@ class Match:
             This method locks the match's instance lock and the participant's
             lock.
         """
-        if pid not in self._participants:
+        part = self._participants.get(pid, None)
+        if part is None:
             return
-        nick = self._participants[pid].nickname
-        self._chat.append(("SYSTEM",
-                           "<b>%s left.</b>" % nick))
-        if self._participants[pid].picking:
+        self._append_chat("SYSTEM",
+                          "<b>%s left.</b>" % part.nickname)
+        if part.picking:
             self.notify_picker_leave(pid)
-        del self._participants[pid]
+        part.set_event_log(None)
+        self._remove_participant(pid)
+        self._events.append("leave", id=pid, reason="left")
+        self._publish()
 
     @mutex
     def notify_picker_leave(self, pid):
@@ -527,25 +662,24 @@ class Match:
         assert fallback is not None
 
         next = False
-        found = False
+        picker = fallback
         for ppid, part in self._participants.items():
             if part.spectator:
                 continue
             if next:
-                part.picking = True
-                found = True
+                picker = part
                 break
             elif pid == ppid:
                 next = True
 
-        if not found:
-            fallback.picking = True
+        picker.picking = True
+        self._events.append("picker", id=picker.id)
 
         if self._state == "CHOOSING" or self._state == "PICKING":
             self._set_state("COOLDOWN")
-            self._chat.append(("SYSTEM", "<b>The picker left!</b>"))
+            self._append_chat("SYSTEM", "<b>The picker left!</b>")
+        self._publish()
 
-    @mutex
     def get_participant(self, pid):
         """Retrieves the match participant with the given ID.
 
@@ -554,13 +688,10 @@ class Match:
 
         Returns:
             obj: The participant with the given ID (or None).
-
-        Contract:
-            This method locks the match's instance lock.
         """
+        # Locking is not needed here as access is atomic.
         return self._participants.get(pid, None)
 
-    @mutex
     def get_participants(self, include_specs=True):
         """Retrieves all participants in the match.
 
@@ -569,14 +700,13 @@ class Match:
 
         Returns:
             list: All participants in the match.
-
-        Contract:
-            This method locks the match's instance lock.
         """
+        # Locking is not needed here as the participants are replaced as a
+        # whole on every change.
         parts = self._participants.values()
         if not include_specs:
-            return filter(lambda x: not x.spectator, parts)
-        return parts
+            return [part for part in parts if not part.spectator]
+        return list(parts)
 
     @mutex
     def add_participant(self, part):
@@ -596,17 +726,23 @@ class Match:
 
         id = part.id
         nick = part.nickname
-        self._participants[id] = part
+        parts = OrderedDict(self._participants)
+        parts[id] = part
+        self._participants = parts
+        part.set_event_log(self._events)
+        self._events.append("join", id=id, name=nick,
+                            spectator=part.spectator)
         if not part.spectator:
-            self._chat.append(("SYSTEM", "<b>%s joined.</b>" % nick))
+            self._append_chat("SYSTEM", "<b>%s joined.</b>" % nick)
         else:
-            self._chat.append(("SYSTEM",
-                               "<b>%s is now spectating.</b>" % nick))
+            self._append_chat("SYSTEM",
+                              "<b>%s is now spectating.</b>" % nick)
 
         # Add a threshold to the timer if the match has not started yet
         if self._state == "PENDING":
-            if self._timer - time() < Match._THRESHOLD_JOIN_BONUS:
-                self._timer = time() + Match._THRESHOLD_JOIN_BONUS
+            if self._timer - Clock.now() < Match._THRESHOLD_JOIN_BONUS:
+                self._timer = Clock.now() + Match._THRESHOLD_JOIN_BONUS
+        self._publish()
 
     def create_deck(self, data):
         """Creates a deck from the given input source.
@@ -633,6 +769,11 @@ class Match:
         # Card ID counters
         card_id_counter = 0
 
+        # Canonical type identifiers and card texts. Cards with the same type
+        # or text share the string object instead of holding a copy each.
+        types = {type: type for type in Card.TYPES}
+        texts = {}
+
         # Read all cards from the source
         left = Match._MAXIMUM_CARDS_IN_DECK
         for line in tsv_lines:
@@ -647,9 +788,10 @@ class Match:
                 return False, "invalid_format"
 
             text = escape(tsv[0])
-            type = tsv[1]
-            if type not in ("STATEMENT", "OBJECT", "VERB"):
+            type = types.get(tsv[1], None)
+            if type is None:
                 return False, "invalid_type"
+            text = texts.setdefault(text, text)
 
             # Check that the number of gaps fits for the given type
             gaps = text.count("_")
@@ -688,16 +830,13 @@ class Match:
 
         return True, "OK"
 
-    @mutex
     def get_status(self):
         """Retrieves the status of this match.
 
         Returns:
             str: The current status text for the match.
-
-        Contract:
-            This method locks the match's lock and some participant locks.
         """
+        # Locking is not needed here as access is atomic.
         state = self._state
 
         # Handle states with a static status message
@@ -765,7 +904,6 @@ class Match:
         # Locking is not needed here as access is atomic.
         return self.current_card is not None
 
-    @mutex
     def count_gaps(self):
         """Retrieves the number of gaps on the current card.
 
@@ -773,15 +911,43 @@ class Match:
 
         Returns:
             int: The number of gaps on the currently selected card.
-
-        Contract:
-            This method locks the match's instance lock.
         """
+        # Locking is not needed here as access is atomic.
         if self.current_card is None:
             return 1
         return max(1, self.current_card.text.count("_"))
 
-    @mutex
+    def get_events(self, seq):
+        """Retrieves the events of this match after the given sequence number.
+
+        Args:
+            seq (int): The sequence number of the last known event.
+
+        Returns:
+            (list, int, bool): The events, the sequence number of the most
+                recent event and whether the events are complete. See
+                EventLog.get_since for details.
+
+        Contract:
+            This method locks the match's event log lock.
+        """
+        return self._events.get_since(seq)
+
+    def _append_chat(self, type, msg):
+        """Appends a message to the chat of this match.
+
+        Args:
+            type (str): The type of the message, SYSTEM or USER.
+            msg (str): The message.
+
+        Contract:
+            The caller ensures that the match's lock is held when calling this
+            method (unless the match is still being constructed).
+        """
+        self._events.append("chat", id=len(self._chat), type=type,
+                            message=msg)
+        self._chat.append((type, msg))
+
     def retrieve_chat(self, offset=0):
         """Retrieves the chat beginning at the given offset.
 
@@ -791,19 +957,25 @@ class Match:
 
         Returns:
             list: The chat messages that match the requirement.
-
-        Contract:
-            This method locks the match's instance lock.
         """
+        # Locking is not needed here as the chat is append-only.
         offset = max(0, offset)
         res = []
-        for id, msg in enumerate(self._chat):
-            if id >= offset:
-                res.append({"id": id,
-                            "type": msg[0],
-                            "message": msg[1]})
+        for id, msg in enumerate(self._chat[offset:], offset):
+            res.append({"id": id,
+                        "type": msg[0],
+                        "message": msg[1]})
         return res
 
+    def get_chat_size(self):
+        """Retrieves the number of chat messages in this match.
+
+        Returns:
+            int: The number of chat messages.
+        """
+        # Locking is not needed here as the chat is append-only.
+        return len(self._chat)
+
     @mutex
     def send_message(self, nick, msg):
         """Sends a user message to the chat of this match.
@@ -818,7 +990,7 @@ class Match:
         msg = re.sub("(https?://\\S+)",
                      "<a href=\"\\1\" target=\"_blank\">\\1</a>",
                      msg)
-        self._chat.append(("USER", "<b>%s</b>: %s" % (nick, msg)))
+        self._append_chat("USER", "<b>%s</b>: %s" % (nick, msg))
 
     @mutex
     def declare_round_winner(self, order):
@@ -842,17 +1014,18 @@ class Match:
                 break
         if winner is None:
             return
+        self._events.append("pick", id=winner.id, order=order)
 
         for part in self.get_participants(False):
             if part is winner:
                 part.increase_score()
                 nick = part.nickname
-                self._chat.append(("SYSTEM",
-                                   "<b>%s won the round!</b>" % nick))
+                self._append_chat("SYSTEM",
+                                  "<b>%s won the round!</b>" % nick)
                 if part.score >= Match._WIN_CONDITION:
-                    self._chat.append(("SYSTEM", "<b>Game over!</b>"))
-                    self._chat.append(("SYSTEM",
-                                       "<b>%s won the game!</b>" % nick))
+                    self._append_chat("SYSTEM", "<b>Game over!</b>")
+                    self._append_chat("SYSTEM",
+                                      "<b>%s won the game!</b>" % nick)
                     self._set_state("ENDING")
                 else:
                     self._set_state("COOLDOWN")
@@ -874,8 +1047,9 @@ class Match:
             if not part.picking and gc != part.choose_count():
                 return
 
-        if self._timer - time() > Match._THRESHOLD_CHOOSING_FINISH:
-            self._timer = time() + Match._THRESHOLD_CHOOSING_FINISH
+        if self._timer - Clock.now() > Match._THRESHOLD_CHOOSING_FINISH:
+            self._timer = Clock.now() + Match._THRESHOLD_CHOOSING_FINISH
+            self._publish()
 
     def _pick_possible(self):
         """ Checks whether picking a winner is possible.
@@ -914,18 +1088,30 @@ class Match:
             if part.choose_count() < gc:
                 part.unchoose_all()
                 nick = part.nickname
-                self._chat.append(("SYSTEM",
-                                   "<b>%s failed to choose cards!</b>" % nick))
+                self._append_chat("SYSTEM",
+                                  "<b>%s failed to choose cards!</b>" % nick)
 
     def _replenish_hands(self):
         """Replenishes the hands of all participants.
 
+        The missing cards of all participants are drawn from every multideck
+        in a single request.
+
         Contract:
             The caller ensures that the match's lock is held when calling this
             method.
         """
-        for part in self.get_participants(False):
-            part.replenish_hand(self._multidecks)
+        parts = list(self.get_participants(False))
+        types = [type for type in self._multidecks if type != "STATEMENT"]
+        missing = [part.get_missing_cards(types) for part in parts]
+        new_cards = [[] for _ in parts]
+        for type in types:
+            requests = [m[type] for m in missing]
+            picks = self._multidecks[type].request_many(requests)
+            for cards, picked in zip(new_cards, picks):
+                cards.extend(picked)
+        for part, cards in zip(parts, new_cards):
+            part.add_hand_cards(cards)
 
     def _select_match_card(self):
         """Selects a random statement card for this match.
@@ -941,6 +1127,23 @@ class Match:
 
         self.current_card = self._multidecks["STATEMENT"].request(disallowed)
 
+    def _remove_participant(self, pid):
+        """Removes the participant with the given ID from the match.
+
+        The participants are replaced by a copy lacking the participant, so
+        that concurrent readers keep a consistent view.
+
+        Args:
+            pid (str): The ID of the participant.
+
+        Contract:
+            The caller ensures that the match's lock is held when calling this
+            method.
+        """
+        parts = OrderedDict(self._participants)
+        del parts[pid]
+        self._participants = parts
+
     def _shuffle_participants(self):
         """Shuffles the internal order of the participants.
 
@@ -977,16 +1180,18 @@ class Match:
 
         # Try to make the participant after the current one the new picker
         next = False
+        picker = fallback
         for part in self.get_participants(False):
             if next:
-                part.picking = True
-                return
+                picker = part
+                break
             elif part.picking:
                 next = True
                 part.picking = False
 
-        # No picker was set yet
-        fallback.picking = True
+        # If no picker was set yet, the fallback picks
+        picker.picking = True
+        self._events.append("picker", id=picker.id)
 
 
 class Card:
@@ -997,8 +1202,18 @@ class Card:
         type (str): The type of the card. Should not be modified.
         text (str): The text that is written on the card. Should not be
             modified.
+
+    Class Attributes:
+        TYPES (tuple): The canonical card type identifiers. Cards share these
+            string objects instead of holding a copy each.
     """
 
+    # Cards are created by the thousands, don't give them a dict
+    __slots__ = ("id", "type", "text")
+
+    # The canonical card types
+    TYPES = ("STATEMENT", "OBJECT", "VERB")
+
     def __init__(self, id, type, text):
         """Constructor.
 
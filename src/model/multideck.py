@@ -27,7 +27,8 @@ Module Deadlock Guarantees:
 
 from random import shuffle
 from threading import RLock
-from typing import Generic, List, Optional, Set, TypeVar, cast
+from typing import Generic, List, Optional, Sequence, Set, Tuple, TypeVar, \
+    cast
 
 from nussschale.util.locks import mutex
 
@@ -37,19 +38,29 @@ U = TypeVar("U")
 
 
 class MultiDeck(Generic[T, U]):
-    """A (refilling) deck used to make selection seem more 'random'."""
+    """A (refilling) deck used to make selection seem more 'random'.
+
+    The deck is an array of indices into the backing deck. Everything before
+    the cursor has already been drawn, everything after it is the shuffled
+    queue of objects that will be drawn next. When no object in the queue can
+    be drawn, the drawn objects are shuffled and appended to the queue again.
+    """
 
     def __init__(self, deck: List[T]) -> None:
         """Constructor.
 
         Args:
             deck: A list of objects having an 'id' property. The deck
-                should be safe for random access at any given time.
+                should not be modified once the multideck is created.
         """
         self._lock = RLock()
         self._backing = deck  # type: List[T]
-        self._queue = []  # type: List[T]
-        self._contained = set()  # type: Set[U]
+        self._ids = [MultiDeck._id_of(obj) for obj in deck]  # type: List[U]
+
+        # Everything before the cursor is drawn, the rest is the queue. As
+        # nothing has been drawn yet, the first request will fill the queue.
+        self._order = list(range(len(deck)))  # type: List[int]
+        self._cursor = len(deck)
 
     @staticmethod
     def _id_of(o: T) -> U:
@@ -81,39 +92,136 @@ class MultiDeck(Generic[T, U]):
         Contract:
             This method locks the deck's lock.
         """
-        ptr = 0
-
-        # Try to find a viable object
-        while ptr < len(self._queue):
-            obj = self._queue[ptr]
-            if MultiDeck._id_of(obj) not in banned_ids:
-                self._contained.remove(MultiDeck._id_of(obj))
-                del self._queue[ptr]
-                return obj
-            ptr += 1
+        idx = self._request(banned_ids)
+        if idx is None:
+            return None
+        return self._backing[idx]
 
-        # No object in the queue works... Need to refill queue!
-        # Note: For backing decks that are only slightly bigger than the
-        # set of banned ids this might result in less than optimal randomness.
-        # However in practice, deck size does exceed the number of banned ids
-        # by at least factor 2.
-        pool = []
-        for obj in self._backing:
-            if MultiDeck._id_of(obj) not in self._contained:
-                pool.append(obj)
-        shuffle(pool)
-        for obj in pool:
-            self._contained.add(MultiDeck._id_of(obj))
-            self._queue.append(obj)
-
-        # Try to find a viable object again
-        while ptr < len(self._queue):
-            obj = self._queue[ptr]
-            if MultiDeck._id_of(obj) not in banned_ids:
-                self._contained.remove(MultiDeck._id_of(obj))
-                del self._queue[ptr]
-                return obj
-            ptr += 1
+    @mutex
+    def request_many(self, requests: Sequence[Tuple[int, Set[U]]]
+                     ) -> List[List[T]]:
+        """Requests cards for multiple requesters at once.
+
+        The requesters are served in turns, one card at a time, until every
+        request is fulfilled or can't be fulfilled any further. No requester
+        receives an object twice.
 
-        # Still no object found: Failure, as the queue is already maximal.
+        Args:
+            requests: For every requester the number of cards that are
+                requested and a set of IDs that may not be chosen. The sets
+                are not modified.
+
+        Returns:
+            For every requester the list of objects that were selected. The
+            lists might be shorter than requested if a request can't be
+            fulfilled.
+
+        Contract:
+            This method locks the deck's lock.
+        """
+        result = [[] for _ in requests]  # type: List[List[T]]
+        banned = [set(ids) for _, ids in requests]
+        pending = [i for i, (k, _) in enumerate(requests) if k > 0]
+        while pending:
+            still_pending = []  # type: List[int]
+            for i in pending:
+                idx = self._request(banned[i])
+                if idx is None:
+                    continue  # Can't fulfill the requirement...
+                banned[i].add(self._ids[idx])
+                result[i].append(self._backing[idx])
+                if len(result[i]) < requests[i][0]:
+                    still_pending.append(i)
+            pending = still_pending
+        return result
+
+    def _request(self, banned_ids: Set[U]) -> Optional[int]:
+        """Draws a card from the multideck.
+
+        Args:
+            banned_ids: A set of IDs that may not be chosen.
+
+        Returns:
+            The index of the selected object in the backing deck. This might
+            be None if the request can't be fulfilled.
+
+        Contract:
+            The caller ensures that the deck's lock is held.
+        """
+        # Try to find a viable object. Only banned objects are skipped, so
+        # this takes at most len(banned_ids) steps.
+        ptr = self._find_viable(self._cursor, banned_ids)
+        if ptr is None:
+            # No object in the queue works... Need to refill queue!
+            # Note: For backing decks that are only slightly bigger than the
+            # set of banned ids this might result in less than optimal
+            # randomness. However in practice, deck size does exceed the
+            # number of banned ids by at least factor 2.
+            start = self._refill()
+
+            # Try to find a viable object again, only in the refilled part
+            ptr = self._find_viable(start, banned_ids)
+            if ptr is None:
+                # Still no object found: Failure, as the queue is already
+                # maximal.
+                return None
+        return self._draw(ptr)
+
+    def _find_viable(self, ptr: int, banned_ids: Set[U]) -> Optional[int]:
+        """Finds the first object in the queue that is not banned.
+
+        Args:
+            ptr: The position in the order to start searching at.
+            banned_ids: A set of IDs that may not be chosen.
+
+        Returns:
+            The position of the object in the order or None if every object
+            from the starting position on is banned.
+
+        Contract:
+            The caller ensures that the deck's lock is held.
+        """
+        order = self._order
+        ids = self._ids
+        while ptr < len(order):
+            if ids[order[ptr]] not in banned_ids:
+                return ptr
+            ptr += 1
         return None
+
+    def _draw(self, ptr: int) -> int:
+        """Draws the object at the given position from the queue.
+
+        The object is swapped with the object at the cursor, which then
+        advances past it.
+
+        Args:
+            ptr: The position of the object in the order.
+
+        Returns:
+            The index of the drawn object in the backing deck.
+
+        Contract:
+            The caller ensures that the deck's lock is held.
+        """
+        order = self._order
+        cursor = self._cursor
+        order[cursor], order[ptr] = order[ptr], order[cursor]
+        self._cursor = cursor + 1
+        return order[cursor]
+
+    def _refill(self) -> int:
+        """Appends all drawn objects to the queue in random order.
+
+        Returns:
+            The position in the order at which the refilled objects start.
+
+        Contract:
+            The caller ensures that the deck's lock is held.
+        """
+        drawn = self._order[:self._cursor]
+        shuffle(drawn)
+        queue = self._order[self._cursor:]
+        self._order = queue + drawn
+        self._cursor = 0
+        return len(queue)
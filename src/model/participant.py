@@ -21,24 +21,39 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 
 Module Deadlock Guarantees:
-    When the mutex of a participant is locked no other locks can be
+    The following lock dependencies are introduced by this module:
+        Participant Lock -> Event Log Lock
+        Participant Lock -> Multideck Lock
+
+    The event log lock and the multideck lock allow no other locks to be
     requested. Thus the participant lock can not be part of any deadlock.
 """
 
 from collections import OrderedDict
-from copy import deepcopy
 from threading import RLock
-from time import time
-from typing import Dict, List, Mapping, Optional, Set, TYPE_CHECKING, Union
+from typing import Dict, Iterable, List, Mapping, Optional, Set, \
+    TYPE_CHECKING, Tuple, Union
 
-from nussschale.util.locks import mutex
+from model.clock import Clock
+from nussschale.util.locks import declare_order, mutex
 
 
 if TYPE_CHECKING:
+    from model.events import EventLog
     from model.match import Card
     from model.multideck import MultiDeck
 
 
+# The lock dependencies of this module, see the deadlock guarantees
+declare_order("Participant._lock", "EventLog._lock")
+declare_order("Participant._lock", "MultiDeck._lock")
+
+
+# An immutable snapshot of a hand: (hand ID, card, choice index) for every
+# hand card, in hand order
+HandSnapshot = Tuple[Tuple[int, "Card", Optional[int]], ...]
+
+
 class Participant:
     """Represents a participant in a match.
 
@@ -52,8 +67,15 @@ class Participant:
             occurring.
         order: The order key of the particpant, used for shuffling.
         spectator: Whether the participant is a spectator.
+        hand_version: The version of the hand. Increases every time the hand
+            changes.
     """
 
+    # Participants don't need a dict, their attributes are fixed
+    __slots__ = ("_lock", "id", "nickname", "score", "picking", "_timeout",
+                 "order", "spectator", "_hand", "_hand_counter",
+                 "_hand_snapshot", "hand_version", "_events")
+
     # The number of hand cards per type
     _HAND_CARDS_PER_TYPE = 6
 
@@ -85,7 +107,7 @@ class Participant:
         self.picking = False
 
         # The timeout timer of this participant
-        self._timeout = time() + Participant._PARTICIPANT_REFRESH_TIMER
+        self._timeout = Clock.now() + Participant._PARTICIPANT_REFRESH_TIMER
 
         # The order of this participant (may change each round)
         self.order = 0
@@ -98,6 +120,14 @@ class Participant:
         self._hand = OrderedDict()  # type: Dict[int, HandCard]
         self._hand_counter = 1
 
+        # The snapshot of the hand that is handed out to readers. It is
+        # replaced (never modified) whenever the hand changes.
+        self._hand_snapshot = ()  # type: HandSnapshot
+        self.hand_version = 0
+
+        # The event log of the match this participant is part of
+        self._events = None  # type: Optional[EventLog]
+
     def has_timed_out(self) -> bool:
         """Checks whether this participant has timed out.
 
@@ -105,22 +135,34 @@ class Participant:
             Whether this client has timed out.
         """
         # Locking is not needed here as access is atomic.
-        return time() >= self._timeout
+        return Clock.now() >= self._timeout
+
+    def set_event_log(self, events: Optional["EventLog"]) -> None:
+        """Sets the event log that changes of this participant are logged to.
+
+        Args:
+            events: The event log of the participant's match or None if the
+                participant is not part of a match.
+        """
+        # Locking is not needed here as access is atomic.
+        self._events = events
 
     @mutex
     def increase_score(self) -> None:
         """Increases the score of this participant by one.
 
         Contract:
-            This method locks the participant's lock.
+            This method locks the participant's lock and the event log's lock.
         """
         assert not self.spectator, "Trying to increase score for spectator"
         self.score += 1
+        if self._events is not None:
+            self._events.append("score", id=self.id, score=self.score)
 
     def refresh(self) -> None:
         """Refreshes the timeout timer of this participant."""
         # Locking is not needed here as access is atomic.
-        self._timeout = time() + Participant._PARTICIPANT_REFRESH_TIMER
+        self._timeout = Clock.now() + Participant._PARTICIPANT_REFRESH_TIMER
 
     @mutex
     def unchoose_all(self) -> None:
@@ -132,6 +174,7 @@ class Participant:
         assert not self.spectator, "Trying to unchoose for spectator"
         for hcard in self._hand.values():
             hcard.chosen = None
+        self._update_hand_snapshot()
 
     @mutex
     def delete_chosen(self) -> None:
@@ -147,19 +190,28 @@ class Participant:
                 del_list.append(hid)
         for hid in del_list:
             del self._hand[hid]
+        self._update_hand_snapshot()
 
-    @mutex
-    def get_hand(self) -> Dict[int, "HandCard"]:
+    def get_hand(self) -> HandSnapshot:
         """Retrieves a snapshot of the hand of this participant.
 
         Returns:
-            A copy of the hand of the player.
+            The hand of the player as an immutable snapshot. The snapshot is
+            shared between all readers and will not change.
+        """
+        assert not self.spectator, "Trying to get hand for spectator"
+        # Locking is not needed here as access is atomic.
+        return self._hand_snapshot
+
+    def _update_hand_snapshot(self) -> None:
+        """Replaces the hand snapshot after the hand was changed.
 
         Contract:
-            This method locks the participant's lock.
+            The caller ensures that the participant's lock is held.
         """
-        assert not self.spectator, "Trying to get hand for spectator"
-        return deepcopy(self._hand)
+        self._hand_snapshot = tuple((hid, hcard.card, hcard.chosen)
+                                    for hid, hcard in self._hand.items())
+        self.hand_version += 1
 
     @mutex
     def choose_count(self) -> int:
@@ -187,28 +239,62 @@ class Participant:
             mdecks: Maps card type to a multideck of the card type.
 
         Contract:
-            This method locks the participant's lock.
+            This method locks the participant's lock and the locks of the
+            multidecks.
         """
         assert not self.spectator, "Trying to replenish spectator"
 
         # Replenish for every type
-        for type in filter(lambda x: x != "STATEMENT", mdecks):
-            # Count cards of that type and fetch IDs
-            k_in_hand = 0
-            ids_banned = set()  # type: Set[int]
-            for hcard in self._hand.values():
-                if hcard.card.type == type:
-                    ids_banned.add(hcard.card.id)
-                    k_in_hand += 1
-
-            # Fill hand to limit
-            for i in range(Participant._HAND_CARDS_PER_TYPE - k_in_hand):
-                pick = mdecks[type].request(ids_banned)
-                if pick is None:
-                    break  # Can't fulfill the requirement...
-                ids_banned.add(pick.id)
-                self._hand[self._hand_counter] = HandCard(pick)
-                self._hand_counter += 1
+        types = [type for type in mdecks if type != "STATEMENT"]
+        missing = self.get_missing_cards(types)
+        for type in types:
+            self.add_hand_cards(mdecks[type].request_many([missing[type]])[0])
+
+    @mutex
+    def get_missing_cards(self, types: Iterable[str]
+                          ) -> Dict[str, Tuple[int, Set[int]]]:
+        """Determines which cards are needed to replenish the hand.
+
+        Args:
+            types: The card types that should be replenished.
+
+        Returns:
+            Maps every given card type to the number of missing cards of that
+            type and the IDs of the cards of that type which are already in
+            the hand.
+
+        Contract:
+            This method locks the participant's lock.
+        """
+        assert not self.spectator, "Trying to replenish spectator"
+
+        # Count cards of every type and fetch IDs
+        missing = {}  # type: Dict[str, Tuple[int, Set[int]]]
+        for type in types:
+            missing[type] = (Participant._HAND_CARDS_PER_TYPE, set())
+        for hcard in self._hand.values():
+            type = hcard.card.type
+            if type in missing:
+                k, ids_banned = missing[type]
+                ids_banned.add(hcard.card.id)
+                missing[type] = (k - 1, ids_banned)
+        return missing
+
+    @mutex
+    def add_hand_cards(self, cards: Iterable["Card"]) -> None:
+        """Adds the given cards to the hand of this participant.
+
+        Args:
+            cards: The cards that will be added to the hand.
+
+        Contract:
+            This method locks the participant's lock.
+        """
+        assert not self.spectator, "Trying to replenish spectator"
+        for card in cards:
+            self._hand[self._hand_counter] = HandCard(card)
+            self._hand_counter += 1
+        self._update_hand_snapshot()
 
     @mutex
     def toggle_chosen(self, handid: int, allowance: int) -> None:
@@ -220,7 +306,7 @@ class Participant:
                 the hand.
 
         Contract:
-            This method locks the participant's lock.
+            This method locks the participant's lock and the event log's lock.
         """
         assert not self.spectator, "Trying to toggle for spectator"
 
@@ -246,6 +332,11 @@ class Participant:
                     if (other_hcard.chosen is not None
                             and other_hcard.chosen >= k):
                         other_hcard.chosen = None
+            self._update_hand_snapshot()
+            if self._events is not None:
+                count = sum(1 for hcard in self._hand.values()
+                            if hcard.chosen is not None)
+                self._events.append("choose", id=self.id, count=count)
 
     @mutex
     def get_choose_data(self, redacted: bool
@@ -288,6 +379,9 @@ class HandCard:
             is not chosen it will be set to None.
     """
 
+    # Every player holds a dozen of these, don't give them a dict
+    __slots__ = ("card", "chosen")
+
     def __init__(self, card: "Card") -> None:
         """Constructor.
 
@@ -0,0 +1,504 @@
+"""Part of KgF.
+
+MIT License
+Copyright (c) 2017-2018 LordKorea
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+Module Deadlock Guarantees:
+    When a shard mutex or the listing mutex of a registry is locked no other
+    locks can be requested. Thus the registry locks can not be part of any
+    deadlock.
+"""
+
+from bisect import bisect_left, bisect_right, insort
+from heapq import merge
+from itertools import islice
+from json import dumps
+from threading import RLock
+from typing import Any, Dict, Iterator, List, Optional, Set, \
+    TYPE_CHECKING, Tuple
+
+from model.clock import Clock
+from nussschale.util.compression import CachedResponse
+from nussschale.util.locks import locked, mutex, named_mutex
+
+
+if TYPE_CHECKING:
+    from model.match import Match
+    from model.snapshot import MatchSummary
+
+
+# A listing entry, as it is sent to clients
+_Entry = Dict[str, Any]
+
+
+class _Shard:
+    """A part of the match registry, with its own lock."""
+
+    def __init__(self) -> None:
+        """Constructor."""
+        # MutEx for this shard
+        # Locking this MutEx can't cause any other MutExes to be locked.
+        self._lock = RLock()
+
+        # The match id -> match mapping of this shard
+        self._matches = {}  # type: Dict[int, Match]
+
+    @mutex
+    def get(self, id: int) -> "Optional[Match]":
+        """Retrieves a match by its ID.
+
+        Args:
+            id: The ID of the match.
+
+        Returns:
+            The match with that ID or None.
+
+        Contract:
+            This method locks the shard's lock.
+        """
+        return self._matches.get(id, None)
+
+    @mutex
+    def get_all(self) -> "List[Match]":
+        """Retrieves all matches of this shard.
+
+        Returns:
+            All matches of this shard.
+
+        Contract:
+            This method locks the shard's lock.
+        """
+        return list(self._matches.values())
+
+    @mutex
+    def add(self, id: int, match: "Match") -> None:
+        """Adds a match to this shard.
+
+        Args:
+            id: The ID of the match.
+            match: The match that will be added.
+
+        Contract:
+            This method locks the shard's lock.
+        """
+        self._matches[id] = match
+
+    @mutex
+    def remove(self, id: int) -> None:
+        """Removes a match from this shard.
+
+        Args:
+            id: The ID of the match.
+
+        Contract:
+            This method locks the shard's lock.
+        """
+        self._matches.pop(id, None)
+
+    def __len__(self) -> int:
+        """Retrieves the number of matches in this shard.
+
+        Returns:
+            The number of matches in this shard.
+        """
+        # Locking is not needed here as access is atomic.
+        return len(self._matches)
+
+
+class MatchRegistry:
+    """The registry of all matches in the match pool.
+
+    The matches are distributed over several shards, so that lookups of
+    different matches do not contend for the same lock. The registry also
+    keeps the listing entry of every match, which matches update whenever
+    it changes, and caches the JSON encoded listing.
+
+    The listing entries are indexed by ID, by state and by deadline, so that
+    pages of the listing can be served without looking at every match.
+    Cursors denote a position in the order of all matches rather than in a
+    registry, so the pages of several registries can be merged.
+    """
+
+    # The number of shards
+    _SHARDS = 16
+
+    # The states in which matches can be joined
+    _JOINABLE_STATES = ("PENDING", "COOLDOWN")
+
+    def __init__(self) -> None:
+        """Constructor."""
+        # The shards of the registry, matches are assigned by their ID
+        self._shards = [_Shard() for _ in range(MatchRegistry._SHARDS)]
+
+        # MutEx for the listing
+        # Locking this MutEx can't cause any other MutExes to be locked.
+        self._listing_lock = RLock()
+
+        # The match id -> listing entry mapping
+        self._summaries = {}  # type: Dict[int, MatchSummary]
+
+        # The indexes of the listing entries: all IDs in ascending order, the
+        # IDs of the matches in every state and (deadline, ID) pairs in
+        # ascending order
+        self._by_id = []  # type: List[int]
+        self._by_state = {}  # type: Dict[str, Set[int]]
+        self._by_deadline = []  # type: List[Tuple[float, int]]
+
+        # The version of the listing, increases on every change
+        self._version = 0
+
+        # The (version, second) the cached listing was encoded for and the
+        # cached listing itself
+        self._listing_key = (-1, -1)  # type: Tuple[int, int]
+        self._listing = b"[]"
+
+    def get(self, id: int) -> "Optional[Match]":
+        """Retrieves a match by its ID.
+
+        Args:
+            id: The ID of the match.
+
+        Returns:
+            The match with that ID or None.
+
+        Contract:
+            This method locks a shard lock.
+        """
+        return self._shards[id % MatchRegistry._SHARDS].get(id)
+
+    def get_all(self) -> "List[Match]":
+        """Retrieves all matches, ordered by their ID.
+
+        Returns:
+            All matches that currently exist.
+
+        Contract:
+            This method locks the shard locks one after another.
+        """
+        matches = []  # type: List[Match]
+        for shard in self._shards:
+            matches.extend(shard.get_all())
+        matches.sort(key=lambda match: match.id)
+        return matches
+
+    def add(self, id: int, match: "Match", summary: "MatchSummary") -> None:
+        """Adds a match to the registry.
+
+        Args:
+            id: The ID of the match.
+            match: The match that will be added.
+            summary: The current listing entry of the match.
+
+        Contract:
+            This method locks a shard lock and the listing lock independently
+            from each other.
+        """
+        self._shards[id % MatchRegistry._SHARDS].add(id, match)
+        with locked(self, "add", "_listing_lock"):
+            old = self._summaries.get(id, None)
+            if old is not None:
+                self._unindex(old)
+            self._summaries[id] = summary
+            self._index(summary)
+            self._version += 1
+
+    def remove(self, id: int) -> None:
+        """Removes a match from the registry.
+
+        Removing a match that is not in the registry has no effect.
+
+        Args:
+            id: The ID of the match.
+
+        Contract:
+            This method locks a shard lock and the listing lock independently
+            from each other.
+        """
+        self._shards[id % MatchRegistry._SHARDS].remove(id)
+        with locked(self, "remove", "_listing_lock"):
+            old = self._summaries.pop(id, None)
+            if old is not None:
+                self._unindex(old)
+                self._version += 1
+
+    @named_mutex("_listing_lock")
+    def update_summary(self, summary: "MatchSummary") -> None:
+        """Updates the listing entry of a match.
+
+        Entries of matches that are not in the registry are ignored.
+
+        Args:
+            summary: The new listing entry of the match.
+
+        Contract:
+            This method locks the listing lock.
+        """
+        old = self._summaries.get(summary.id, summary)
+        if old != summary:
+            self._unindex(old)
+            self._summaries[summary.id] = summary
+            self._index(summary)
+            self._version += 1
+
+    def _index(self, summary: "MatchSummary") -> None:
+        """Adds a listing entry to the indexes.
+
+        Args:
+            summary: The listing entry.
+
+        Contract:
+            The caller ensures that the listing lock is held when calling this
+            method.
+        """
+        insort(self._by_id, summary.id)
+        self._by_state.setdefault(summary.state, set()).add(summary.id)
+        insort(self._by_deadline, (summary.deadline, summary.id))
+
+    def _unindex(self, summary: "MatchSummary") -> None:
+        """Removes a listing entry from the indexes.
+
+        Args:
+            summary: The listing entry.
+
+        Contract:
+            The caller ensures that the listing lock is held when calling this
+            method.
+        """
+        del self._by_id[bisect_left(self._by_id, summary.id)]
+        ids = self._by_state[summary.state]
+        ids.discard(summary.id)
+        if not ids:
+            del self._by_state[summary.state]
+        key = (summary.deadline, summary.id)
+        del self._by_deadline[bisect_left(self._by_deadline, key)]
+
+    @named_mutex("_listing_lock")
+    def get_listing(self) -> bytes:
+        """Retrieves the JSON encoded listing of all matches.
+
+        The listing is only encoded again when an entry changed or when the
+        remaining seconds of the matches changed.
+
+        Returns:
+            The listing, a UTF-8 encoded JSON array.
+
+        Contract:
+            This method locks the listing lock.
+        """
+        now = Clock.now()
+        key = (self._version, int(now))
+        if key != self._listing_key:
+            data = [MatchRegistry._encode(self._summaries[id], now)
+                    for id in self._by_id]
+            self._listing = CachedResponse(dumps(data).encode())
+            self._listing_key = key
+        return self._listing
+
+    @named_mutex("_listing_lock")
+    def get_page(self, limit: int, cursor: Optional[str]=None,
+                 by_deadline: bool=False, state: Optional[str]=None,
+                 joinable: bool=False, min_players: int=0,
+                 max_players: Optional[int]=None
+                 ) -> Tuple[List[_Entry], Optional[str]]:
+        """Retrieves a page of the listing of the matches.
+
+        Args:
+            limit: The maximum number of entries on the page.
+            cursor: The cursor returned with the previous page, None for the
+                first page.
+            by_deadline: Whether the entries are ordered by their deadline
+                instead of their ID.
+            state: The state the matches must be in, None for any state.
+            joinable: Whether only joinable matches are listed.
+            min_players: The minimum number of participants.
+            max_players: The maximum number of participants, None for no
+                limit.
+
+        Returns:
+            The entries of the page and the cursor for the next page, which
+            is None if there are no more entries.
+
+        Raises:
+            ValueError: If the cursor is malformed.
+
+        Contract:
+            This method locks the listing lock.
+        """
+        # Use the state index to restrict the candidates
+        candidates = None  # type: Optional[Set[int]]
+        if state is not None:
+            candidates = self._by_state.get(state, set())
+        if joinable:
+            union = set()  # type: Set[int]
+            for joinable_state in MatchRegistry._JOINABLE_STATES:
+                union |= self._by_state.get(joinable_state, set())
+            if candidates is None:
+                candidates = union
+            else:
+                candidates = candidates & union
+
+        # Find the position after the cursor in the requested order
+        keys = []  # type: List[Any]
+        if by_deadline:
+            keys = self._by_deadline
+        elif candidates is not None and len(candidates) < len(self._by_id):
+            keys = sorted(candidates)
+        else:
+            keys = self._by_id
+        start = 0
+        if cursor is not None:
+            position = MatchRegistry._parse_cursor(cursor, by_deadline)
+            start = bisect_right(keys, position if by_deadline
+                                 else position[1])
+
+        # Collect the matching entries
+        now = Clock.now()
+        data = []  # type: List[_Entry]
+        next = None
+        for pos in range(start, len(keys)):
+            key = keys[pos]  # type: Any
+            match_id = key[1] if by_deadline else key  # type: int
+            if candidates is not None and match_id not in candidates:
+                continue
+            summary = self._summaries[match_id]
+            if summary.participants < min_players:
+                continue
+            if max_players is not None and summary.participants > max_players:
+                continue
+            if len(data) == limit:
+                # There is at least one more entry
+                next = data[-1]["cursor"]
+                break
+            entry = MatchRegistry._encode(summary, now)
+            entry["cursor"] = MatchRegistry._cursor(summary, by_deadline)
+            data.append(entry)
+        return data, next
+
+    @staticmethod
+    def merge_pages(pages: List[Tuple[List[_Entry], Optional[str]]],
+                    limit: int, by_deadline: bool=False
+                    ) -> Tuple[List[_Entry], Optional[str]]:
+        """Merges the pages of several registries into a single page.
+
+        The pages must have been retrieved with the same parameters, the
+        cursor of the merged page continues the listing in every registry.
+
+        Args:
+            pages: The entries of the pages and the cursors for their next
+                pages.
+            limit: The maximum number of entries on the merged page.
+            by_deadline: Whether the entries are ordered by their deadline
+                instead of their ID.
+
+        Returns:
+            The entries of the merged page and the cursor for the next page,
+            which is None if there are no more entries.
+
+        Raises:
+            ValueError: If the cursor of an entry is malformed.
+        """
+        def position(entry: _Entry) -> Tuple[float, int]:
+            return MatchRegistry._parse_cursor(entry["cursor"], by_deadline)
+
+        data = list(islice(merge(*[entries for entries, _ in pages],
+                                 key=position), limit))
+        remaining = sum(len(entries) for entries, _ in pages) > len(data)
+        if data and (remaining or any(cursor is not None
+                                      for _, cursor in pages)):
+            return data, data[-1]["cursor"]
+        return data, None
+
+    @staticmethod
+    def _cursor(summary: "MatchSummary", by_deadline: bool) -> str:
+        """Creates the cursor pointing after a listing entry.
+
+        Args:
+            summary: The listing entry.
+            by_deadline: Whether the entries are ordered by their deadline
+                instead of their ID.
+
+        Returns:
+            The cursor.
+        """
+        if by_deadline:
+            return "%r/%i" % (summary.deadline, summary.id)
+        return str(summary.id)
+
+    @staticmethod
+    def _parse_cursor(cursor: str, by_deadline: bool) -> Tuple[float, int]:
+        """Parses a cursor to its position in the order of all matches.
+
+        Args:
+            cursor: The cursor.
+            by_deadline: Whether the entries are ordered by their deadline
+                instead of their ID.
+
+        Returns:
+            The deadline (0 when ordered by ID) and the ID of the entry the
+            cursor points after.
+
+        Raises:
+            ValueError: If the cursor is malformed.
+        """
+        if by_deadline:
+            deadline, id = cursor.split("/")
+            return float(deadline), int(id)
+        return 0.0, int(cursor)
+
+    @staticmethod
+    def _encode(summary: "MatchSummary", now: float) -> _Entry:
+        """Converts a listing entry to its client representation.
+
+        Args:
+            summary: The listing entry.
+            now: The current time.
+
+        Returns:
+            The listing entry as it is sent to clients.
+        """
+        return {"id": summary.id,
+                "owner": summary.owner,
+                "participants": summary.participants,
+                "canJoin": summary.joinable,
+                "seconds": int(summary.deadline - now)}
+
+    def __len__(self) -> int:
+        """Retrieves the number of matches in the registry.
+
+        Returns:
+            The number of matches in the registry.
+        """
+        return sum(len(shard) for shard in self._shards)
+
+    def __iter__(self) -> Iterator[int]:
+        """Iterates over the IDs of all matches in the registry.
+
+        Returns:
+            An iterator over the match IDs.
+        """
+        return iter([match.id for match in self.get_all()])
+
+    def __delitem__(self, id: int) -> None:
+        """Removes a match from the registry.
+
+        Args:
+            id: The ID of the match.
+        """
+        self.remove(id)
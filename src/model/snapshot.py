@@ -0,0 +1,206 @@
+"""Part of KgF.
+
+MIT License
+Copyright (c) 2017-2018 LordKorea
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+Module Deadlock Guarantees:
+    Snapshots are immutable and do not use any locks. Thus they can not be
+    part of any deadlock.
+"""
+
+from typing import NamedTuple, Optional, TYPE_CHECKING, Tuple
+
+from model.clock import Clock
+
+
+if TYPE_CHECKING:
+    from model.match import Card
+
+
+class ParticipantSnapshot(NamedTuple):
+    """An immutable view of a match participant.
+
+    Attributes:
+        id: The ID of the participant.
+        nickname: The nickname of the participant.
+        score: The score of the participant.
+        picking: Whether the participant is picking.
+        spectator: Whether the participant is a spectator.
+        order: The order key of the participant.
+    """
+
+    id: str
+    nickname: str
+    score: int
+    picking: bool
+    spectator: bool
+    order: int
+
+
+class MatchSummary(NamedTuple):
+    """The listing entry of a match, as it is shown on the dashboard.
+
+    Attributes:
+        id: The ID of the match.
+        owner: The nickname of the owner of the match.
+        participants: The number of participants (including spectators).
+        joinable: Whether participants can join the match.
+        deadline: The time at which the current phase of the match ends.
+        state: The state of the match.
+    """
+
+    id: int
+    owner: str
+    participants: int
+    joinable: bool
+    deadline: float
+    state: str
+
+
+class MatchSnapshot(NamedTuple):
+    """An immutable view of a match.
+
+    A match publishes a new snapshot after every change, readers can use the
+    snapshot they obtained without any locking.
+
+    Attributes:
+        id: The ID of the match.
+        state: The state of the match.
+        timer: The time at which the current phase ends.
+        card: The currently selected statement card, if any.
+        participants: All participants of the match, in match order.
+        skippable: Whether the owner of the match may skip to the next phase.
+    """
+
+    id: int
+    state: str
+    timer: float
+    card: Optional["Card"]
+    participants: Tuple[ParticipantSnapshot, ...]
+    skippable: bool
+
+    def get_participant(self, pid: str) -> Optional[ParticipantSnapshot]:
+        """Retrieves the participant with the given ID.
+
+        Args:
+            pid: The ID of the participant.
+
+        Returns:
+            The participant with the given ID or None.
+        """
+        for part in self.participants:
+            if part.id == pid:
+                return part
+        return None
+
+    def get_players(self) -> Tuple[ParticipantSnapshot, ...]:
+        """Retrieves all participants that are not spectators.
+
+        Returns:
+            The participants that are not spectators, in match order.
+        """
+        return tuple(part for part in self.participants if not part.spectator)
+
+    def get_owner_nick(self) -> str:
+        """Retrieves the nickname of the owner (the first of the players).
+
+        Returns:
+            The nickname of the owner.
+        """
+        for part in self.participants:
+            if not part.spectator:
+                return part.nickname
+        return "<unknown>"
+
+    def user_can_skip_phase(self, pid: str) -> bool:
+        """Determine whether a user can skip to the next phase.
+
+        Args:
+            pid: The ID of the participant in question.
+
+        Returns:
+            Whether the given participant can skip to the next phase.
+        """
+        # Currently, only the owner can skip to the next phase
+        part = self.get_participant(pid)
+        if not self.skippable or part is None:
+            return False
+        return self.get_owner_nick() == part.nickname
+
+    def get_seconds_to_next_phase(self) -> int:
+        """Retrieves the number of seconds to the next phase (state).
+
+        Returns:
+            The number of remaining seconds to the next phase.
+        """
+        return int(self.timer - Clock.now())
+
+    def get_status(self) -> str:
+        """Retrieves the status of the match.
+
+        Returns:
+            The status text for the match.
+        """
+        if self.state == "PENDING":
+            return "Waiting for players..."
+        elif self.state == "CHOOSING":
+            return "Players are choosing cards..."
+        elif self.state == "COOLDOWN":
+            return "The next round is about to start..."
+        elif self.state == "ENDING":
+            return "The match is ending..."
+
+        # The current state has to be PICKING
+        picker = "<unknown>"
+        for part in self.participants:
+            if part.picking:
+                picker = part.nickname
+                break
+        return "%s is picking a winner..." % picker
+
+    def can_join(self) -> bool:
+        """Checks whether new participants can join the match.
+
+        Returns:
+            Whether participants can join.
+        """
+        return self.state in ("PENDING", "COOLDOWN")
+
+    def count_gaps(self) -> int:
+        """Retrieves the number of gaps on the current card.
+
+        If no card is selected, 1 is returned.
+
+        Returns:
+            The number of gaps on the current card.
+        """
+        if self.card is None:
+            return 1
+        return max(1, self.card.text.count("_"))
+
+    def get_summary(self) -> MatchSummary:
+        """Retrieves the listing entry of the match.
+
+        Returns:
+            The listing entry of the match.
+        """
+        return MatchSummary(self.id, self.get_owner_nick(),
+                            len(self.participants), self.can_join(),
+                            self.timer, self.state)
@@ -25,21 +25,33 @@ import cgi
 from http.cookies import SimpleCookie
 from http.server import BaseHTTPRequestHandler
 from io import BytesIO
+from ipaddress import IPv4Network, IPv6Network, ip_address, ip_network
 from sys import exit
+from threading import local
+from time import perf_counter, time
 from traceback import extract_tb
 from typing import Any, Dict, List, Optional, Tuple, Union, cast
 from urllib.parse import parse_qs
 
 from nussschale.leafs.endpoint import _POSTParam
 from nussschale.leafs.master import MasterController
-from nussschale.nussschale import nlog
+from nussschale.log import AccessLog
+from nussschale.nussschale import nconfig, nlog
 from nussschale.session import Session
+from nussschale.util.compression import compress, is_compressible
+from nussschale.util.fileresponse import FileResponse
 from nussschale.util.fileupload import IOWrapper
 from nussschale.util.heartbeat import Heartbeat
 from nussschale.util.lcdict import LowerCaseDict
+from nussschale.util.metrics import Histogram
 
 
 _RawPOSTParam = Union[List[Any], cgi.FieldStorage, cgi.MiniFieldStorage]
+_Network = Union[IPv4Network, IPv6Network]
+
+# The duration of running all heartbeats
+_HEARTBEAT_DURATION = Histogram("nussschale_heartbeat_seconds",
+                                "The duration of the request heartbeats.")
 
 
 class ServerHandler(BaseHTTPRequestHandler):
@@ -48,6 +60,20 @@ class ServerHandler(BaseHTTPRequestHandler):
     Class Attributes:
         stop_connections: Whether to stop connections due to shutdown.
         max_content_length: The maximum content length.
+        trust_forwarded: Whether the client address is taken from the
+            X-Forwarded-For header, which is only safe when all connections
+            come from a trusted proxy.
+        trusted_proxies: The networks of the reverse proxies whose
+            X-Real-IP and X-Forwarded-For headers are trusted.
+        max_requests: The maximum number of requests per connection, 0 for
+            no limit.
+        compression_threshold: The minimum size of compressed responses in
+            bytes, None if responses are never compressed.
+        access_log: The access log, None if requests are not recorded.
+        connection_state: Thread local state of the connection, set by the
+            server. Its attribute accepted is the time the connection was
+            accepted, client_ip is the address of the current request's
+            client.
     """
 
     # Some attributes for changing the base class behavior
@@ -62,6 +88,34 @@ class ServerHandler(BaseHTTPRequestHandler):
     # The maximum content length, 8MiB
     max_content_length = 8 * 1024 * 1024
 
+    # Whether to take the client address from the X-Forwarded-For header
+    trust_forwarded = False
+
+    # The networks of the trusted reverse proxies
+    trusted_proxies = []  # type: List[_Network]
+
+    # The maximum number of requests per connection, 0 for no limit
+    max_requests = 0
+
+    # The minimum size of compressed responses, None disables compression
+    compression_threshold = 1024  # type: Optional[int]
+
+    # The access log, if requests are recorded
+    access_log = None  # type: Optional[AccessLog]
+
+    # The state of the connection handled by the current thread
+    connection_state = local()
+
+    # The number of requests on this connection
+    _requests = 0
+
+    # The state of the current request for the access log: The time handling
+    # started, the status, the size of the body and the session's creation
+    _started = None  # type: Optional[float]
+    _status = 0
+    _sent = 0
+    _session_created = None  # type: Optional[float]
+
     # The master controller which dispatches requests to leaves
     _master = None  # type: MasterController
 
@@ -75,6 +129,10 @@ class ServerHandler(BaseHTTPRequestHandler):
         # The stringified headers. All header names are lowercase!
         self._str_headers = LowerCaseDict()  # type: LowerCaseDict[str]
 
+        # The time the connection was accepted, if known
+        self._accepted = getattr(ServerHandler.connection_state, "accepted",
+                                 None)  # type: Optional[float]
+
         # Called last because this handles the request!
         super().__init__(*args, **kwargs)
 
@@ -88,11 +146,86 @@ class ServerHandler(BaseHTTPRequestHandler):
         """
         ServerHandler._master = mctrl
 
+    @staticmethod
+    def configure() -> None:
+        """Applies the connection settings from the configuration.
+
+        In reverse proxy mode (behind_proxy) the client address is taken from
+        the X-Real-IP or X-Forwarded-For headers of requests that come from
+        the trusted_proxies, a comma-separated list of networks.
+        """
+        ServerHandler.timeout = nconfig().get("idle_timeout", 10)
+        ServerHandler.max_requests = nconfig().get("max_requests", 0)
+        ServerHandler.compression_threshold = None
+        if nconfig().get("compression", True):
+            ServerHandler.compression_threshold = nconfig().get(
+                "compression_threshold", 1024)
+        if nconfig().get("behind_proxy", False):
+            proxies = nconfig().get("trusted_proxies", "127.0.0.1/32,::1/128")
+            ServerHandler.trusted_proxies = [ip_network(net.strip())
+                                             for net in proxies.split(",")
+                                             if net.strip()]
+        if nconfig().get("access_log", False):
+            rate = nconfig().get("access_log_sample", 100) / 100
+            ServerHandler.access_log = AccessLog(rate)
+            ServerHandler.access_log.setup(
+                "access", 4,
+                max_size=nconfig().get("log_max_size", 16 * 1024 * 1024),
+                interval=nconfig().get("log_rotate_interval", 24 * 3600),
+                compress=nconfig().get("log_compress", True))
+
+    @staticmethod
+    def resolve_client_ip(address: str, headers: Any) -> str:
+        """Resolves the address of a client behind the trusted proxies.
+
+        Args:
+            address: The address of the peer of the connection.
+            headers: The request headers, supporting case-insensitive get().
+
+        Returns:
+            The address of the client. This is the peer address unless the
+            peer is a trusted proxy.
+        """
+        if not ServerHandler._is_trusted_proxy(address):
+            return address
+        real_ip = headers.get("x-real-ip")
+        if real_ip:
+            return real_ip.strip()
+
+        # Every proxy appends the address of its peer, so the rightmost
+        # address that is not a trusted proxy is the client's
+        forwarded = headers.get("x-forwarded-for") or ""
+        for hop in reversed(forwarded.split(",")):
+            hop = hop.strip()
+            if hop:
+                address = hop
+                if not ServerHandler._is_trusted_proxy(hop):
+                    break
+        return address
+
+    @staticmethod
+    def _is_trusted_proxy(address: str) -> bool:
+        """Checks whether the given address belongs to a trusted proxy.
+
+        Args:
+            address: The address that is checked.
+
+        Returns:
+            Whether the address is part of a trusted proxy network.
+        """
+        if not ServerHandler.trusted_proxies:
+            return False
+        try:
+            ip = ip_address(address)
+        except ValueError:
+            return False
+        return any(ip in net for net in ServerHandler.trusted_proxies)
+
     def log_message(self, format: str, *args) -> None:
         """Overridden access log handler.
 
-        This is automatically called, but we do not want to generate an access
-        log so this method does nothing.
+        This is automatically called, but the access log is written by
+        handle_one_request instead so this method does nothing.
 
         Args:
             format: This parameter is ignored.
@@ -103,6 +236,7 @@ class ServerHandler(BaseHTTPRequestHandler):
     @staticmethod
     def do_heartbeat() -> None:
         """Runs all heartbeat routines."""
+        start = perf_counter()
         for fun in Heartbeat.heartbeats:
             try:
                 fun()
@@ -120,6 +254,7 @@ class ServerHandler(BaseHTTPRequestHandler):
                 nlog().log("Heartbeat crash!")
                 print("Heartbeat crash: See log for info.")
                 exit(1)
+        _HEARTBEAT_DURATION.observe(perf_counter() - start)
 
     def fetch_session(self) -> Tuple[Session, bool]:
         # Find the session cookie (if any) and extract the ID
@@ -133,13 +268,80 @@ class ServerHandler(BaseHTTPRequestHandler):
             sid = None
 
         # Fetch (or create) the session
-        session = Session.get_session(self.client_address[0], sid)
+        session = Session.get_session(self.get_client_ip(), sid)
 
         # Refresh the session timer to keep the user logged in
         session[0].refresh()
 
         return session
 
+    def get_client_ip(self) -> str:
+        """Retrieves the IP address of the client.
+
+        Returns:
+            The IP address of the client.
+        """
+        if self.trust_forwarded and "x-forwarded-for" in self._str_headers:
+            return self._str_headers["x-forwarded-for"].split(",")[-1].strip()
+        if not self.client_address:
+            return ""  # Unix socket
+        return ServerHandler.resolve_client_ip(self.client_address[0],
+                                               self._str_headers)
+
+    def handle_one_request(self) -> None:
+        """Handles a single request and records it in the access log."""
+        self._started = None
+        self._status = 0
+        self._sent = 0
+        self._session_created = None
+        super().handle_one_request()
+        if self._started is not None and ServerHandler.access_log is not None:
+            self._record_access()
+
+    def _record_access(self) -> None:
+        """Records the current request in the access log."""
+        assert self._started is not None
+        assert ServerHandler.access_log is not None
+        now = time()
+        path = self._get_path()
+
+        # The queue wait only applies to the first request of a connection
+        queue_wait = None
+        if self._accepted is not None:
+            queue_wait = round(max(0.0, self._started - self._accepted), 6)
+            self._accepted = None
+        session_age = None
+        if self._session_created is not None:
+            session_age = round(now - self._session_created, 3)
+
+        ServerHandler.access_log.record({
+            "method": self.command,
+            "leaf": path[0],
+            "path": "/" + "/".join(path[1:]),
+            "status": self._status,
+            "bytes": self._sent,
+            "session_age": session_age,
+            "queue_wait": queue_wait,
+            "handler_time": round(now - self._started, 6)
+        })
+
+    def send_response(self, code: int, message: Optional[str]=None) -> None:
+        """Starts the response, noting the status for the access log.
+
+        Args:
+            code: The HTTP status code that will be sent.
+            message: The reason phrase, the default one for the code if None.
+        """
+        self._status = code
+        super().send_response(code, message)
+
+    def end_headers(self) -> None:
+        """Finishes the headers, closing the connection at its limit."""
+        self._requests += 1
+        if 0 < self.max_requests <= self._requests:
+            self.send_header("connection", "close")
+        super().end_headers()
+
     def convert_headers(self) -> None:
         """Loads the headers into the lower case header dictionary."""
         for key in self.headers.keys():
@@ -171,12 +373,8 @@ class ServerHandler(BaseHTTPRequestHandler):
         headers_out = {}
 
         # Fetch the session
-        session_qry = self.fetch_session()
-        if session_qry[1]:
-            # The session is newly created, set the session ID cookie
-            cookie = "session=%s;Path=/;HttpOnly" % session_qry[0].sid
-            headers_out["set-cookie"] = cookie
-        session = session_qry[0]
+        session, new_session = self.fetch_session()
+        self._session_created = session.created
 
         # Get path and leaf, the leaf is the first value in the path,
         # see _get_path for more info
@@ -187,6 +385,9 @@ class ServerHandler(BaseHTTPRequestHandler):
         # Add the magic leaf parameter to the params
         MasterController.decorate_params(leaf, params)
 
+        # Make the client address available to access restrictions
+        ServerHandler.connection_state.client_ip = self.get_client_ip()
+
         # Call the leaf/endpoint
         x = None
         try:
@@ -216,22 +417,63 @@ class ServerHandler(BaseHTTPRequestHandler):
         headers_out.update(x[1])
         response = x[2]
 
+        # Set the session cookie when the session is newly created. Stateless
+        # sessions are stored in the cookie, which is set on every request.
+        if new_session or Session.is_stateless():
+            cookie = "session=%s;Path=/;HttpOnly" % session.get_cookie()
+            headers_out["set-cookie"] = cookie
+
+        # Files are sent as they are
+        if isinstance(response, FileResponse):
+            self._reply_file(code, headers_out, response)
+            return
+
         # The response might not be properly encoded (it is not required to be
         # encoded). In this case we encode it here.
         if isinstance(response, str):
             response = response.encode()
 
-        # Send the reply to the client
-        self._reply(code, headers_out, response)
+        # Send the reply to the client, compressed if the client supports it
+        self._reply(code, headers_out, self._compress(headers_out, response))
+
+    def _compress(self, headers: Dict[str, str], data: bytes) -> bytes:
+        """Compresses a response body if the client supports it.
+
+        Args:
+            headers: The response headers, which are updated accordingly.
+            data: The response body.
+
+        Returns:
+            The (compressed) response body.
+        """
+        threshold = ServerHandler.compression_threshold
+        content_type = ""
+        for key in headers:
+            if key.lower() == "content-encoding":
+                return data  # Already encoded by the endpoint
+            if key.lower() == "content-type":
+                content_type = headers[key]
+        if threshold is None or not is_compressible(content_type, data,
+                                                    threshold):
+            return data
+
+        headers["vary"] = "Accept-Encoding"
+        coding, data = compress(self._str_headers.get("accept-encoding", ""),
+                                data)
+        if coding is not None:
+            headers["content-encoding"] = coding
+        return data
 
     def do_GET(self) -> None:  # noqa: N802  # required by library
         """Processes an HTTP GET request."""
+        self._started = time()
         # Handle a GET request as a POST request with no parameters
         self.convert_headers()
         self.do_request({})
 
     def do_POST(self) -> None:  # noqa: N802  # required by library
         """Processes an HTTP POST request."""
+        self._started = time()
         self.convert_headers()
         try:
             self.do_request(self._get_post_params())
@@ -475,9 +717,70 @@ class ServerHandler(BaseHTTPRequestHandler):
             if len(data) == 0:
                 data = b"\0"
             self.wfile.write(data)
+            self._sent = len(data)
         except BrokenPipeError:
             pass  # These happen from time to time. Bad client.
 
+    def _reply_file(self, code: int, headers: Dict[str, str],
+                    response: FileResponse) -> None:
+        """Sends a file as the HTTP response to the client.
+
+        Single byte ranges of the file are sent if requested. The file is
+        sent by the kernel for plain connections.
+
+        Args:
+            code: The HTTP status code that will be sent.
+            headers: A dictionary containing headers that will be sent.
+            response: The file that will be sent, it is closed afterwards.
+        """
+        try:
+            offset, length = 0, response.size
+            etag = next((headers[key] for key in headers
+                         if key.lower() == "etag"), None)
+            if (code == 200 and "range" in self._str_headers
+                    and self._str_headers.get("if-range", etag) == etag):
+                requested = response.get_range(self._str_headers["range"])
+                if requested is None:
+                    # 416 Range Not Satisfiable
+                    unsatisfied = "bytes */%i" % response.size
+                    self._reply(416,
+                                {"content-type": "text/plain; charset=utf-8",
+                                 "content-range": unsatisfied},
+                                b"Range Not Satisfiable")
+                    return
+                offset, length = requested
+                if length != response.size:
+                    code = 206  # 206 Partial Content
+                    headers["content-range"] = "bytes %i-%i/%i" % (
+                        offset, offset + length - 1, response.size)
+
+            self.send_response(code)
+            for key in headers:
+                if key != "content-length":
+                    self.send_header(key, headers[key])
+            self.send_header("accept-ranges", "bytes")
+            self.send_header("content-length", str(length))
+            self.end_headers()
+
+            # Uses sendfile(2) for plain sockets and buffered writes for TLS
+            if length > 0:
+                self.connection.sendfile(response.file, offset, length)
+            self._sent = length
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # These happen from time to time. Bad client.
+        finally:
+            response.close()
+
+
+class ForwardedHandler(ServerHandler):
+    """Handles requests that are forwarded by a trusted local process.
+
+    The client address is taken from the X-Forwarded-For header.
+    """
+
+    # Connections only come from the forwarding process
+    trust_forwarded = True
+
 
 class MediaTypeInvalidException(Exception):
     """Raised when the media type is either missing or invalid."""
@@ -21,12 +21,19 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
+from time import perf_counter
 from typing import Dict, List, Tuple
 
 from nussschale.leafs.endpoint import EndpointNotApplicableException, \
     _ComplexAccessRestriction, _ComplexEndpoint, _HTTPResponse, _POSTParam
 from nussschale.session import SessionData
 from nussschale.util.lcdict import LowerCaseDict
+from nussschale.util.metrics import Histogram
+
+
+# The latencies of the endpoints, by the name of the endpoint function
+_ENDPOINT_LATENCY = Histogram("nussschale_endpoint_latency_seconds",
+                              "The latency of the endpoints.", ("endpoint",))
 
 
 def default_access_denied(*_) -> Tuple[int, Dict[str, str], _HTTPResponse]:
@@ -47,6 +54,9 @@ def default_access_denied(*_) -> Tuple[int, Dict[str, str], _HTTPResponse]:
 class Controller:
     """A base page controller, managing access restrictions and endpoints."""
 
+    # Whether the latencies of the endpoints are measured
+    _measured = True
+
     def __init__(self) -> None:
         """Constructor."""
         # Access restrictions
@@ -143,10 +153,15 @@ class Controller:
 
         # Find endpoint
         for point in self._endpoints:
+            start = perf_counter()
             try:
-                return point(session_data, path, params, headers)
+                result = point(session_data, path, params, headers)
             except EndpointNotApplicableException:
-                pass  # Check next endpoint
+                continue  # Check next endpoint
+            if self._measured:
+                _ENDPOINT_LATENCY.observe(perf_counter() - start,
+                                          (point.__name__,))
+            return result
 
         # Last resort if there is no matching endpoint
         return (500,  # 500 Internal Server Error
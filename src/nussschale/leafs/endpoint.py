@@ -27,6 +27,7 @@ from typing import Any, Callable, Dict, IO, List, TYPE_CHECKING, Tuple, Type, \
     TypeVar, Union, cast
 
 from nussschale.session import SessionData
+from nussschale.util.fileresponse import FileResponse
 from nussschale.util.fileupload import IOWrapper
 from nussschale.util.lcdict import LowerCaseDict
 
@@ -43,8 +44,8 @@ T = TypeVar("T")
 _POSTParam = Union[str, List[Union[str, IOWrapper]], IOWrapper]
 
 
-# Represents a possibly encoded HTTP response
-_HTTPResponse = Union[str, bytes]
+# Represents a possibly encoded HTTP response, or a file that is sent
+_HTTPResponse = Union[str, bytes, FileResponse]
 
 
 class EndpointContext:
@@ -314,6 +315,7 @@ def _wrap_endpoint(ctrl: "Controller", endpoint: _Endpoint
     Returns:
         The wrapped endpoint.
     """
+    @wraps(endpoint)
     def complex_endpoint(session: SessionData, path: List[str],
                          params: Dict[str, _POSTParam],
                          headers: LowerCaseDict[str]
@@ -22,6 +22,7 @@ SOFTWARE.
 """
 
 from functools import wraps
+from time import perf_counter
 from typing import Dict, List, Tuple
 
 from nussschale.leafs.controller import Controller
@@ -29,11 +30,24 @@ from nussschale.leafs.endpoint import EndpointNotApplicableException, \
     _ComplexEndpoint, _HTTPResponse, _POSTParam
 from nussschale.session import SessionData
 from nussschale.util.lcdict import LowerCaseDict
+from nussschale.util.metrics import Counter, Gauge, Histogram
+
+
+# The metrics of the requests to the leafs
+_LEAF_REQUESTS = Counter("nussschale_requests_total",
+                         "The handled requests.", ("leaf", "status"))
+_LEAF_LATENCY = Histogram("nussschale_request_latency_seconds",
+                          "The latency of the requests.", ("leaf",))
+_IN_FLIGHT = Gauge("nussschale_requests_in_flight",
+                   "The requests that are currently handled.")
 
 
 class MasterController(Controller):
     """Dispatches requests to the respective leaf controllers."""
 
+    # The leafs are measured instead of the endpoints
+    _measured = False
+
     # The key for the parameter that will be injected
     _LEAF_INJECT = "___leaf___"
 
@@ -70,6 +84,8 @@ class MasterController(Controller):
                                ) -> _ComplexEndpoint:
         """Wraps an endpoint call to remove the magic leaf parameter.
 
+        The requests to the leaf are measured as well.
+
         Args:
             call: The endpoint call that should be wrapped.
             magic: The parameter name that should be removed.
@@ -77,6 +93,8 @@ class MasterController(Controller):
         Returns:
             The wrapped endpoint call.
         """
+        leaf = (magic.split(":", 1)[1],)
+
         @wraps(call)
         def _decorated_call(session: SessionData, path: List[str],
                             params: Dict[str, _POSTParam],
@@ -85,5 +103,16 @@ class MasterController(Controller):
             if magic not in params:
                 raise EndpointNotApplicableException()
             del params[magic]
-            return call(session, path, params, headers)
+
+            _IN_FLIGHT.inc()
+            start = perf_counter()
+            status = "500"  # Unless the call succeeds
+            try:
+                result = call(session, path, params, headers)
+                status = str(result[0])
+                return result
+            finally:
+                _IN_FLIGHT.dec()
+                _LEAF_LATENCY.observe(perf_counter() - start, leaf)
+                _LEAF_REQUESTS.inc(leaf + (status,))
         return _decorated_call
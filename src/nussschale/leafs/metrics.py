@@ -0,0 +1,84 @@
+"""Part of Nussschale.
+
+MIT License
+Copyright (c) 2017-2018 LordKorea
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from ipaddress import ip_address, ip_network
+from typing import List
+
+from nussschale.handler import ServerHandler, _Network
+from nussschale.leafs.controller import Controller
+from nussschale.leafs.endpoint import AccessRestriction, Endpoint, \
+    EndpointContext
+from nussschale.util.metrics import render_all
+
+
+class MetricsController(Controller):
+    """Handles the /metrics leaf.
+
+    Class Attributes:
+        allowed: The networks of the clients which may read the metrics.
+    """
+
+    # The networks of the clients which may read the metrics
+    allowed = []  # type: List[_Network]
+
+    @staticmethod
+    def configure(networks: str) -> None:
+        """Sets the networks of the clients which may read the metrics.
+
+        Args:
+            networks: A comma-separated list of networks.
+        """
+        MetricsController.allowed = [ip_network(net.strip())
+                                     for net in networks.split(",")
+                                     if net.strip()]
+
+
+MetricsLeaf = MetricsController()
+
+
+@AccessRestriction(MetricsLeaf)
+def require_allowed_address(ctx: EndpointContext) -> bool:
+    """Checks whether the client belongs to an allowed network.
+
+    Args:
+        ctx: The context of the request.
+
+    Returns:
+        True iff the address of the client is allowed to read the metrics.
+    """
+    address = getattr(ServerHandler.connection_state, "client_ip", "")
+    try:
+        ip = ip_address(address)
+    except ValueError:
+        return False  # Unknown address, e.g. a unix socket
+    return any(ip in net for net in MetricsController.allowed)
+
+
+@Endpoint(MetricsLeaf)
+def metrics(ctx: EndpointContext) -> None:
+    """Provides the metrics of this process in the Prometheus text format.
+
+    Args:
+        ctx: The context of the request.
+    """
+    ctx.ok("text/plain; version=0.0.4; charset=utf-8", render_all())
@@ -21,11 +21,13 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
-from typing import List, Optional, Tuple
+from os.path import getsize
+from typing import List, Optional, Tuple, Union
 from uuid import uuid4
 
 from nussschale.leafs.controller import Controller
 from nussschale.leafs.endpoint import Endpoint, EndpointContext, HTTPException
+from nussschale.util.fileresponse import FileResponse
 
 
 def _get_file_name(path: List[str]) -> Optional[Tuple[str, str]]:
@@ -81,6 +83,8 @@ class ResourceController(Controller):
 
     Class Attributes:
         max_cache: The TTL for cache items that will be sent.
+        stream_size: The minimum size of files that are sent without being
+            read into memory.
         etag: The E-Tag that will be sent for resource requests.
         registry: A mapping of file extensions to media types.
     """
@@ -88,6 +92,9 @@ class ResourceController(Controller):
     # The maximum number of seconds for which a resource is cached.
     max_cache = 3 * 60  # 3 minutes
 
+    # Smaller files are read into memory, which allows them to be compressed
+    stream_size = 64 * 1024  # 64 KiB
+
     # Use the same ETag for all requests. Because the ETag is regenerated
     # when the application is restarted, cache is only kept for as long
     # as the application is running (which should be fine in production
@@ -101,7 +108,10 @@ class ResourceController(Controller):
                 "txt": "text/plain; charset=utf-8",
                 "ico": "image/x-icon",
                 "jpg": "image/jpeg",
-                "svg": "image/svg+xml"}
+                "svg": "image/svg+xml",
+                "woff": "font/woff",
+                "woff2": "font/woff2",
+                "ttf": "font/ttf"}
 
 
 ResourceLeaf = ResourceController()
@@ -140,8 +150,11 @@ def resource_dealer(ctx: EndpointContext) -> None:
     file, ext = query
     mime = ResourceController.registry.get(ext, "application/octet-stream")
     try:
-        with open(file, "rb") as f:
-            r = f.read()
+        if getsize(file) >= ResourceController.stream_size:
+            r = FileResponse(file)  # type: Union[bytes, FileResponse]
+        else:
+            with open(file, "rb") as f:
+                r = f.read()
     except OSError:
         raise HTTPException.not_found()
 
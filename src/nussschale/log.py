@@ -21,43 +21,119 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 
 Module Deadlock Guarantees:
-    When the logger's mutex is locked no other locks can be requested.
+    When the logger's mutex is locked only the lock of the log queue can be
+    requested, which allows no other locks to be requested.
     Thus the logger's mutex can not be part of any deadlock.
 """
 
-from logging import ERROR, FileHandler, Formatter, INFO, Logger, getLogger
-from os import mkdir, remove, rename
+from atexit import register
+from gzip import open as gzip_open
+from json import dumps
+from logging import ERROR, Formatter, INFO, Logger, LogRecord, getLogger
+from logging.handlers import QueueHandler
+from os import fstat, getpid, mkdir, remove, rename, stat
 from os.path import isfile
-from threading import RLock
+from queue import Empty, Full, Queue
+from random import random
+from shutil import copyfileobj
+from threading import RLock, Thread
+from time import time
 from traceback import extract_tb
+from typing import Any, Callable, Dict, IO, List, Optional, Union
 
 from nussschale.util.locks import mutex
 
 
+# An entry of the log queue: A record, several records that are written
+# together or None to stop the writer
+_QueueEntry = Optional[Union[LogRecord, List[LogRecord]]]
+
+
 class Log:
-    """Provides logging utilities and log rotation."""
+    """Provides logging utilities and log rotation.
+
+    Messages are written by a writer thread, logging never waits for the
+    disk. When the log queue is full, messages are dropped and counted.
+
+    The writer thread also rotates the log when it exceeds its size or age.
+    Forked processes write to the same log, only the process that set up
+    the log rotates it and the other processes follow. The size of the log
+    file includes the writes of all processes, it is checked at least once
+    per second.
+    """
 
     # The logger itself
     _logger = None  # type: Logger
 
+    # All logs that were set up
+    _logs = []  # type: List[Log]
+
+    # The maximum number of queued log entries
+    _QUEUE_SIZE = 10000
+
+    # The maximum number of log entries written at once
+    _BATCH_SIZE = 256
+
+    # The maximum time between two rotation checks, in seconds
+    _CHECK_INTERVAL = 1
+
     def __init__(self) -> None:
         """Constructor."""
-        # MutEx to enable multiple connections logging at the same time
-        # Locking this MutEx can't cause any other MutExes to be locked.
+        # MutEx for the writer thread and the drop counter
+        # Locking this MutEx can cause the log queue's lock to be locked.
         self._lock = RLock()
         # The number of logs that are kept
         self._storage = 3
+        # The queue of log entries that are not yet written
+        self._queue = Queue(Log._QUEUE_SIZE)  # type: Queue[_QueueEntry]
+        # The handler that puts the log records into the queue
+        self._handler = _DroppingQueueHandler(self._queue, self._drop)
+        # The formatter for the log records
+        self._formatter = Formatter("[%(asctime)s %(levelname)s] %(message)s")
+        # The name of the log file
+        self._name = "log"
+        # The maximum size of a log file in bytes, 0 for no limit
+        self._max_size = 0
+        # The maximum age of a log file in seconds, 0 for no limit
+        self._interval = 0
+        # Whether rotated log files are compressed
+        self._compress = False
+        # The process which rotates the log
+        self._pid = getpid()
+        # The log file and its state, only used by the writer thread
+        self._file = None  # type: Optional[IO[bytes]]
+        self._opened = 0.0
+        self._checked = 0.0
+        # The thread compressing the last rotated log file, if any
+        self._compressor = None  # type: Optional[Thread]
+        # The writer thread, if it is running
+        self._writer = None  # type: Optional[Thread]
+        # The number of dropped log entries
+        self._dropped = 0
+        # The number of dropped log entries that were reported in the log
+        self._reported = 0
 
-    def setup(self, name: str, storage: int) -> None:
+    def setup(self, name: str, storage: int, max_size: int=0,
+              interval: int=0, compress: bool=False) -> None:
         """Setup the logger with the given name and log roll setting.
 
         Args:
             name: The name of the log file.
             storage: The number of log files that should be kept in the
                 log directory.
+            max_size: The size in bytes after which the log is rotated, 0
+                for no limit.
+            interval: The number of seconds after which the log is rotated,
+                0 for no limit.
+            compress: Whether rotated log files are compressed with gzip.
         """
         self._logger = getLogger("%s_log" % name)
         self._storage = storage
+        self._name = name
+        self._max_size = max_size
+        self._interval = interval
+        self._compress = compress
+        self._pid = getpid()
 
         # Create the log directory
         try:
@@ -66,34 +142,91 @@ class Log:
             pass  # Already exists
 
         # Setup the logger itself
-        formatter = Formatter("[%(asctime)s %(levelname)s] %(message)s")
-        handler = FileHandler(Log._log_roll(name, self._storage))
-        handler.setFormatter(formatter)
-        self._logger.addHandler(handler)
+        self._open(Log._log_roll(name, self._storage))
+        self._compress_rotated()
+        self._logger.addHandler(self._handler)
         self._logger.setLevel(INFO)
 
+        # Write the remaining log entries when the application exits
+        Log._logs.append(self)
+        self.start()
+        register(self.stop)
+
+    @staticmethod
+    def start_all() -> None:
+        """Starts the writer threads of all logs.
+
+        Contract:
+            This method locks the loggers' locks, one at a time.
+        """
+        for log in Log._logs:
+            log.start()
+
+    @staticmethod
+    def stop_all() -> None:
+        """Writes all queued log entries and stops all writer threads.
+
+        Contract:
+            This method locks the loggers' locks and the log queues' locks,
+            one log at a time.
+        """
+        for log in Log._logs:
+            log.stop()
+
     @mutex
+    def start(self) -> None:
+        """Starts the writer thread.
+
+        Contract:
+            This method locks the logger's lock.
+        """
+        if self._writer is not None:
+            return
+        self._writer = Thread(target=self._write, name="log writer",
+                              daemon=True)
+        self._writer.start()
+
+    @mutex
+    def stop(self) -> None:
+        """Writes all queued log entries and stops the writer thread.
+
+        Log entries that are logged afterwards are written once the writer
+        thread is started again. Stopping the writer before forking ensures
+        that the child process does not inherit queued entries.
+
+        Contract:
+            This method locks the logger's lock and the log queue's lock.
+        """
+        if self._writer is None:
+            return
+        self._queue.put(None)
+        self._writer.join()
+        self._writer = None
+
     def log_error(self, e: Exception, ctx: str) -> None:
         """Logs an error.
 
+        The lines of the error report are written together.
+
         Args:
             e: The error that occurred.
             ctx: The context where the error occurred.
 
         Contract:
-            This method locks the logger's lock.
+            This method may lock the logger's lock and the log queue's lock.
         """
-        self.log("Error in code for %s:" % ctx)
-        self.log("===[ERROR REPORT]===")
+        lines = ["Error in code for %s:" % ctx, "===[ERROR REPORT]==="]
         for entry in extract_tb(e.__traceback__):
-            self.log("In file %s:%i in %s: %s" % (entry.filename,
-                                                  entry.lineno,
-                                                  entry.name,
-                                                  entry.line))
-        self.log("%s was raised: %r" % (str(e), e.args))
-        self.log("====[END REPORT]====")
+            lines.append("In file %s:%i in %s: %s" % (entry.filename,
+                                                      entry.lineno,
+                                                      entry.name,
+                                                      entry.line))
+        lines.append("%s was raised: %r" % (str(e), e.args))
+        lines.append("====[END REPORT]====")
+        self._handler.enqueue([self._logger.makeRecord(
+            self._logger.name, INFO, "", 0, line, (), None)
+            for line in lines])
 
-    @mutex
     def log(self, msg: str) -> None:
         """Logs a non-critical message.
 
@@ -101,11 +234,10 @@ class Log:
             msg: The message that should be logged.
 
         Contract:
-            This method locks the logger's lock.
+            This method may lock the logger's lock and the log queue's lock.
         """
         self._logger.log(msg=msg, level=INFO)  # type: ignore
 
-    @mutex
     def error(self, msg: str) -> None:
         """Logs a message that describes an error or a critical condition.
 
@@ -113,10 +245,153 @@ class Log:
             msg: The message that should be logged.
 
         Contract:
-            This method locks the logger's lock.
+            This method may lock the logger's lock and the log queue's lock.
         """
         self._logger.log(msg=msg, level=ERROR)  # type: ignore
 
+    @mutex
+    def get_dropped(self) -> int:
+        """Retrieves the number of log entries dropped due to a full queue.
+
+        Returns:
+            The number of dropped log entries.
+
+        Contract:
+            This method locks the logger's lock.
+        """
+        return self._dropped
+
+    @mutex
+    def _drop(self) -> None:
+        """Counts a log entry that was dropped due to a full queue.
+
+        Contract:
+            This method locks the logger's lock.
+        """
+        self._dropped += 1
+
+    def _write(self) -> None:
+        """Writes the queued log entries until the writer is stopped.
+
+        Entries are written in batches, the log file is flushed once per
+        batch.
+        """
+        assert self._file is not None
+        while True:
+            try:
+                batch = [self._queue.get(timeout=Log._CHECK_INTERVAL)]
+            except Empty:
+                # Other processes might have filled the log in the meantime
+                try:
+                    self._check_rotation()
+                except OSError:
+                    pass  # Nowhere to report this
+                continue
+            while len(batch) < Log._BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except Empty:
+                    break
+
+            lines = []  # type: List[str]
+            stop = False
+            for entry in batch:
+                if entry is None:
+                    stop = True
+                elif isinstance(entry, list):
+                    lines.extend(self._formatter.format(record)
+                                 for record in entry)
+                else:
+                    lines.append(self._formatter.format(entry))
+
+            # Report dropped entries, the counter is read atomically
+            dropped = self._dropped
+            if dropped != self._reported:
+                lines.append(self._formatter.format(self._logger.makeRecord(
+                    self._logger.name, ERROR, "", 0,
+                    "%i log messages were dropped" % (dropped
+                                                      - self._reported),
+                    (), None)))
+                self._reported = dropped
+
+            if lines:
+                data = ("\n".join(lines) + "\n").encode()
+                try:
+                    self._file.write(data)
+                    self._file.flush()
+                    self._check_rotation()
+                except OSError:
+                    pass  # Nowhere to report this
+            if stop:
+                return
+
+    def _open(self, path: str) -> None:
+        """Opens the log file, which is appended to.
+
+        Args:
+            path: The path of the log file.
+        """
+        self._file = open(path, "ab")
+        self._opened = time()
+
+    def _check_rotation(self) -> None:
+        """Rotates the log if it is too large or too old.
+
+        Processes that did not set up the log reopen it when it was rotated.
+        """
+        assert self._file is not None
+        now = time()
+        if getpid() != self._pid:
+            # Check at most once per second
+            if now - self._checked < 1:
+                return
+            self._checked = now
+            path = "./logs/%s.0.log" % self._name
+            try:
+                rotated = (stat(path).st_ino
+                           != fstat(self._file.fileno()).st_ino)
+            except OSError:
+                rotated = True
+            if rotated:
+                self._file.close()
+                self._open(path)
+            return
+
+        # The file is shared, its size includes the writes of all processes
+        size = fstat(self._file.fileno()).st_size
+        if ((0 < self._max_size <= size)
+                or (0 < self._interval <= now - self._opened)):
+            self._file.close()
+            if self._compressor is not None:
+                self._compressor.join()  # Do not rename while compressing
+            self._open(Log._log_roll(self._name, self._storage))
+            self._compress_rotated()
+
+    def _compress_rotated(self) -> None:
+        """Compresses the last rotated log file in the background."""
+        path = "./logs/%s.1.log" % self._name
+        if self._compress and isfile(path):
+            self._compressor = Thread(target=Log._compress_file,
+                                      args=(path,), name="log compressor",
+                                      daemon=True)
+            self._compressor.start()
+
+    @staticmethod
+    def _compress_file(path: str) -> None:
+        """Compresses a log file with gzip, replacing it.
+
+        Args:
+            path: The path of the log file.
+        """
+        try:
+            with open(path, "rb") as src:
+                with gzip_open(path + ".gz.tmp", "wb") as dst:
+                    copyfileobj(src, dst)
+            rename(path + ".gz.tmp", path + ".gz")
+            remove(path)
+        except OSError:
+            pass  # The uncompressed log file is kept
+
     @staticmethod
     def _log_roll(keyword: str, storage: int=5) -> str:
         """Deletes and renames old log files and finds a new log file name.
@@ -132,14 +407,92 @@ class Log:
         fmt = "./logs/%s.%%i.log" % keyword
 
         # Change the name of every log file so that the first id is no longer
-        # taken
+        # taken. Log files may be compressed.
         for i in range(storage)[::-1]:
-            if isfile(fmt % i):
-                rename(fmt % i, fmt % (i + 1))
+            for ext in ("", ".gz"):
+                if isfile(fmt % i + ext):
+                    rename(fmt % i + ext, fmt % (i + 1) + ext)
 
         # Remove the last logfile if it exists
-        if isfile(fmt % storage):
-            remove(fmt % storage)
+        for ext in ("", ".gz"):
+            if isfile(fmt % storage + ext):
+                remove(fmt % storage + ext)
 
         # Return the final file name, with ID 0 (this name is now free)
         return fmt % 0
+
+
+class AccessLog(Log):
+    """Records a sample of the handled requests as JSON lines."""
+
+    def __init__(self, rate: float) -> None:
+        """Constructor.
+
+        Args:
+            rate: The fraction of requests that are recorded.
+        """
+        super().__init__()
+        self._formatter = _JSONFormatter()
+        # The fraction of requests that are recorded
+        self._rate = rate
+
+    def record(self, entry: Dict[str, Any]) -> None:
+        """Records a request, if it is part of the sample.
+
+        The entry is serialized by the writer thread.
+
+        Args:
+            entry: The data of the request.
+
+        Contract:
+            This method may lock the logger's lock and the log queue's lock.
+        """
+        if self._rate < 1 and random() >= self._rate:
+            return
+        self._handler.enqueue(self._logger.makeRecord(
+            self._logger.name, INFO, "", 0, entry, (), None))
+
+
+class _JSONFormatter(Formatter):
+    """Formats log records as JSON objects."""
+
+    def format(self, record: LogRecord) -> str:
+        """Formats a log record.
+
+        Args:
+            record: The log record, with a dictionary or string message.
+
+        Returns:
+            The record as a JSON object, including the time of the record.
+        """
+        entry = record.msg
+        if not isinstance(entry, dict):
+            entry = {"message": record.getMessage()}
+        return dumps(dict(entry, time=round(record.created, 3)))
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """Puts log records into the log queue, dropping them if it is full."""
+
+    def __init__(self, queue: "Queue[_QueueEntry]",
+                 drop: Callable[[], None]) -> None:
+        """Constructor.
+
+        Args:
+            queue: The log queue.
+            drop: Called for every record that is dropped.
+        """
+        super().__init__(queue)
+        # Counts the dropped records
+        self._drop = drop
+
+    def enqueue(self, record: _QueueEntry) -> None:
+        """Puts a log entry into the queue without waiting.
+
+        Args:
+            record: The log entry.
+        """
+        try:
+            self.queue.put_nowait(record)
+        except Full:
+            self._drop()
@@ -26,15 +26,18 @@ import readline  # noqa: Replaces default 'input' function
 from os import mkdir
 from os.path import isdir
 from sys import exit
-from typing import List, TYPE_CHECKING, Tuple
+from typing import List, Optional, Set, TYPE_CHECKING, Tuple
 
 from nussschale.config import Config
 from nussschale.log import Log
 from nussschale.util.commands import Command
+from nussschale.util.locks import enable_checking, enable_profiling
+from nussschale.util.profiler import Sampler  # noqa: Registers commands
 
 
 if TYPE_CHECKING:
     from nussschale.leafs.controller import Controller
+    from nussschale.supervisor import Supervisor
 
 
 class Nussschale:
@@ -56,6 +59,7 @@ class Nussschale:
         # Late import to prevent circular dependencies
         from nussschale.webserver import Webserver
         from nussschale.leafs.master import MasterController
+        from nussschale.leafs.metrics import MetricsLeaf
         from nussschale.leafs.resource import ResourceLeaf
 
         print("Setting up environment...")
@@ -66,16 +70,32 @@ class Nussschale:
 
         # Setup configuration
         Nussschale.nconfig = Config()
+        enable_profiling(Nussschale.nconfig.get("lock_profiling", False))
+        enable_checking(Nussschale.nconfig.get("lock_checking", False))
 
         # Setup logging
         Nussschale.nlog = Log()
-        Nussschale.nlog.setup("nussschale", 4)
+        Nussschale.nlog.setup(
+            "nussschale", 4,
+            max_size=Nussschale.nconfig.get("log_max_size", 16 * 1024 * 1024),
+            interval=Nussschale.nconfig.get("log_rotate_interval", 24 * 3600),
+            compress=Nussschale.nconfig.get("log_compress", True))
         nlog().log("Starting Nussschale...")
 
         # Setup web server
         self._webserver = Webserver()
         self._master = MasterController()
         self._master.add_leaf("res", ResourceLeaf)
+        if Nussschale.nconfig.get("metrics", False):
+            MetricsLeaf.configure(Nussschale.nconfig.get(
+                "metrics_allow", "127.0.0.1/32,::1/128"))
+            self._master.add_leaf("metrics", MetricsLeaf)
+
+        # The supervisor of the worker processes, if there are several
+        self._supervisor = None  # type: Optional[Supervisor]
+
+        # The leafs that access application state
+        self._owned = set()  # type: Set[str]
 
         # Check whether the webserver should be started or whether it is just
         # an initialization run
@@ -85,13 +105,31 @@ class Nussschale:
             return
 
     def start_server(self) -> None:
-        """Starts the internal web server."""
+        """Starts the internal web server.
+
+        If more than one worker is configured, the server runs in several
+        worker processes behind a router instead. If more than one listener
+        is configured, several processes serve the leafs that do not access
+        application state and forward all other requests to this process.
+        """
         from nussschale.handler import ServerHandler
+        from nussschale.supervisor import ListenerSupervisor, \
+            RoutingSupervisor
 
-        # Set the master for the server handler
+        # Set the master and the connection settings for the server handler
         ServerHandler.set_master(self._master)
-
-        self._webserver.start()
+        ServerHandler.configure()
+
+        workers = Nussschale.nconfig.get("workers", 1)
+        listeners = Nussschale.nconfig.get("listeners", 1)
+        if workers > 1:
+            self._supervisor = RoutingSupervisor(workers)
+            self._supervisor.start()
+        elif listeners > 1:
+            self._supervisor = ListenerSupervisor(listeners - 1, self._owned)
+            self._supervisor.start()
+        else:
+            self._webserver.start()
         nlog().log("Up and running!")
 
     def add_leafs(self, leafs: List[Tuple["Controller", str]]) -> None:
@@ -103,6 +141,17 @@ class Nussschale:
         for controller, leaf in leafs:
             self._master.add_leaf(leaf, controller)
 
+    def set_owned_leafs(self, leafs: List[str]) -> None:
+        """Sets the leafs that access application state.
+
+        When several listener processes serve requests, only this process
+        serves these leafs.
+
+        Args:
+            leafs: The leafs that access application state.
+        """
+        self._owned = set(leafs)
+
     def run(self) -> None:
         """Runs the minimal console."""
         try:
@@ -128,12 +177,19 @@ class Nussschale:
                           " commands.")
                     continue
                 Command.commands[inp].invoke()
+
+                # Worker processes run the commands on their own state
+                if self._supervisor is not None and inp != "help":
+                    self._supervisor.invoke(inp)
         finally:
             # Clean up
             print("Shutting down...")
             print("Please be patient while clients"
                   " are gracefully disconnected.")
-            self._webserver.stop()
+            if self._supervisor is not None:
+                self._supervisor.stop()
+            else:
+                self._webserver.stop()
 
 
 @Command("quit", "Stops the application.")
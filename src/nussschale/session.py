@@ -21,19 +21,32 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 
 Module Deadlock Guarantees:
-    The session pool mutex allows no other locks to be requested and therefor
-    can not be part of any deadlock.
+    The following lock dependencies are introduced by this module:
+        Session Pool Lock -> Configuration Lock
+
+    The configuration lock allows no other locks to be requested. Thus the
+    session pool lock can not be part of any deadlock.
     The session data mutex allows no other locks to be requested and therefor
     can not be part of any deadlock.
 """
 
+import hmac
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from hashlib import sha256
+from json import dumps, loads
 from threading import RLock
 from time import time
-from typing import Any, Dict, Tuple
+from typing import Any, Dict, Optional, Tuple
 from uuid import uuid4
 
 from nussschale.nussschale import nconfig
-from nussschale.util.locks import mutex, named_mutex
+from nussschale.util.locks import declare_order, mutex, named_mutex
+from nussschale.util.metrics import Gauge
+
+
+# The lock dependencies of this module, see the deadlock guarantees
+declare_order("Session._pool_lock", "Config._lock")
 
 
 class Session:
@@ -44,6 +57,7 @@ class Session:
             exists.
         data: The session's data. The data object itself should not be
             overwritten.
+        created: The time the session was created.
     """
 
     # The MutEx for the session pool
@@ -53,6 +67,61 @@ class Session:
     # The session pool, all currently existing sessions
     _sessions = {}  # type: Dict[str, Session]
 
+    # The key for signing stateless sessions, None if sessions are pooled
+    _secret = None  # type: Optional[bytes]
+
+    @classmethod
+    def enable_stateless(cls, secret: bytes) -> None:
+        """Makes sessions stateless.
+
+        Stateless sessions are not kept in the session pool. Instead, the
+        whole session is stored in the session cookie, signed with the given
+        key, so that every process knowing the key can restore the session.
+
+        Args:
+            secret: The key used for signing the session cookies.
+        """
+        Session._secret = secret
+
+    @classmethod
+    def is_stateless(cls) -> bool:
+        """Checks whether sessions are stateless.
+
+        Returns:
+            Whether sessions are stored in the session cookie.
+        """
+        # Locking is not needed here as access is atomic.
+        return Session._secret is not None
+
+    @classmethod
+    def decode_cookie(cls, value: str) -> Optional[Dict[str, Any]]:
+        """Decodes the session cookie of a stateless session.
+
+        Args:
+            value: The value of the session cookie.
+
+        Returns:
+            The decoded session (with the keys 'sid', 'ip', 'expires',
+            'created' and 'data') or None if the cookie is malformed or not
+            signed correctly.
+        """
+        secret = Session._secret
+        if secret is None or "." not in value:
+            return None
+        payload, signature = value.rsplit(".", 1)
+        expected = hmac.new(secret, payload.encode(), sha256).hexdigest()
+        if not hmac.compare_digest(signature, expected):
+            return None
+        padding = "=" * (-len(payload) % 4)
+        try:
+            state = loads(urlsafe_b64decode(payload + padding).decode())
+        except (BinasciiError, UnicodeDecodeError, ValueError):
+            return None
+        if not isinstance(state, dict) or not isinstance(state.get("data"),
+                                                         dict):
+            return None
+        return state
+
     @classmethod
     @named_mutex("_pool_lock")
     def add_session(cls, sid: str, session: "Session") -> None:
@@ -64,6 +133,17 @@ class Session:
         """
         Session._sessions[sid] = session
 
+    @classmethod
+    def count_active(cls) -> int:
+        """Counts the sessions in the session pool that are not expired.
+
+        Returns:
+            The number of active pooled sessions, 0 for stateless sessions.
+        """
+        # Locking is not needed here as copying the pool is atomic.
+        return sum(1 for session in list(Session._sessions.values())
+                   if not session.is_expired())
+
     @classmethod
     @named_mutex("_pool_lock")
     def get_session(cls, ip: str, sid: str=None) -> Tuple["Session", bool]:
@@ -95,6 +175,15 @@ class Session:
         if sid is None:
             return Session(ip), True
 
+        # Stateless sessions are restored from the cookie
+        if Session.is_stateless():
+            state = Session.decode_cookie(sid)
+            if (state is None or state["expires"] <= time()
+                    or state["ip"] != ip):
+                return Session(ip), True
+            return Session(ip, state["sid"], state["data"],
+                           state.get("created")), False
+
         # Unknown SID -> new session
         if sid not in Session._sessions:
             return Session(ip), True
@@ -112,25 +201,57 @@ class Session:
             create = True
         return session, create
 
-    def __init__(self, ip: str) -> None:
+    def __init__(self, ip: str, sid: Optional[str]=None,
+                 data: Optional[Dict[str, Any]]=None,
+                 created: Optional[float]=None) -> None:
         """Constructor.
 
         Args:
             ip: The IP address of the owner of the session.
+            sid: The ID of a restored stateless session, None for a new
+                session.
+            data: The data of a restored stateless session.
+            created: The creation time of a restored stateless session.
         """
         # Generate a random session ID and store the session owner's IP
-        self.sid = str(uuid4())
+        self.sid = sid or str(uuid4())
         self._ip = ip
 
+        # The time the session was created
+        self.created = created or time()
+
         # Expires X minutes into the future
         self._expires = 0
         self.refresh()
 
         # Initialize session data
-        self.data = SessionData()
+        self.data = SessionData(data)
 
-        # Insert this session into the pool
-        Session.add_session(self.sid, self)
+        # Insert this session into the pool, stateless sessions are kept in
+        # the session cookie instead
+        if not Session.is_stateless():
+            Session.add_session(self.sid, self)
+
+    def get_cookie(self) -> str:
+        """Retrieves the value of the session cookie for this session.
+
+        Returns:
+            The session ID for pooled sessions, the signed session for
+            stateless sessions.
+        """
+        secret = Session._secret
+        if secret is None:
+            return self.sid
+        state = {"sid": self.sid,
+                 "ip": self._ip,
+                 "expires": self._expires,
+                 "created": self.created,
+                 "data": self.data.to_dict()}
+        # The padding is stripped as it is not allowed in cookie values
+        payload = urlsafe_b64encode(dumps(state).encode()).decode()
+        payload = payload.rstrip("=")
+        signature = hmac.new(secret, payload.encode(), sha256).hexdigest()
+        return "%s.%s" % (payload, signature)
 
     def is_expired(self) -> bool:
         """Checks whether this session is past its expiration date.
@@ -160,17 +281,39 @@ class Session:
         self._expires = time() + expire_time * 60
 
 
+@Gauge("nussschale_sessions", "The active sessions.")
+def count_sessions() -> Dict[Tuple[str, ...], float]:
+    """Provides the number of active sessions for the metrics."""
+    return {(): Session.count_active()}
+
+
 class SessionData:
     """Represents session data as a thread-safe dictionary."""
 
-    def __init__(self) -> None:
-        """Constructor."""
+    def __init__(self, data: Optional[Dict[str, Any]]=None) -> None:
+        """Constructor.
+
+        Args:
+            data: The initial entries of the session data.
+        """
         # The MutEx for the session data
         # Locking this MutEx can't cause any other MutExes to be locked.
         self._lock = RLock()
 
         # The internals of the session data
-        self._internal = {}  # type: Dict[Any, Any]
+        self._internal = dict(data or {})  # type: Dict[Any, Any]
+
+    @mutex
+    def to_dict(self) -> Dict[Any, Any]:
+        """Retrieves a copy of all entries of the session data.
+
+        Returns:
+            The entries of the session data.
+
+        Contract:
+            This method will lock the session's data lock.
+        """
+        return dict(self._internal)
 
     @mutex
     def remove(self, key: Any) -> None:
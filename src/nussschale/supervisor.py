@@ -0,0 +1,637 @@
+"""Part of Nussschale.
+
+MIT License
+Copyright (c) 2017-2018 LordKorea
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+Module Deadlock Guarantees:
+    The supervisors, the router and the upstreams do not use any locks. Thus
+    they can not be part of any deadlock.
+"""
+
+import cgi
+import os
+from abc import ABC, abstractmethod
+from http.client import HTTPConnection, HTTPException
+from http.cookies import CookieError, SimpleCookie
+from http.server import BaseHTTPRequestHandler
+from io import BytesIO
+from itertools import count
+from json import dumps, loads
+from select import select
+from socket import AF_UNIX, SOCK_STREAM, socket
+from threading import local
+from typing import Any, Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qs
+
+from nussschale.handler import ForwardedHandler, ServerHandler
+from nussschale.log import Log
+from nussschale.nussschale import nconfig, nlog
+from nussschale.session import Session
+from nussschale.util.commands import Command
+from nussschale.util.compression import compress, is_compressible
+from nussschale.util.workers import Affinity, Merge, WorkerSetup
+from nussschale.webserver import Webserver
+
+
+# A response of an upstream server: (status, headers, body)
+_Response = Tuple[int, List[Tuple[str, str]], bytes]
+
+# Headers that are not forwarded between the client and the workers
+_HOP_HEADERS = {"connection", "keep-alive", "proxy-authenticate",
+                "proxy-authorization", "te", "trailers", "transfer-encoding",
+                "upgrade", "content-length", "server", "date",
+                "x-forwarded-for", "x-real-ip"}
+
+
+class Supervisor(ABC):
+    """Runs the web server in several forked worker processes.
+
+    Workers stop when the command pipe to the supervisor is closed, console
+    commands are sent to them through the same pipe.
+    """
+
+    def __init__(self, workers: int) -> None:
+        """Constructor.
+
+        Args:
+            workers: The number of worker processes.
+        """
+        # The number of worker processes
+        self._count = workers
+
+        # The public port
+        self._port = nconfig().get("port", 8091)
+
+        # The process IDs of the workers and the pipes used for sending
+        # console commands to them
+        self._pids = []  # type: List[int]
+        self._pipes = []  # type: List[int]
+
+        # The web servers of the supervisor process
+        self._servers = []  # type: List[Webserver]
+
+    def start(self) -> None:
+        """Starts the worker processes and the servers of the supervisor.
+
+        Contract:
+            This method must be called before any other thread is started, as
+            the worker processes are forked.
+        """
+        Session.enable_stateless(os.urandom(32))
+
+        # The log writer threads are not inherited by forked processes
+        Log.stop_all()
+        for index in range(self._count):
+            read, write = os.pipe()
+            pid = os.fork()
+            if pid == 0:
+                # Worker process, does not return
+                os.close(write)
+                for pipe in self._pipes:
+                    os.close(pipe)
+                self._run_worker(index, read)
+            os.close(read)
+            self._pids.append(pid)
+            self._pipes.append(write)
+        Log.start_all()
+        nlog().log("Started %i worker processes" % self._count)
+
+        self._servers = self._create_servers()
+        for server in self._servers:
+            server.start()
+
+    def invoke(self, name: str) -> None:
+        """Invokes a console command in all worker processes.
+
+        Args:
+            name: The name of the command.
+        """
+        for pipe in self._pipes:
+            try:
+                os.write(pipe, ("%s\n" % name).encode())
+            except OSError:
+                pass  # The worker is gone
+
+    def stop(self) -> None:
+        """Stops the servers of the supervisor and all worker processes."""
+        for server in self._servers:
+            server.stop()
+
+        # Workers stop when their command pipe is closed
+        for pipe in self._pipes:
+            os.close(pipe)
+        for pid in self._pids:
+            os.waitpid(pid, 0)
+        self._pipes = []
+        self._pids = []
+
+    @abstractmethod
+    def _create_servers(self) -> List[Webserver]:
+        """Creates the web servers of the supervisor process.
+
+        Returns:
+            The web servers, not yet started.
+        """
+
+    @abstractmethod
+    def _create_worker_server(self, index: int) -> Webserver:
+        """Creates the web server of a worker process.
+
+        Args:
+            index: The index of the worker.
+
+        Returns:
+            The web server, not yet started.
+        """
+
+    def _run_worker(self, index: int, commands: int) -> None:
+        """Runs a worker process.
+
+        The worker serves requests until its command pipe is closed. In the
+        meantime it runs the console commands sent through the pipe and the
+        heartbeats, once per second.
+
+        Args:
+            index: The index of the worker.
+            commands: The reading end of the command pipe.
+        """
+        code = 0
+        Log.start_all()
+        try:
+            server = self._create_worker_server(index)
+            server.start()
+
+            pending = b""
+            while True:
+                ready, _, _ = select([commands], [], [], 1)
+                if ready:
+                    data = os.read(commands, 1024)
+                    if data == b"":
+                        break  # The supervisor stopped
+                    pending += data
+                    while b"\n" in pending:
+                        line, pending = pending.split(b"\n", 1)
+                        name = line.decode()
+                        if name in Command.commands:
+                            Command.commands[name].invoke()
+                ServerHandler.do_heartbeat()
+            server.stop()
+        except Exception as e:
+            nlog().log_error(e, "worker %i" % index)
+            code = 1
+        finally:
+            # Exit handlers are not run, so the logs are written here
+            Log.stop_all()
+            os._exit(code)
+
+
+class RoutingSupervisor(Supervisor):
+    """Runs the application in several worker processes behind a router.
+
+    Every worker has its own web server, which listens on the loopback
+    interface on one of the ports following the configured port. The router
+    listens on the configured port and forwards every request to the worker
+    selected by the affinity function.
+    """
+
+    def _create_servers(self) -> List[Webserver]:
+        """Creates the router.
+
+        Returns:
+            The router, not yet started.
+        """
+        RouterHandler.timeout = ServerHandler.timeout
+        RouterHandler.upstreams = [Upstream(port=self._port + 1 + index)
+                                   for index in range(self._count)]
+        return [Webserver(RouterHandler)]
+
+    def _create_worker_server(self, index: int) -> Webserver:
+        """Runs the worker setups and creates the web server of a worker.
+
+        Args:
+            index: The index of the worker.
+
+        Returns:
+            The web server, not yet started.
+        """
+        for setup in WorkerSetup.setups:
+            setup(index, self._count)
+        return Webserver(ForwardedHandler, "127.0.0.1",
+                         self._port + 1 + index, False)
+
+
+class ListenerSupervisor(Supervisor):
+    """Serves stateless leafs in several processes sharing the public port.
+
+    The supervisor and the worker processes all listen on the configured
+    port, the kernel distributes the connections among them. The supervisor
+    is the owner of the application state: Workers serve the leafs that do
+    not access application state themselves and forward requests for all
+    other leafs to the supervisor over a Unix socket.
+    """
+
+    # The Unix socket of the supervisor
+    _SOCKET = "./data/owner.sock"
+
+    def __init__(self, workers: int, owned: Set[str]) -> None:
+        """Constructor.
+
+        Args:
+            workers: The number of worker processes.
+            owned: The leafs that access application state.
+        """
+        super().__init__(workers)
+        LeafHandler.owned = owned
+
+    def invoke(self, name: str) -> None:
+        """Does nothing, as the workers hold no application state.
+
+        Args:
+            name: The name of the command.
+        """
+        pass
+
+    def _create_servers(self) -> List[Webserver]:
+        """Creates the public server and the Unix socket server.
+
+        Returns:
+            The servers of the supervisor, not yet started.
+        """
+        return [Webserver(reuse_port=True),
+                Webserver(ForwardedHandler,
+                          unix_path=ListenerSupervisor._SOCKET)]
+
+    def _create_worker_server(self, index: int) -> Webserver:
+        """Creates the public server of a worker.
+
+        Args:
+            index: The index of the worker.
+
+        Returns:
+            The web server, not yet started.
+        """
+        LeafHandler.owner = Upstream(path=ListenerSupervisor._SOCKET)
+        return Webserver(LeafHandler, reuse_port=True)
+
+
+class _UnixHTTPConnection(HTTPConnection):
+    """A HTTP connection over a Unix socket."""
+
+    def __init__(self, path: str, timeout: float) -> None:
+        """Constructor.
+
+        Args:
+            path: The path of the Unix socket.
+            timeout: The timeout of the connection.
+        """
+        super().__init__("localhost", timeout=timeout)
+        self._path = path
+
+    def connect(self) -> None:
+        """Connects to the Unix socket."""
+        self.sock = socket(AF_UNIX, SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self._path)
+
+
+class Upstream:
+    """A local server that requests are forwarded to.
+
+    Every thread keeps its own connection to the server open.
+    """
+
+    def __init__(self, port: int=0, path: Optional[str]=None) -> None:
+        """Constructor.
+
+        Args:
+            port: The port of the server on the loopback interface.
+            path: The path of the Unix socket of the server, used instead of
+                the port.
+        """
+        self._port = port
+        self._path = path
+
+        # The connections of the threads
+        self._connections = local()
+
+    def forward(self, handler: BaseHTTPRequestHandler, body: bytes,
+                identity: bool=False) -> _Response:
+        """Forwards a request to the server.
+
+        Args:
+            handler: The handler of the request.
+            body: The body of the request.
+            identity: Whether the response must not be compressed.
+
+        Returns:
+            The response of the server.
+        """
+        headers = {key: value for key, value in handler.headers.items()
+                   if key.lower() not in _HOP_HEADERS}
+        if identity:
+            headers = {key: value for key, value in headers.items()
+                       if key.lower() != "accept-encoding"}
+        headers["X-Forwarded-For"] = ServerHandler.resolve_client_ip(
+            handler.client_address[0], handler.headers)
+        headers["Content-Length"] = str(len(body))
+
+        # A closed connection is retried once
+        for attempt in range(2):
+            conn = getattr(self._connections, "conn", None)
+            if conn is None:
+                timeout = ServerHandler.timeout * 3
+                if self._path is not None:
+                    conn = _UnixHTTPConnection(self._path, timeout)
+                else:
+                    conn = HTTPConnection("127.0.0.1", self._port,
+                                          timeout=timeout)
+                self._connections.conn = conn
+            try:
+                conn.request(handler.command, handler.path, body, headers)
+                resp = conn.getresponse()
+                data = resp.read()
+                return (resp.status,
+                        [(key, value) for key, value in resp.getheaders()
+                         if key.lower() not in _HOP_HEADERS],
+                        data)
+            except (HTTPException, OSError):
+                conn.close()
+                self._connections.conn = None
+        return 502, [], b"Bad Gateway"
+
+
+def _read_body(handler: BaseHTTPRequestHandler) -> Optional[bytes]:
+    """Reads the body of a request that will be forwarded.
+
+    Replies with an error if the body is too large or its length is invalid.
+
+    Args:
+        handler: The handler of the request.
+
+    Returns:
+        The body of the request or None if the request was rejected.
+    """
+    try:
+        length = int(handler.headers.get("content-length", "0"))
+    except ValueError:
+        length = -1
+    if not 0 <= length <= ServerHandler.max_content_length:
+        _reply(handler, (413, [], b"Payload Too Large"))
+        handler.close_connection = True
+        return None
+    return handler.rfile.read(length)
+
+
+def _reply(handler: BaseHTTPRequestHandler, response: _Response) -> None:
+    """Sends a forwarded response to the client.
+
+    Args:
+        handler: The handler of the request.
+        response: The response that will be sent.
+    """
+    status, headers, data = response
+    try:
+        handler.send_response(status)
+        for key, value in headers:
+            handler.send_header(key, value)
+        handler.send_header("content-length", str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+    except BrokenPipeError:
+        pass  # These happen from time to time. Bad client.
+
+
+class LeafHandler(ServerHandler):
+    """Serves stateless leafs and forwards all others to the owner process.
+
+    Class Attributes:
+        owned: The leafs that are served by the owner process.
+        owner: The owner process.
+    """
+
+    # The leafs that are served by the owner process
+    owned = set()  # type: Set[str]
+
+    # The owner process
+    owner = None  # type: Optional[Upstream]
+
+    def do_GET(self) -> None:  # noqa: N802  # required by library
+        """Processes or forwards an HTTP GET request."""
+        if self._get_path()[0] in LeafHandler.owned:
+            self._forward()
+        else:
+            super().do_GET()
+
+    def do_POST(self) -> None:  # noqa: N802  # required by library
+        """Processes or forwards an HTTP POST request."""
+        if self._get_path()[0] in LeafHandler.owned:
+            self._forward()
+        else:
+            super().do_POST()
+
+    def _forward(self) -> None:
+        """Forwards the current request to the owner process."""
+        assert LeafHandler.owner is not None  # set up by the listener
+        body = _read_body(self)
+        if body is not None:
+            _reply(self, LeafHandler.owner.forward(self, body))
+
+
+class RouterHandler(BaseHTTPRequestHandler):
+    """Forwards incoming requests to the worker processes.
+
+    Class Attributes:
+        upstreams: The workers.
+    """
+
+    # Some attributes for changing the base class behavior
+    server_version = ServerHandler.server_version
+    sys_version = ServerHandler.sys_version
+    protocol_version = "HTTP/1.1"
+    timeout = ServerHandler.timeout
+
+    # The workers
+    upstreams = []  # type: List[Upstream]
+
+    # Round robin counter for requests without affinity
+    _round_robin = count()
+
+    # The number of requests on this connection
+    _requests = 0
+
+    def log_message(self, format: str, *args) -> None:
+        """Overridden access log handler, no logging is wanted.
+
+        Args:
+            format: This parameter is ignored.
+            *args: Additional positional arguments are ignored.
+        """
+        pass
+
+    def end_headers(self) -> None:
+        """Finishes the headers, closing the connection at its limit."""
+        self._requests += 1
+        if 0 < ServerHandler.max_requests <= self._requests:
+            self.send_header("connection", "close")
+        super().end_headers()
+
+    def do_GET(self) -> None:  # noqa: N802  # required by library
+        """Forwards an HTTP GET request."""
+        self._route()
+
+    def do_POST(self) -> None:  # noqa: N802  # required by library
+        """Forwards an HTTP POST request."""
+        self._route()
+
+    def _route(self) -> None:
+        """Forwards the current request to the responsible worker(s)."""
+        if ServerHandler.stop_connections:
+            _reply(self, (503, [], b"Unavailable"))
+            self.close_connection = True
+            return
+
+        body = _read_body(self)
+        if body is None:
+            return
+
+        key = None  # type: Optional[int]
+        path = []  # type: List[str]
+        params = {}  # type: Dict[str, str]
+        if Affinity.function is not None:
+            path, session, params = self._parse_request(body)
+            key = Affinity.function(path, session, params)
+        upstreams = RouterHandler.upstreams
+        if key == Affinity.ALL:
+            # The responses are merged uncompressed
+            responses = [upstream.forward(self, body, True)
+                         for upstream in upstreams]
+            _reply(self, self._compress(RouterHandler._merge(responses, path,
+                                                             params)))
+            return
+        if key is None:
+            key = next(RouterHandler._round_robin)
+        _reply(self, upstreams[key % len(upstreams)].forward(self, body))
+
+    def _parse_request(self, body: bytes
+                       ) -> Tuple[List[str], Dict[str, Any], Dict[str, str]]:
+        """Parses the parts of the current request that affinities rely on.
+
+        Args:
+            body: The body of the request.
+
+        Returns:
+            The path, the session data and the POST parameters of the
+            request, see Affinity.
+        """
+        # The path, without the query string
+        path = [element.strip() for element in
+                self.path.split("?", 1)[0].split("/") if element.strip()]
+        if len(path) < 1:
+            path = ["index"]
+
+        # The session data, only for validly signed session cookies
+        session = {}  # type: Dict[str, Any]
+        try:
+            cookie = SimpleCookie(self.headers.get("cookie", ""))
+        except CookieError:
+            cookie = SimpleCookie()
+        if "session" in cookie:
+            state = Session.decode_cookie(cookie["session"].value)
+            if state is not None:
+                session = state["data"]
+
+        # The POST parameters, without file uploads
+        params = {}  # type: Dict[str, str]
+        content_type = self.headers.get("content-type", "")
+        if content_type.startswith("application/x-www-form-urlencoded"):
+            data = parse_qs(body.decode(errors="replace"),
+                            keep_blank_values=True)
+            params = {key: values[0] for key, values in data.items()}
+        elif content_type.startswith("multipart/form-data"):
+            fs = cgi.FieldStorage(BytesIO(body), headers=self.headers,
+                                  environ={"REQUEST_METHOD": "POST"},
+                                  keep_blank_values=True)
+            for key in fs.keys():
+                value = fs.getfirst(key)
+                if isinstance(value, str):
+                    params[key] = value
+
+        return path, session, params
+
+    def _compress(self, response: _Response) -> _Response:
+        """Compresses a response if the client supports it.
+
+        Args:
+            response: The uncompressed response.
+
+        Returns:
+            The (compressed) response.
+        """
+        status, headers, data = response
+        threshold = ServerHandler.compression_threshold
+        content_type = ""
+        for key, value in headers:
+            if key.lower() == "content-type":
+                content_type = value
+        if threshold is None or not is_compressible(content_type, data,
+                                                    threshold):
+            return response
+
+        headers = [(key, value) for key, value in headers
+                   if key.lower() != "vary"]
+        headers.append(("vary", "Accept-Encoding"))
+        coding, data = compress(self.headers.get("accept-encoding", ""), data)
+        if coding is not None:
+            headers.append(("content-encoding", coding))
+        return status, headers, data
+
+    @staticmethod
+    def _merge(responses: List[_Response], path: List[str],
+               params: Dict[str, str]) -> _Response:
+        """Merges the responses of all workers.
+
+        Successful JSON responses are merged by the merge function, without
+        one JSON arrays are concatenated. Otherwise the response of the
+        first worker is used.
+
+        Args:
+            responses: The responses of the workers.
+            path: The path of the request.
+            params: The POST parameters of the request.
+
+        Returns:
+            The merged response.
+        """
+        status, headers, _ = responses[0]
+        parts = []  # type: List[Any]
+        for code, _, data in responses:
+            if code != 200:
+                return responses[0]
+            try:
+                parts.append(loads(data.decode()))
+            except ValueError:
+                return responses[0]
+        if Merge.function is not None:
+            merged = Merge.function(path, params, parts)
+        elif all(isinstance(part, list) for part in parts):
+            merged = [value for part in parts for value in part]
+        else:
+            return responses[0]
+        return status, headers, dumps(merged).encode()
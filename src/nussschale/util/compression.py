@@ -0,0 +1,122 @@
+"""Part of Nussschale.
+
+MIT License
+Copyright (c) 2017-2018 LordKorea
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import zlib
+from typing import Dict, Optional, Tuple
+
+
+# The content types that are compressed, other types are sent as they are
+_COMPRESSIBLE = ("text/", "application/json", "application/javascript",
+                 "image/svg+xml")
+
+# The supported content codings and the zlib window bits producing them
+_ENCODINGS = (("gzip", 16 + zlib.MAX_WBITS), ("deflate", zlib.MAX_WBITS))
+
+# The compression level, a trade-off favoring speed
+_LEVEL = 6
+
+
+class CachedResponse(bytes):
+    """A response body which is sent repeatedly.
+
+    The compressed forms of the body are kept with it, so that they are only
+    computed once.
+    """
+
+    def __init__(self, data: bytes) -> None:
+        """Constructor.
+
+        Args:
+            data: The response body.
+        """
+        super().__init__()
+        # The compressed bodies, by content coding
+        self.compressed = {}  # type: Dict[str, bytes]
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """Selects the content coding for a response.
+
+    Args:
+        accept_encoding: The Accept-Encoding header of the request.
+
+    Returns:
+        The content coding that should be used, None for no compression.
+    """
+    accepted = {}  # type: Dict[str, float]
+    for part in accept_encoding.lower().split(","):
+        coding, _, args = part.partition(";")
+        quality = 1.0
+        args = args.strip()
+        if args.startswith("q="):
+            try:
+                quality = float(args[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip()] = quality
+    for coding, _ in _ENCODINGS:
+        if accepted.get(coding, accepted.get("*", 0.0)) > 0:
+            return coding
+    return None
+
+
+def is_compressible(content_type: str, data: bytes, threshold: int) -> bool:
+    """Checks whether a response body is compressed for supporting clients.
+
+    Args:
+        content_type: The content type of the response.
+        data: The response body.
+        threshold: The minimum size of compressed bodies in bytes.
+
+    Returns:
+        Whether the body is compressed if the client supports it.
+    """
+    return (len(data) >= threshold
+            and content_type.lower().startswith(_COMPRESSIBLE))
+
+
+def compress(accept_encoding: str, data: bytes) -> Tuple[Optional[str], bytes]:
+    """Compresses a response body if the client supports it.
+
+    Args:
+        accept_encoding: The Accept-Encoding header of the request.
+        data: The response body.
+
+    Returns:
+        The content coding that was applied, None if the body was not
+        compressed, and the (compressed) body.
+    """
+    coding = negotiate(accept_encoding)
+    if coding is None:
+        return None, data
+
+    # Reuse the compressed body of cached responses
+    if isinstance(data, CachedResponse) and coding in data.compressed:
+        return coding, data.compressed[coding]
+    wbits = dict(_ENCODINGS)[coding]
+    compressor = zlib.compressobj(_LEVEL, zlib.DEFLATED, wbits)
+    result = compressor.compress(data) + compressor.flush()
+    if isinstance(data, CachedResponse):
+        # Concurrent requests may both compress, the results are the same
+        data.compressed[coding] = result
+    return coding, result
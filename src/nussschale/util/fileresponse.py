@@ -0,0 +1,89 @@
+"""Part of Nussschale.
+
+MIT License
+Copyright (c) 2017-2018 LordKorea
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from os import fstat
+from typing import Optional, Tuple
+
+
+class FileResponse:
+    """A file which is sent as the body of a response.
+
+    The file is sent directly from the file to the connection, without being
+    read into memory. The web server closes the file once it was sent.
+
+    Attributes:
+        file: The opened file.
+        size: The size of the file in bytes.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Constructor.
+
+        Args:
+            path: The path of the file.
+
+        Raises:
+            OSError: If the file can not be opened.
+        """
+        self.file = open(path, "rb")
+        self.size = fstat(self.file.fileno()).st_size
+
+    def get_range(self, header: str) -> Optional[Tuple[int, int]]:
+        """Parses the Range header of a request for this file.
+
+        Only single byte ranges are supported.
+
+        Args:
+            header: The Range header.
+
+        Returns:
+            The offset and length of the requested range, (0, size) if the
+            header is not supported and the whole file is sent. None if the
+            range can not be satisfied.
+        """
+        unit, _, spec = header.partition("=")
+        if unit.strip().lower() != "bytes" or "," in spec:
+            return 0, self.size
+        first, _, last = spec.partition("-")
+        try:
+            if first.strip() == "":
+                # Suffix range, the last bytes of the file
+                length = min(int(last), self.size)
+                if length <= 0:
+                    return None
+                return self.size - length, length
+            start = int(first)
+            end = self.size - 1
+            if last.strip() != "":
+                if int(last) < start:
+                    return 0, self.size  # Invalid range
+                end = min(int(last), end)
+        except ValueError:
+            return 0, self.size
+        if start >= self.size:
+            return None
+        return start, end - start + 1
+
+    def close(self) -> None:
+        """Closes the file."""
+        self.file.close()
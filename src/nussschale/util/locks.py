@@ -19,14 +19,98 @@ AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
 LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
+
+Locks are named by the class owning them and their member name, for example
+Match._lock. Modules declare the documented order of their locks with
+declare_order, which is checked in the lock checking mode. Sections of a
+method that lock a lock use locked instead of the lock itself, so that they
+are profiled and checked like the mutex decorators.
 """
 
 from functools import wraps
-from typing import Any, Callable
+from sys import stderr
+from threading import local
+from time import perf_counter
+from traceback import format_stack
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from nussschale.util.commands import Command
+from nussschale.util.metrics import Counter, Histogram
 
 
 _Decorator = Callable[[Callable], Callable]
 
+# The buckets of the lock histograms, in seconds
+_LOCK_BUCKETS = (0.000001, 0.00001, 0.0001, 0.001, 0.01, 0.1, 1.0)
+
+# The lock profile, by lock and method
+_LOCK_WAIT = Histogram("nussschale_lock_wait_seconds",
+                       "The time spent waiting for locks.",
+                       ("lock", "method"), _LOCK_BUCKETS)
+_LOCK_HOLD = Histogram("nussschale_lock_hold_seconds",
+                       "The time locks were held.",
+                       ("lock", "method"), _LOCK_BUCKETS)
+_LOCK_CONTENTIONS = Counter("nussschale_lock_contentions_total",
+                            "The acquisitions of locks that had to wait.",
+                            ("lock", "method"))
+_LOCK_VIOLATIONS = Counter("nussschale_lock_order_violations_total",
+                           "The acquisitions of locks in undeclared order.",
+                           ("held", "acquired"))
+
+# Whether the locks are profiled
+_profiling = False
+
+# Whether the lock order is checked
+_checking = False
+
+# The declared lock order: The locks that may be acquired while holding a
+# lock. The locks that may be acquired while holding any lock are stored
+# for "*".
+_order = {}  # type: Dict[str, Set[str]]
+
+# The lock order violations that were reported
+_reported = set()  # type: Set[Tuple[str, str]]
+
+# The locks held by the current thread, in the order of their acquisition
+_held = local()
+
+
+def declare_order(before: str, after: str) -> None:
+    """Declares that a lock may be acquired while holding another lock.
+
+    Args:
+        before: The name of the lock that is held, or "*" for any lock.
+        after: The name of the lock that may be acquired.
+    """
+    _order.setdefault(before, set()).add(after)
+
+
+def enable_checking(enabled: bool) -> None:
+    """Enables or disables the lock order checking.
+
+    When enabled, the mutex decorators track the locks held by each thread.
+    Acquiring a lock while holding another lock is reported unless the
+    order was declared, as it could lead to a deadlock.
+
+    Args:
+        enabled: Whether the lock order is checked.
+    """
+    global _checking
+    _checking = enabled
+
+
+def enable_profiling(enabled: bool) -> None:
+    """Enables or disables the lock profiling.
+
+    When enabled, the mutex decorators record how long locks are waited for
+    and held, by lock and method.
+
+    Args:
+        enabled: Whether locks are profiled.
+    """
+    global _profiling
+    _profiling = enabled
+
 
 def named_mutex(lck_name: str="_lock") -> _Decorator:
     """Decorates a class method / instance method to lock the (R)Lock.
@@ -40,12 +124,150 @@ def named_mutex(lck_name: str="_lock") -> _Decorator:
     def decorator(f: Callable):
         @wraps(f)
         def wrapper(ref: Any, *args, **kwargs) -> Any:
-            lck = getattr(ref, lck_name)
-            with lck:
+            with locked(ref, f.__name__, lck_name):
                 return f(ref, *args, **kwargs)
         return wrapper
     return decorator
 
 
+def locked(ref: Any, section: str, lck_name: str="_lock") -> Any:
+    """Provides the (R)Lock of an instance / class for a with statement.
+
+    Sections locked this way are profiled and checked like the methods
+    decorated with the mutex decorators.
+
+    Args:
+        ref: The instance or class owning the lock.
+        section: The name of the locked section in the lock profile, usually
+            the name of the enclosing method.
+        lck_name: The name of the lock (class) member.
+
+    Returns:
+        The lock, or an instrumented wrapper of the lock when locks are
+        profiled or checked.
+    """
+    lck = getattr(ref, lck_name)
+    if _profiling or _checking:
+        owner = ref if isinstance(ref, type) else type(ref)
+        return _InstrumentedLock(lck, "%s.%s" % (owner.__name__, lck_name),
+                                 section)
+    return lck
+
+
+class _InstrumentedLock:
+    """A lock that is profiled or checked while it is held."""
+
+    __slots__ = ("_lck", "_name", "_labels", "_profiling", "_held",
+                 "_acquired")
+
+    def __init__(self, lck: Any, name: str, section: str) -> None:
+        """Constructor.
+
+        Args:
+            lck: The lock.
+            name: The name of the lock.
+            section: The name of the locked section.
+        """
+        self._lck = lck
+        self._name = name
+        self._labels = (name, section)
+        self._profiling = _profiling
+        self._held = None  # type: Optional[List[Tuple[str, Any]]]
+        self._acquired = 0.0
+
+    def __enter__(self) -> None:
+        """Acquires the lock, recording the wait and checking the order."""
+        if _checking:
+            self._held = _check_order(self._name, self._lck)
+
+        start = perf_counter()
+        if not self._lck.acquire(False):
+            if self._profiling:
+                _LOCK_CONTENTIONS.inc(self._labels)
+            self._lck.acquire()
+        self._acquired = perf_counter()
+        if self._profiling:
+            _LOCK_WAIT.observe(self._acquired - start, self._labels)
+        if self._held is not None:
+            self._held.append((self._name, self._lck))
+
+    def __exit__(self, *_) -> None:
+        """Releases the lock, recording the hold time.
+
+        Args:
+            *_: Ignored.
+        """
+        if self._held is not None:
+            self._held.pop()
+        self._lck.release()
+        if self._profiling:
+            _LOCK_HOLD.observe(perf_counter() - self._acquired, self._labels)
+
+
+def _check_order(name: str, lck: Any) -> List[Tuple[str, Any]]:
+    """Checks the acquisition of a lock against the declared lock order.
+
+    Violations are reported once per pair of locks, with the stack of the
+    acquisition.
+
+    Args:
+        name: The name of the lock that is acquired.
+        lck: The lock that is acquired.
+
+    Returns:
+        The locks held by the current thread.
+    """
+    held = getattr(_held, "locks", None)
+    if held is None:
+        held = []
+        _held.locks = held
+    if any(other is lck for _, other in held):
+        return held  # Reentrant acquisition
+
+    allowed = _order.get("*", set())
+    for other_name, _ in held:
+        if name in allowed or name in _order.get(other_name, ()):
+            continue
+        _LOCK_VIOLATIONS.inc((other_name, name))
+        if (other_name, name) in _reported:
+            continue
+        _reported.add((other_name, name))
+        report = ("Lock order violation: %s acquired while holding %s\n%s"
+                  % (name, other_name, "".join(format_stack()[:-3])))
+        from nussschale.nussschale import nlog
+        if nlog() is not None:
+            nlog().error(report)
+        else:
+            print(report, file=stderr)
+    return held
+
+
 # Convenience decorator with default '_lock'
 mutex = named_mutex()
+
+
+@Command("locks", "Shows the lock contention profile.")
+def show_lock_profile() -> None:
+    """Prints the lock profile, the locks waited for the longest first."""
+    if not _profiling:
+        print("Lock profiling is disabled, see the lock_profiling option.")
+        return
+    contentions = _LOCK_CONTENTIONS.collect()
+    holds = _LOCK_HOLD.collect()
+    rows = []  # type: List[Tuple[float, str, str, int, int, float]]
+    for labels, wait in _LOCK_WAIT.collect().items():
+        assert isinstance(wait, list)
+        hold = holds.get(labels, [0.0, 0.0])
+        assert isinstance(hold, list)
+        contended = contentions.get(labels, 0.0)
+        assert not isinstance(contended, list)
+        rows.append((wait[-2], labels[0], labels[1], int(wait[-1]),
+                     int(contended), hold[-2]))
+    print("%-32s %-28s %10s %10s %12s %12s" % ("Lock", "Method", "Calls",
+                                               "Contended", "Wait (ms)",
+                                               "Hold (ms)"))
+    for wait_sum, lock, method, calls, contended, hold_sum in sorted(
+            rows, reverse=True):
+        print("%-32s %-28s %10i %10i %12.3f %12.3f" % (
+            lock, method, calls, contended, wait_sum * 1000,
+            hold_sum * 1000))
@@ -0,0 +1,430 @@
+"""Part of Nussschale.
+
+MIT License
+Copyright (c) 2017-2018 LordKorea
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+Module Deadlock Guarantees:
+    When the shard lock is locked no other locks can be requested.
+    Thus the shard lock can not be part of any deadlock.
+"""
+
+from bisect import bisect_left
+from threading import RLock, Thread, current_thread, local
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+
+# The values of the labels of a sample, in the order of the label names
+_Labels = Tuple[str, ...]
+
+# A sharded value: A number, or the bucket counts, sum and count of a
+# histogram
+_Value = Union[float, List[float]]
+
+# A shard, mapping metrics and label values to the values of one thread
+_Shard = Dict[Tuple["Metric", _Labels], _Value]
+
+# A function computing the values of a gauge, by label values
+_Collector = Callable[[], Dict[_Labels, float]]
+
+# The default buckets of latency histograms, in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0)
+
+
+class _Shards:
+    """Manages the per-thread shards of the metric values.
+
+    Every thread updates its own shard without locking. The shards are merged
+    when the metrics are scraped. The shards of stopped threads are merged
+    into a single shard.
+    """
+
+    # MutEx for the list of shards.
+    # Locking this MutEx can't cause any other MutExes to be locked.
+    _lock = RLock()
+
+    # The live shards and their threads
+    _shards = []  # type: List[Tuple[Thread, _Shard]]
+
+    # The merged values of the shards of stopped threads
+    _retired = {}  # type: _Shard
+
+    # The shard of the current thread
+    _local = local()
+
+    # The number of shards at which stopped shards are merged
+    _COMPACT_THRESHOLD = 64
+
+    @staticmethod
+    def get() -> _Shard:
+        """Retrieves the shard of the current thread.
+
+        Returns:
+            The shard of the current thread.
+
+        Contract:
+            This method locks the shard lock when the shard is created.
+        """
+        shard = getattr(_Shards._local, "shard", None)
+        if shard is None:
+            shard = {}
+            _Shards._local.shard = shard
+            with _Shards._lock:
+                _Shards._shards.append((current_thread(), shard))
+                if len(_Shards._shards) >= _Shards._COMPACT_THRESHOLD:
+                    _Shards._compact()
+        return shard
+
+    @staticmethod
+    def increase(metric: "Metric", labels: _Labels, value: float) -> None:
+        """Increases a value in the shard of the current thread.
+
+        Args:
+            metric: The metric.
+            labels: The label values.
+            value: The amount of the increase.
+
+        Contract:
+            This method locks the shard lock when the shard is created.
+        """
+        shard = _Shards.get()
+        key = (metric, labels)
+        shard[key] = shard.get(key, 0) + value  # type: ignore
+
+    @staticmethod
+    def merge(metric: "Metric") -> Dict[_Labels, _Value]:
+        """Merges the values of a metric from all shards.
+
+        Args:
+            metric: The metric.
+
+        Returns:
+            The merged values, by label values.
+
+        Contract:
+            This method locks the shard lock.
+        """
+        with _Shards._lock:
+            _Shards._compact()
+            shards = [_Shards._retired] + [s for _, s in _Shards._shards]
+        merged = {}  # type: Dict[_Labels, _Value]
+        for shard in shards:
+            # Copying the items is atomic, other threads may update the shard
+            for (owner, labels), value in list(shard.items()):
+                if owner is metric:
+                    _Shards._add(merged, labels, value)
+        return merged
+
+    @staticmethod
+    def _compact() -> None:
+        """Merges the shards of stopped threads.
+
+        Contract:
+            The caller ensures that the shard lock is held.
+        """
+        live = []
+        for thread, shard in _Shards._shards:
+            if thread.is_alive():
+                live.append((thread, shard))
+            else:
+                for key, value in shard.items():
+                    _Shards._add(_Shards._retired, key, value)
+        _Shards._shards = live
+
+    @staticmethod
+    def _add(target: Dict[Any, _Value], key: Any, value: _Value) -> None:
+        """Adds a value to the value of a key.
+
+        Args:
+            target: The dictionary containing the sum.
+            key: The key.
+            value: The value that is added.
+        """
+        current = target.get(key)
+        if isinstance(value, list):
+            if current is None:
+                target[key] = list(value)
+            else:
+                assert isinstance(current, list)
+                for i, part in enumerate(value):
+                    current[i] += part
+        else:
+            assert not isinstance(current, list)
+            target[key] = (current or 0) + value
+
+
+class Metric:
+    """A metric, which is rendered when the metrics are scraped.
+
+    Attributes:
+        name: The name of the metric.
+        desc: The description of the metric.
+        labels: The names of the labels of the metric.
+
+    Class Attributes:
+        metrics: All metrics, in the order of their creation.
+    """
+
+    # All metrics, in the order of their creation
+    metrics = []  # type: List[Metric]
+
+    # The type of the metric
+    _TYPE = "untyped"
+
+    def __init__(self, name: str, desc: str, labels: _Labels=()) -> None:
+        """Constructor.
+
+        Args:
+            name: The name of the metric.
+            desc: The description of the metric.
+            labels: The names of the labels of the metric.
+        """
+        self.name = name
+        self.desc = desc
+        self.labels = labels
+        Metric.metrics.append(self)
+
+    def render(self) -> List[str]:
+        """Renders the metric in the Prometheus text format.
+
+        Returns:
+            The lines of the metric.
+        """
+        lines = ["# HELP %s %s" % (self.name, self.desc),
+                 "# TYPE %s %s" % (self.name, self._TYPE)]
+        for labels, value in sorted(self.collect().items()):
+            lines.extend(self._render_sample(labels, value))
+        return lines
+
+    def collect(self) -> Dict[_Labels, _Value]:
+        """Collects the values of the metric.
+
+        Returns:
+            The values, by label values. The value of a histogram is a list
+            of the bucket counts, followed by the sum and the count.
+        """
+        return _Shards.merge(self)
+
+    def _render_sample(self, labels: _Labels, value: _Value) -> List[str]:
+        """Renders a single sample of the metric.
+
+        Args:
+            labels: The label values of the sample.
+            value: The value of the sample.
+
+        Returns:
+            The lines of the sample.
+        """
+        assert not isinstance(value, list)
+        return ["%s%s %s" % (self.name, self._format_labels(labels),
+                             _format_value(value))]
+
+    def _format_labels(self, labels: _Labels,
+                       extra: Optional[Tuple[str, str]]=None) -> str:
+        """Formats the labels of a sample.
+
+        Args:
+            labels: The label values.
+            extra: An additional label name and value.
+
+        Returns:
+            The formatted labels, empty if there are none.
+        """
+        pairs = list(zip(self.labels, labels))
+        if extra is not None:
+            pairs.append(extra)
+        if not pairs:
+            return ""
+        return "{%s}" % ",".join(
+            "%s=\"%s\"" % (name, str(value).replace("\\", "\\\\")
+                           .replace("\"", "\\\"").replace("\n", "\\n"))
+            for name, value in pairs)
+
+
+class Counter(Metric):
+    """A counter, which only increases."""
+
+    _TYPE = "counter"
+
+    def inc(self, labels: _Labels=(), value: float=1) -> None:
+        """Increases the counter.
+
+        Args:
+            labels: The label values.
+            value: The amount of the increase.
+        """
+        _Shards.increase(self, labels, value)
+
+
+class Gauge(Metric):
+    """A gauge, which can increase and decrease.
+
+    The value of the gauge can also be computed when the metrics are scraped
+    by decorating a function, which returns the values by label values.
+    """
+
+    _TYPE = "gauge"
+
+    def __init__(self, name: str, desc: str, labels: _Labels=()) -> None:
+        """Constructor.
+
+        Args:
+            name: The name of the metric.
+            desc: The description of the metric.
+            labels: The names of the labels of the metric.
+        """
+        super().__init__(name, desc, labels)
+        # The function computing the values, if any
+        self._function = None  # type: Optional[_Collector]
+
+    def __call__(self, fn: _Collector) -> _Collector:
+        """Decorates the function computing the values of the gauge.
+
+        Args:
+            fn: The function that should be decorated.
+        """
+        self._function = fn
+        return fn
+
+    def inc(self, labels: _Labels=(), value: float=1) -> None:
+        """Increases the gauge.
+
+        Args:
+            labels: The label values.
+            value: The amount of the increase.
+        """
+        _Shards.increase(self, labels, value)
+
+    def dec(self, labels: _Labels=(), value: float=1) -> None:
+        """Decreases the gauge.
+
+        Args:
+            labels: The label values.
+            value: The amount of the decrease.
+        """
+        self.inc(labels, -value)
+
+    def collect(self) -> Dict[_Labels, _Value]:
+        """Collects the values of the gauge.
+
+        Returns:
+            The values, by label values.
+        """
+        if self._function is not None:
+            return dict(self._function())
+        return super().collect()
+
+
+class Histogram(Metric):
+    """A histogram of observed values, like latencies."""
+
+    _TYPE = "histogram"
+
+    def __init__(self, name: str, desc: str, labels: _Labels=(),
+                 buckets: Tuple[float, ...]=LATENCY_BUCKETS) -> None:
+        """Constructor.
+
+        Args:
+            name: The name of the metric.
+            desc: The description of the metric.
+            labels: The names of the labels of the metric.
+            buckets: The upper bounds of the buckets, ascending.
+        """
+        super().__init__(name, desc, labels)
+        self._buckets = buckets
+
+    def observe(self, value: float, labels: _Labels=()) -> None:
+        """Observes a value.
+
+        Args:
+            value: The observed value.
+            labels: The label values.
+        """
+        shard = _Shards.get()
+        key = (self, labels)
+        data = shard.get(key)
+        if data is None:
+            # The bucket counts, the sum and the count
+            data = [0.0] * (len(self._buckets) + 2)
+            shard[key] = data
+        assert isinstance(data, list)
+        index = bisect_left(self._buckets, value)
+        if index < len(self._buckets):
+            data[index] += 1
+        data[-2] += value
+        data[-1] += 1
+
+    def _render_sample(self, labels: _Labels, value: _Value) -> List[str]:
+        """Renders a single sample of the histogram.
+
+        Args:
+            labels: The label values of the sample.
+            value: The bucket counts, sum and count of the sample.
+
+        Returns:
+            The lines of the sample.
+        """
+        assert isinstance(value, list)
+        lines = []
+        cumulative = 0.0
+        for bound, count in zip(self._buckets, value):
+            cumulative += count
+            lines.append("%s_bucket%s %s" % (
+                self.name, self._format_labels(labels,
+                                               ("le", _format_value(bound))),
+                _format_value(cumulative)))
+        lines.append("%s_bucket%s %s" % (
+            self.name, self._format_labels(labels, ("le", "+Inf")),
+            _format_value(value[-1])))
+        lines.append("%s_sum%s %s" % (self.name, self._format_labels(labels),
+                                      _format_value(value[-2])))
+        lines.append("%s_count%s %s" % (self.name,
+                                        self._format_labels(labels),
+                                        _format_value(value[-1])))
+        return lines
+
+
+def _format_value(value: float) -> str:
+    """Formats the value of a sample.
+
+    Args:
+        value: The value.
+
+    Returns:
+        The formatted value, without a fraction for integral values.
+    """
+    if float(value).is_integer():
+        return "%i" % value
+    return repr(float(value))
+
+
+def render_all() -> str:
+    """Renders all metrics in the Prometheus text format.
+
+    Returns:
+        The metrics.
+
+    Contract:
+        This method locks the shard lock.
+    """
+    lines = []  # type: List[str]
+    for metric in Metric.metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
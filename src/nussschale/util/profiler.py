@@ -0,0 +1,227 @@
+"""Part of Nussschale.
+
+MIT License
+Copyright (c) 2017-2018 LordKorea
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+Module Deadlock Guarantees:
+    When the sampler mutex is locked no other locks can be requested.
+    Thus the sampler lock can not be part of any deadlock.
+"""
+
+import sys
+from os import getcwd, getpid, mkdir
+from os.path import join
+from threading import Event, RLock, Thread, enumerate as threads, get_ident
+from time import strftime
+from types import CodeType, FrameType
+from typing import Dict, List, Optional
+
+from nussschale.util.commands import Command
+from nussschale.util.locks import mutex
+
+
+class Sampler:
+    """A statistical profiler sampling the stacks of all threads.
+
+    A timer thread records the stacks of the other threads of the process in
+    fixed intervals. The stacks are aggregated in the collapsed stack format
+    which is understood by flame graph tools.
+    """
+
+    # The interval between two samples, in seconds
+    _INTERVAL = 0.005
+
+    def __init__(self) -> None:
+        """Constructor."""
+        # MutEx for the sampler thread and the aggregated stacks
+        # Locking this MutEx can't cause any other MutExes to be locked.
+        self._lock = RLock()
+        # The number of samples of each collapsed stack
+        self._stacks = {}  # type: Dict[str, int]
+        # The number of samples that were taken
+        self._samples = 0
+        # The sampler thread, if it is running
+        self._thread = None  # type: Optional[Thread]
+        # Set to stop the sampler thread
+        self._stopping = Event()
+        # The frame labels, by code object, only used by the sampler thread
+        self._labels = {}  # type: Dict[CodeType, str]
+
+    @mutex
+    def start(self) -> bool:
+        """Starts sampling, discarding the previous samples.
+
+        Returns:
+            Whether the sampling was started, False if it is already running.
+        """
+        if self._thread is not None:
+            return False
+        self._stacks = {}
+        self._samples = 0
+        self._stopping.clear()
+        self._thread = Thread(target=self._run, name="Sampler", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self) -> bool:
+        """Stops sampling, keeping the samples for dumping.
+
+        Returns:
+            Whether the sampling was stopped, False if it was not running.
+        """
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is None:
+            return False
+        self._stopping.set()
+        thread.join()
+        return True
+
+    def is_running(self) -> bool:
+        """Checks whether the sampler is running.
+
+        Returns:
+            Whether the sampler is running.
+        """
+        # Locking is not needed here as access is atomic.
+        return self._thread is not None
+
+    @mutex
+    def dump(self, path: str) -> int:
+        """Writes the aggregated stacks in the collapsed stack format.
+
+        Args:
+            path: The path of the file that will be written.
+
+        Returns:
+            The number of samples that were written.
+        """
+        with open(path, "w") as f:
+            for stack, count in sorted(self._stacks.items()):
+                f.write("%s %i\n" % (stack, count))
+        return self._samples
+
+    def _run(self) -> None:
+        """Takes samples until the sampler is stopped."""
+        while not self._stopping.wait(Sampler._INTERVAL):
+            self._sample()
+
+    def _sample(self) -> None:
+        """Records the current stacks of all other threads."""
+        own = get_ident()
+        names = {thread.ident: thread.name for thread in threads()}
+        stacks = []  # type: List[str]
+        for ident, top in sys._current_frames().items():
+            if ident == own:
+                continue
+            frames = []  # type: List[str]
+            frame = top  # type: Optional[FrameType]
+            while frame is not None:
+                frames.append(self._label(frame.f_code))
+                frame = frame.f_back
+            frames.append(Sampler._thread_label(names.get(ident, "")))
+            frames.reverse()
+            stacks.append(";".join(frames))
+        self._add(stacks)
+
+    @mutex
+    def _add(self, stacks: List[str]) -> None:
+        """Adds the stacks of a sample to the aggregated stacks.
+
+        Args:
+            stacks: The collapsed stacks of the sampled threads.
+        """
+        for stack in stacks:
+            self._stacks[stack] = self._stacks.get(stack, 0) + 1
+        self._samples += 1
+
+    def _label(self, code: CodeType) -> str:
+        """Retrieves the label of a stack frame.
+
+        Args:
+            code: The code object of the frame.
+
+        Returns:
+            The label, consisting of the function name and its location.
+        """
+        label = self._labels.get(code)
+        if label is None:
+            path = code.co_filename
+            cwd = getcwd()
+            if path.startswith(cwd):
+                path = path[len(cwd) + 1:]
+            label = "%s (%s:%i)" % (code.co_name, path, code.co_firstlineno)
+            label = label.replace(";", ":")
+            self._labels[code] = label
+        return label
+
+    @staticmethod
+    def _thread_label(name: str) -> str:
+        """Retrieves the root label of a thread's stacks.
+
+        Numbered threads share their label, so the stacks of all request
+        handler threads are aggregated.
+
+        Args:
+            name: The name of the thread.
+
+        Returns:
+            The label of the thread.
+        """
+        label = "".join("N" if c.isdigit() else c for c in name)
+        while "NN" in label:
+            label = label.replace("NN", "N")
+        return label.replace(";", ":") or "unknown"
+
+
+# The sampler of this process
+_sampler = Sampler()
+
+
+@Command("profile start", "Starts the sampling profiler.")
+def profile_start() -> None:
+    """Starts the sampling profiler."""
+    if _sampler.start():
+        print("Profiling started.")
+    else:
+        print("The profiler is already running.")
+
+
+@Command("profile stop", "Stops the sampling profiler.")
+def profile_stop() -> None:
+    """Stops the sampling profiler."""
+    if _sampler.stop():
+        print("Profiling stopped. Use `profile dump` to write the profile.")
+    else:
+        print("The profiler is not running.")
+
+
+@Command("profile dump", "Writes the profile to the log directory.")
+def profile_dump() -> None:
+    """Writes the collapsed stacks of the profile to the log directory."""
+    try:
+        mkdir("./logs")
+    except OSError:
+        pass  # Already exists
+    path = join(".", "logs", "profile.%s.%i.folded"
+                % (strftime("%Y%m%d-%H%M%S"), getpid()))
+    samples = _sampler.dump(path)
+    print("Wrote %i samples to %s." % (samples, path))
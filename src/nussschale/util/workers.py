@@ -0,0 +1,166 @@
+"""Part of Nussschale.
+
+MIT License
+Copyright (c) 2017-2018 LordKorea
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from functools import update_wrapper
+from typing import Any, Callable, Dict, List, Optional
+
+
+# Signature of worker setup functions: (worker index, worker count)
+_WorkerSetup = Callable[[int, int], None]
+
+# Signature of affinity functions: (path, session data, POST parameters) ->
+# affinity key
+_AffinityFunction = Callable[[List[str], Dict[str, Any], Dict[str, str]],
+                             Optional[int]]
+
+# Signature of merge functions: (path, POST parameters, decoded JSON
+# responses of the workers) -> merged JSON response
+_MergeFunction = Callable[[List[str], Dict[str, str], List[Any]], Any]
+
+
+class WorkerSetup:
+    """A worker setup decorator.
+
+    In supervisor mode, worker setups are run in every worker process right
+    after it was started.
+
+    Class Attributes:
+        setups: The registered worker setups.
+    """
+
+    # The registered worker setups
+    setups = []  # type: List[_WorkerSetup]
+
+    def __init__(self, f: _WorkerSetup) -> None:
+        """Constructor.
+
+        Args:
+            f: The function that should be wrapped.
+        """
+        WorkerSetup.setups.append(f)
+        self._function = f
+        update_wrapper(self, f)
+
+    def __call__(self, index: int, count: int) -> None:
+        """Implements calling the decorated function.
+
+        Note: This is only used if a worker setup is called by hand.
+
+        Args:
+            index: The index of the worker.
+            count: The number of workers.
+        """
+        self._function(index, count)
+
+
+class Affinity:
+    """An affinity decorator.
+
+    In supervisor mode, the affinity function decides which worker process
+    serves a request. It receives the path of the request, the session data
+    of the client and the POST parameters (without file uploads) and returns
+    an
+    affinity key: Requests with the key k are served by the worker k modulo
+    the number of workers. For None any worker serves the request, for
+    ALL the request is served by every worker and the JSON responses are
+    merged, see Merge.
+
+    Class Attributes:
+        ALL: The affinity key for requests that are served by all workers.
+        function: The registered affinity function.
+    """
+
+    # The affinity key for requests that are served by all workers
+    ALL = -1
+
+    # The registered affinity function
+    function = None  # type: Optional[_AffinityFunction]
+
+    def __init__(self, f: _AffinityFunction) -> None:
+        """Constructor.
+
+        Args:
+            f: The function that should be wrapped.
+        """
+        Affinity.function = f
+        self._function = f
+        update_wrapper(self, f)
+
+    def __call__(self, path: List[str], session: Dict[str, Any],
+                 params: Dict[str, str]) -> Optional[int]:
+        """Implements calling the decorated function.
+
+        Note: This is only used if an affinity function is called by hand.
+
+        Args:
+            path: The path of the request.
+            session: The session data of the client.
+            params: The POST parameters of the request.
+
+        Returns:
+            The affinity key of the request.
+        """
+        return self._function(path, session, params)
+
+
+class Merge:
+    """A merge decorator.
+
+    In supervisor mode, the merge function combines the JSON responses of
+    the workers to a request with the affinity ALL. It receives the path of
+    the request, the POST parameters and the decoded responses and returns
+    the merged response. Without a merge function JSON array responses are
+    concatenated.
+
+    Class Attributes:
+        function: The registered merge function.
+    """
+
+    # The registered merge function
+    function = None  # type: Optional[_MergeFunction]
+
+    def __init__(self, f: _MergeFunction) -> None:
+        """Constructor.
+
+        Args:
+            f: The function that should be wrapped.
+        """
+        Merge.function = f
+        self._function = f
+        update_wrapper(self, f)
+
+    def __call__(self, path: List[str], params: Dict[str, str],
+                 responses: List[Any]) -> Any:
+        """Implements calling the decorated function.
+
+        Note: This is only used if a merge function is called by hand.
+
+        Args:
+            path: The path of the request.
+            params: The POST parameters of the request.
+            responses: The decoded JSON responses of the workers.
+
+        Returns:
+            The merged JSON response.
+        """
+        return self._function(path, params, responses)
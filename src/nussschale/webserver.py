@@ -19,48 +19,108 @@ AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
 LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
+
+Module Deadlock Guarantees:
+    The following lock dependencies are introduced by this module:
+        TLS Provider Lock -> Logger Lock
+
+    The logger lock allows no other locks to be requested. Thus the TLS
+    provider lock can not be part of any deadlock.
 """
 
+import socket
 import ssl
-from http.server import HTTPServer
-from socketserver import ThreadingMixIn
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from os import remove, stat
+from os.path import exists
+from socketserver import ThreadingMixIn, UnixStreamServer
 from sys import exc_info
-from threading import Thread
-from typing import Any
+from threading import RLock, Thread
+from time import time
+from typing import Any, Dict, Optional, Tuple, Type, Union
 
 from nussschale.handler import ServerHandler
-from nussschale.nussschale import nconfig
+from nussschale.nussschale import nconfig, nlog
+from nussschale.util.locks import declare_order, mutex
+
+
+# The lock dependencies of this module, see the deadlock guarantees
+declare_order("TLSProvider._lock", "Log._lock")
 
 
 class Webserver(Thread):
     """The HTTP web server."""
 
     # The internal http server which runs in the background
-    _httpd = None  # type: MultithreadedHTTPServer
+    _httpd = None  # type: Union[MultithreadedHTTPServer, UnixHTTPServer]
 
-    def __init__(self) -> None:
-        """Constructor."""
+    def __init__(self, handler: Type[BaseHTTPRequestHandler]=ServerHandler,
+                 host: str="", port: Optional[int]=None,
+                 use_ssl: Optional[bool]=None, reuse_port: bool=False,
+                 unix_path: Optional[str]=None) -> None:
+        """Constructor.
+
+        Args:
+            handler: The handler for the requests.
+            host: The address the server is bound to, all interfaces by
+                default.
+            port: The port the server runs on, the configured port by
+                default.
+            use_ssl: Whether SSL is used, as configured by default.
+            reuse_port: Whether other processes may bind the same port, so
+                that the kernel distributes the connections among them.
+            unix_path: The path of a Unix socket the server listens on
+                instead of a TCP port. SSL is never used for Unix sockets.
+        """
         super().__init__()
+        # The handler for requests
+        self._handler = handler
+        # The address the server is bound to
+        self._host = host
         # The port the server runs on
-        self._port = nconfig().get("port", 8091)
+        self._port = port or nconfig().get("port", 8091)
+        # Whether the port is shared with other processes
+        self._reuse_port = reuse_port
+        # The path of the Unix socket, if any
+        self._unix_path = unix_path
         # The certificate used for SSL (if enabled)
         self._certificate = nconfig().get("certificate", "cert.pem")
         # The private key for above certificate
         self._private_key = nconfig().get("privatekey", "priv.pem")
         # Whether SSL shall be used for connections
-        self._use_ssl = nconfig().get("use_ssl", True)
+        self._use_ssl = use_ssl
+        if self._use_ssl is None:
+            # TLS is terminated by the proxy in reverse proxy mode
+            self._use_ssl = (nconfig().get("use_ssl", True)
+                             and not nconfig().get("behind_proxy", False))
 
     def run(self) -> None:
         """Starts the HTTP server in the background."""
         # Initialize the server
-        socket_pair = ('', self._port)
-        self._httpd = MultithreadedHTTPServer(socket_pair, ServerHandler)
+        if self._unix_path is not None:
+            if exists(self._unix_path):
+                remove(self._unix_path)  # Left over from an earlier run
+            self._httpd = UnixHTTPServer(self._unix_path, self._handler)
+        else:
+            socket_pair = (self._host, self._port)
+            self._httpd = MultithreadedHTTPServer(socket_pair, self._handler,
+                                                  bind_and_activate=False)
+            if self._reuse_port:
+                self._httpd.socket.setsockopt(socket.SOL_SOCKET,
+                                              socket.SO_REUSEPORT, 1)
+            try:
+                self._httpd.server_bind()
+                self._httpd.server_activate()
+            except OSError:
+                self._httpd.server_close()
+                raise
 
-        # Setup SSL if requested
-        if self._use_ssl:
-            tls = self._create_ssl_context()
-            self._httpd.socket = tls.wrap_socket(self._httpd.socket,
-                                                 server_side=True)
+        # Setup SSL if requested. The handshakes are performed by the
+        # threads of the connections, not by the accepting thread.
+        if self._use_ssl and self._unix_path is None:
+            assert isinstance(self._httpd, MultithreadedHTTPServer)
+            self._httpd.tls = TLSProvider(self._certificate,
+                                          self._private_key)
 
         # Let the HTTP server run in the background serving requests
         self._httpd.serve_forever()
@@ -71,22 +131,173 @@ class Webserver(Thread):
         if self._httpd is not None:
             self._httpd.shutdown()
 
-    def _create_ssl_context(self) -> ssl.SSLContext:
-        """Creates a SSL context for HTTPS.
+
+class TLSProvider:
+    """Provides the TLS context for HTTPS connections.
+
+    The context is created once and shared by all connections, which allows
+    clients to resume their TLS sessions. It is created again when the
+    certificate or the private key changes on disk.
+    """
+
+    # The minimum number of seconds between two checks for a new certificate
+    _CHECK_INTERVAL = 10
+
+    # The ciphers for TLS 1.2, TLS 1.3 only offers modern ciphers anyway
+    _CIPHERS = "ECDHE+AESGCM:ECDHE+CHACHA20"
+
+    def __init__(self, certificate: str, private_key: str) -> None:
+        """Constructor.
+
+        Args:
+            certificate: The path of the certificate (chain).
+            private_key: The path of the private key for the certificate.
+        """
+        # MutEx for reloading the context
+        # Locking this MutEx can cause the Logger MutEx to be locked.
+        self._lock = RLock()
+
+        # The paths of the certificate and the private key
+        self._certificate = certificate
+        self._private_key = private_key
+
+        # The modification times of the files the context was created from
+        self._mtimes = self._get_mtimes()
+
+        # The time of the last check for a new certificate
+        self._checked = time()
+
+        # The current context
+        self._context = self._create_context()
+
+    def get_context(self) -> ssl.SSLContext:
+        """Retrieves the current TLS context.
+
+        Returns:
+            The TLS context for new connections.
+
+        Contract:
+            This method may lock the TLS provider lock.
+        """
+        if time() - self._checked >= TLSProvider._CHECK_INTERVAL:
+            self._reload()
+        # Locking is not needed here as access is atomic.
+        return self._context
+
+    @mutex
+    def _reload(self) -> None:
+        """Creates a new context if the certificate or key changed.
+
+        If the new files can not be loaded, the current context is kept.
+
+        Contract:
+            This method locks the TLS provider lock and the logger's lock.
+        """
+        if time() - self._checked < TLSProvider._CHECK_INTERVAL:
+            return  # Another thread checked in the meantime
+        self._checked = time()
+        mtimes = self._get_mtimes()
+        if mtimes == self._mtimes:
+            return
+        try:
+            self._context = self._create_context()
+            self._mtimes = mtimes
+            nlog().log("Reloaded the TLS certificate")
+        except (OSError, ssl.SSLError) as e:
+            nlog().log("Could not reload the TLS certificate: %s" % e)
+
+    def _get_mtimes(self) -> Tuple[float, float]:
+        """Retrieves the modification times of the certificate and the key.
 
         Returns:
-            A SSL context for application to the server's socket.
+            The modification times, 0 for files that do not exist.
         """
-        tls = ssl.SSLContext(ssl.PROTOCOL_TLSv1)
+        mtimes = []
+        for path in (self._certificate, self._private_key):
+            try:
+                mtimes.append(stat(path).st_mtime)
+            except OSError:
+                mtimes.append(0)
+        return mtimes[0], mtimes[1]
+
+    def _create_context(self) -> ssl.SSLContext:
+        """Creates a TLS context for HTTPS.
+
+        Returns:
+            A TLS context allowing TLS 1.2 and 1.3 with ECDHE key exchange.
+
+        Raises:
+            OSError: If the certificate or the key can not be read.
+            ssl.SSLError: If the certificate or the key is invalid.
+        """
+        tls = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        tls.minimum_version = ssl.TLSVersion.TLSv1_2
+        tls.options |= ssl.OP_NO_COMPRESSION
+        tls.options |= ssl.OP_CIPHER_SERVER_PREFERENCE
+        tls.set_ciphers(TLSProvider._CIPHERS)
         tls.load_cert_chain(certfile=self._certificate,
                             keyfile=self._private_key)
-        tls.set_ciphers(
-            "HIGH:!aNULL:!eNULL:!EXPORT:!CAMELLIA:!DES:!MD5:!PSK:!RC4")
         return tls
 
 
 class MultithreadedHTTPServer(ThreadingMixIn, HTTPServer):
-    """A HTTP server which handles each request in a seperate thread."""
+    """A HTTP server which handles each request in a seperate thread.
+
+    Attributes:
+        tls: The provider of the TLS context if HTTPS is used, else None.
+    """
+
+    # The provider of the TLS context, if HTTPS is used
+    tls = None  # type: Optional[TLSProvider]
+
+    def __init__(self, *args, **kwargs) -> None:
+        """Constructor.
+
+        Args:
+            *args: Forwarded to base constructor.
+            **kwargs: Forwarded to base constructor.
+        """
+        super().__init__(*args, **kwargs)
+        # The times the pending connections were accepted
+        self._accepted = {}  # type: Dict[Any, float]
+
+    def process_request(self, request: Any, client_address: Any) -> None:
+        """Starts the thread of a connection, noting when it was accepted.
+
+        Args:
+            request: The socket of the connection.
+            client_address: The client's address.
+        """
+        self._accepted[request] = time()
+        super().process_request(request, client_address)
+
+    def finish_request(self, request: Any, client_address: Any) -> None:
+        """Handles a connection, in the thread of the connection.
+
+        For HTTPS the TLS handshake is performed here first. The handshake
+        is part of the time the connection waits for its handler.
+
+        Args:
+            request: The socket of the connection.
+            client_address: The client's address.
+        """
+        # Locking is not needed here as access is atomic.
+        accepted = self._accepted.pop(request, None)
+        ServerHandler.connection_state.accepted = accepted
+        if self.tls is None:
+            super().finish_request(request, client_address)
+            return
+
+        request.settimeout(ServerHandler.timeout)
+        try:
+            conn = self.tls.get_context().wrap_socket(request,
+                                                      server_side=True)
+        except (OSError, ssl.SSLError):
+            return  # Failed handshake, the socket is closed by the caller
+        try:
+            super().finish_request(conn, client_address)
+        finally:
+            conn.close()
 
     def handle_error(self, request: Any, client_addr: Any) -> None:
         """Handles an error.
@@ -103,3 +314,8 @@ class MultithreadedHTTPServer(ThreadingMixIn, HTTPServer):
             if self is not None:
                 self.shutdown()
         super().handle_error(request, client_addr)
+
+
+class UnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    """A HTTP server on a Unix socket, handling each request in a thread."""
+    pass
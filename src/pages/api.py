@@ -25,7 +25,7 @@ SOFTWARE.
 from html import escape
 from json import dumps
 from time import time
-from typing import Any, Dict
+from typing import Any, Dict, List
 
 from model.match import ExpectationException, Match
 from model.participant import Participant
@@ -33,6 +33,7 @@ from nussschale.leafs.controller import Controller
 from nussschale.leafs.endpoint import AccessRestriction, Endpoint, \
     EndpointContext, HTTPException, PermissionFailHandler, RequireParameters, \
     RequirePath
+from nussschale.util.workers import Merge
 
 
 # Handles the /api leaf.
@@ -102,6 +103,7 @@ def api_join(ctx: EndpointContext) -> None:
     except ExpectationException:
         # Can't join right now
         raise HTTPException.forbidden(True, "can not join")
+    ctx.session["match"] = match.id
 
     ctx.json_ok()
 
@@ -202,10 +204,9 @@ def api_cards(ctx: EndpointContext) -> None:
             "OBJECT": {},
             "VERB": {}
         }  # type: Dict[str, Dict]
-        hand = part.get_hand()
-        for id, hcard in hand.items():
-            hand_cards[hcard.card.type][id] = {"text": hcard.card.text,
-                                               "chosen": hcard.chosen}
+        for id, card, chosen in part.get_hand():
+            hand_cards[card.type][id] = {"text": card.text,
+                                         "chosen": chosen}
         data["hand"] = hand_cards
 
     # Load the data of the played cards
@@ -245,7 +246,7 @@ def api_participants(ctx: EndpointContext) -> None:
         raise HTTPException.forbidden(True, "not in match")
 
     data = []
-    for part in match.get_participants():
+    for part in match.get_snapshot().participants:
         data.append({"id": part.id,
                      "name": part.nickname,
                      "score": part.score,
@@ -351,6 +352,40 @@ def api_chat(ctx: EndpointContext) -> None:
     ctx.ok("application/json; charset=utf-8", dumps(data))
 
 
+@Endpoint(APILeaf)
+@RequirePath("events")
+def api_events(ctx: EndpointContext) -> None:
+    """Retrieves the events of the client's match after a sequence number.
+
+    Returns a JSON response containing the events. If the events can't be
+    delivered completely the client is told to reload the full state.
+
+    Args:
+        ctx: The context of the request.
+
+    Raises:
+        HTTPException: (403) When the user is not in a match,
+                             or invalid data is sent.
+    """
+    match = Match.get_match_of_player(ctx.session["id"])
+    if match is None:
+        raise HTTPException.forbidden(True, "not in match")
+
+    # Without a sequence number the client only learns the current one
+    seq = -1
+    if "since" in ctx.params:
+        try:
+            seq = ctx.get_param_as("since", int)
+        except ValueError:
+            raise HTTPException.forbidden(True, "invalid sequence number")
+
+    events, latest, complete = match.get_events(seq)
+    data = {"seq": latest,
+            "reset": not complete,
+            "events": events}
+    ctx.ok("application/json; charset=utf-8", dumps(data))
+
+
 @Endpoint(APILeaf)
 @RequirePath("status")
 def api_status(ctx: EndpointContext) -> None:
@@ -369,42 +404,63 @@ def api_status(ctx: EndpointContext) -> None:
     if match is None:
         raise HTTPException.forbidden(True, "not in match")
     part = match.get_participant(ctx.session["id"])
+    if part is None:
+        raise HTTPException.forbidden(True, "not in match")
 
     # Refresh the timeout timer of the participant
     part.refresh()
 
+    # Read the match and the participant from the same snapshot
+    snap = match.get_snapshot()
+    part = snap.get_participant(ctx.session["id"])
+    if part is None:
+        raise HTTPException.forbidden(True, "not in match")
+
     # Prepare the data for the status request
-    allow_choose = (match.is_choosing()
+    allow_choose = (snap.state == "CHOOSING"
                     and not part.picking
                     and not part.spectator)
-    allow_pick = (match.is_picking()
+    allow_pick = (snap.state == "PICKING"
                   and part.picking
                   and not part.spectator)
-    allow_skip = match.user_can_skip_phase(part)
-    data = {"timer": int(match.get_seconds_to_next_phase()),
-            "status": match.get_status(),
-            "ending": match.is_ending(),
-            "hasCard": match.has_card(),
+    allow_skip = snap.user_can_skip_phase(part.id)
+    data = {"id": snap.id,
+            "timer": snap.get_seconds_to_next_phase(),
+            "status": snap.get_status(),
+            "ending": snap.state == "ENDING",
+            "hasCard": snap.card is not None,
             "allowChoose": allow_choose,
             "allowPick": allow_pick,
             "allowSkip": allow_skip,
             "isSpectator": part.spectator,
             "isPicker": part.picking,
-            "gaps": match.count_gaps()}
+            "gaps": snap.count_gaps()}
 
     # Add the card text to the output, if possible
-    if data["hasCard"]:
-        data["cardText"] = match.current_card.text
+    if snap.card is not None:
+        data["cardText"] = snap.card.text
 
     ctx.ok("application/json; charset=utf-8", dumps(data))
 
 
+# The default and the maximum number of matches on a page of the match list
+_LIST_PAGE_DEFAULT = 50
+_LIST_PAGE_MAXIMUM = 100
+
+# The parameters of a paginated match list request
+_LIST_PAGE_PARAMETERS = ("limit", "cursor", "order", "state", "joinable",
+                         "minPlayers", "maxPlayers")
+
+
 @Endpoint(APILeaf)
 @RequirePath("list")
 def api_list(ctx: EndpointContext) -> None:
     """Retrieves the list of all existing matches.
 
-    Returns a JSON response containing all matches.
+    Returns a JSON response containing all matches. If any pagination or
+    filter parameter is supplied, a single page of the matching matches is
+    returned instead. Every entry of a page carries the cursor pointing
+    after it.
 
     Args:
         ctx: The context of the request.
@@ -413,14 +469,78 @@ def api_list(ctx: EndpointContext) -> None:
         HTTPException: (403) When the user is not in a match,
                              or invalid data is sent.
     """
-    data = []
-    matches = Match.get_all()
-    for match in matches:
-        data.append({
-            "id": match.id,
-            "owner": match.get_owner_nick(),
-            "participants": match.get_num_participants(),
-            "canJoin": match.can_join(),
-            "seconds": int(match.get_seconds_to_next_phase())
-        })
+    if not any(name in ctx.params for name in _LIST_PAGE_PARAMETERS):
+        ctx.ok("application/json; charset=utf-8", Match.get_listing())
+        return
+
+    try:
+        limit = _LIST_PAGE_DEFAULT
+        if "limit" in ctx.params:
+            limit = ctx.get_param_as("limit", int)
+        min_players = 0
+        if "minPlayers" in ctx.params:
+            min_players = ctx.get_param_as("minPlayers", int)
+        max_players = None
+        if "maxPlayers" in ctx.params:
+            max_players = ctx.get_param_as("maxPlayers", int)
+    except ValueError:
+        raise HTTPException.forbidden(True, "invalid number")
+    if not 0 < limit <= _LIST_PAGE_MAXIMUM:
+        raise HTTPException.forbidden(True, "invalid limit")
+
+    order = ctx.params.get("order", "id")
+    if order not in ("id", "seconds"):
+        raise HTTPException.forbidden(True, "invalid order")
+    state = ctx.params.get("state", None)
+    if state not in (None, "PENDING", "CHOOSING", "PICKING", "COOLDOWN",
+                     "ENDING"):
+        raise HTTPException.forbidden(True, "invalid state")
+
+    joinable = ctx.params.get("joinable", "false") == "true"
+
+    try:
+        cursor = None
+        if "cursor" in ctx.params:
+            cursor = ctx.get_param_as("cursor", str)
+        matches, cursor = Match.get_listing_page(limit, cursor,
+                                                 order == "seconds", state,
+                                                 joinable, min_players,
+                                                 max_players)
+    except ValueError:
+        raise HTTPException.forbidden(True, "invalid cursor")
+
+    data = {"matches": matches,
+            "cursor": cursor}
     ctx.ok("application/json; charset=utf-8", dumps(data))
+
+
+@Merge
+def merge_list(path: List[str], params: Dict[str, str],
+               responses: List[Any]) -> Any:
+    """Merges the match lists of all workers in supervisor mode.
+
+    The full lists are ordered by the match IDs like the list of a single
+    process. Pages are merged in their requested order and cut to the
+    requested limit, their cursor continues the list on every worker.
+
+    Args:
+        path: The path of the request.
+        params: The POST parameters of the request.
+        responses: The responses of the workers, which validated the
+            parameters already.
+
+    Returns:
+        The merged match list.
+    """
+    if all(isinstance(response, list) for response in responses):
+        merged = [entry for response in responses for entry in response]
+        if path == ["api", "list"]:
+            merged.sort(key=lambda entry: entry["id"])
+        return merged
+    limit = int(params.get("limit", _LIST_PAGE_DEFAULT))
+    pages = [(response["matches"], response["cursor"])
+             for response in responses]
+    matches, cursor = Match.merge_listing_pages(
+        pages, limit, params.get("order", "id") == "seconds")
+    return {"matches": matches,
+            "cursor": cursor}
@@ -139,6 +139,7 @@ def create_match(ctx: EndpointContext) -> None:
     # Add the participant to the match
     part = Participant(ctx.session["id"], ctx.session["nickname"])
     match.add_participant(part)
+    ctx.session["match"] = match.id
 
     # Make the match available for others
     match.put_in_pool()
@@ -0,0 +1,82 @@
+/**
+ * Part of KgF.
+ *
+ * MIT License
+ * Copyright (c) 2017-2018 LordKorea
+ *
+ * Permission is hereby granted, free of charge, to any person obtaining a copy
+ * of this software and associated documentation files (the "Software"), to
+ * deal in the Software without restriction, including without limitation the
+ * rights to use, copy, modify, merge, publish, distribute, sublicense, and/or
+ * sell copies of the Software, and to permit persons to whom the Software is
+ * furnished to do so, subject to the following conditions:
+ * The above copyright notice and this permission notice shall be included in
+ * all copies or substantial portions of the Software.
+ *
+ * THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+ * IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+ * FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+ * AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+ * LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+ * FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
+ * IN THE SOFTWARE.
+ */
+"use strict";
+
+(function(){
+  // The sequence number of the last received event, null if unknown
+  let sequence = null
+
+  /**
+   * Loads the events of the match that happened since the last request.
+   */
+  function loadEvents() {
+    let logError = (x, e, f) => console.log(`/api/events error: ${e} ${f}`)
+    $.ajax({
+      method: "POST",
+      url: "/api/events",
+      data: sequence === null ? {} : {since: sequence},
+      dataType: "json",
+      success: dispatchEvents,
+      error: (x, e, f) => {logError(x, e, f); scheduleEventLoad()}
+    })
+  }
+
+  /**
+   * Notifies the other match scripts about new events.
+   *
+   * Triggers "matchreset" on the document when the full match state has to
+   * be reloaded and "matchevents" with the list of new events otherwise.
+   *
+   * @param data The JSON data which was retrieved from the API.
+   */
+  function dispatchEvents(data) {
+    sequence = data.seq
+    if (data.reset) {
+      $(document).trigger("matchreset")
+    } else if (data.events.length > 0) {
+      $(document).trigger("matchevents", [data.events])
+    }
+    scheduleEventLoad()
+  }
+
+  /**
+   * Schedules loading the events.
+   */
+  function scheduleEventLoad() {
+    setTimeout(loadEvents, 500)
+  }
+
+  loadEvents()
+})()
+
+/**
+ * Checks whether any of the given events is of one of the given types.
+ *
+ * @param events The list of events.
+ * @param types A set of event types.
+ * @return Whether at least one of the events has one of the types.
+ */
+function hasEventOfType(events, types) {
+  return events.some(ev => types.has(ev.event))
+}
@@ -40,6 +40,9 @@
   let numSelected = 0
   let selectedCards = new Map()
 
+  // The events which change the hand or the played cards
+  const cardEvents = new Set(["state", "join", "leave", "choose", "pick"])
+
   /**
    * Loads the match's status.
    */
@@ -450,10 +453,22 @@
     $(".match-hand").css("width", chatVisible ? "" : "100vw")
   }
 
+  /**
+   * Reloads the cards if they were changed by any of the events.
+   *
+   * @param e The jQuery event.
+   * @param events The list of match events.
+   */
+  function handleEvents(e, events) {
+    if (hasEventOfType(events, cardEvents)) {
+      loadCards()
+    }
+  }
+
   setInterval(loadStatus, 1000)
   loadStatus()
-  setInterval(loadCards, 1000)
-  loadCards()
+  $(document).on("matchevents", handleEvents)
+  $(document).on("matchreset", loadCards)
   pickTab("tab-actions")
   $("#tab-actions").click(chooseActionsTab)
   $("#tab-objects").click(chooseObjectsTab)
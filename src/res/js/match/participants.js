@@ -26,6 +26,9 @@
 (function(){
   let participantResolver = new Map()
 
+  // The events which change the participant list
+  const participantEvents = new Set(["join", "leave", "picker", "score"])
+
   /**
    * Loads the match's participants.
    */
@@ -91,6 +94,18 @@
     )
   }
 
-  setInterval(loadParticipants, 1500)
-  loadParticipants()
+  /**
+   * Reloads the participants if they were changed by any of the events.
+   *
+   * @param e The jQuery event.
+   * @param events The list of match events.
+   */
+  function handleEvents(e, events) {
+    if (hasEventOfType(events, participantEvents)) {
+      loadParticipants()
+    }
+  }
+
+  $(document).on("matchevents", handleEvents)
+  $(document).on("matchreset", loadParticipants)
 })()
@@ -0,0 +1,107 @@
+"""Part of KgF.
+
+MIT License
+Copyright (c) 2017-2018 LordKorea
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from model.events import EventLog
+from model.match import Match
+from model.participant import Participant
+
+
+card_set = ("_-0\tSTATEMENT\n_-1\tSTATEMENT\n_-2\tSTATEMENT\n_-3\tSTATEMENT\n"
+            "_-4\tSTATEMENT\n_-5\tSTATEMENT\n_-6\tSTATEMENT\n_-7\tSTATEMENT\n"
+            "_-8\tSTATEMENT\n_-9\tSTATEMENT\n"
+            "O-0\tOBJECT\nO-1\tOBJECT\nO-2\tOBJECT\nO-3\tOBJECT\nO-4\tOBJECT\n"
+            "O-5\tOBJECT\nO-6\tOBJECT\nO-7\tOBJECT\nO-8\tOBJECT\nO-9\tOBJECT\n"
+            "V-0\tVERB\nV-1\tVERB\nV-2\tVERB\nV-3\tVERB\nV-4\tVERB\n"
+            "V-5\tVERB\nV-6\tVERB\nV-7\tVERB\nV-8\tVERB\nV-9\tVERB\n")
+
+
+def teardown_function(_) -> None:
+    """Resets the match pool."""
+    for k in [x for x in Match._registry]:
+        del Match._registry[k]
+    Match._id_counter = 0
+
+
+def test_event_log_since() -> None:
+    """Tests retrieving events after a sequence number."""
+    log = EventLog()
+    assert log.get_since(0) == ([], 0, True)
+    log.append("state", state="CHOOSING")
+    log.append("leave", id="ID", reason="left")
+    events, seq, complete = log.get_since(1)
+    assert seq == 2 and complete
+    assert events == [{"seq": 2, "event": "leave", "id": "ID",
+                       "reason": "left"}]
+    assert log.get_since(2) == ([], 2, True)
+    assert log.get_since(3) == ([], 2, False)
+    assert log.get_since(-1) == ([], 2, False)
+
+
+def test_event_log_bounded() -> None:
+    """Tests whether old events are discarded."""
+    log = EventLog()
+    for i in range(EventLog._CAPACITY + 10):
+        log.append("chat", id=i, type="USER", message="")
+    events, seq, complete = log.get_since(0)
+    assert not complete
+    events, seq, complete = log.get_since(10)
+    assert complete
+    assert len(events) == EventLog._CAPACITY
+    assert events[0]["seq"] == 11
+
+
+def test_match_events() -> None:
+    """Tests whether joining, choosing and chatting is logged."""
+    match = Match()
+    match.create_deck(card_set)
+    _, start, _ = match.get_events(0)
+    part = Participant("ID", "NICK")
+    match.add_participant(part)
+    match.send_message("NICK", "hi")
+    events, _, _ = match.get_events(start)
+    assert [ev["event"] for ev in events] == ["join", "chat", "chat"]
+    assert events[0]["id"] == "ID"
+    assert events[2]["message"] == "<b>NICK</b>: hi"
+
+    # Choosing is logged by the participant itself
+    part.add_hand_cards([match._deck["OBJECT"][0]])
+    _, start, _ = match.get_events(0)
+    part.toggle_chosen(part.get_hand()[0][0], 1)
+    events, _, _ = match.get_events(start)
+    assert events == [{"seq": start + 1, "event": "choose", "id": "ID",
+                       "count": 1}]
+
+
+def test_match_state_events() -> None:
+    """Tests whether state transitions and picker changes are logged."""
+    match = Match()
+    match.create_deck(card_set)
+    for i in range(3):
+        match.add_participant(Participant("ID%i" % i, "NICK%i" % i))
+    _, start, _ = match.get_events(0)
+    with match._lock:
+        match._set_state("CHOOSING")
+    events, _, _ = match.get_events(start)
+    assert events[0] == {"seq": start + 1, "event": "state",
+                         "state": "CHOOSING"}
+    assert events[1] == {"seq": start + 2, "event": "picker", "id": "ID0"}
@@ -0,0 +1,79 @@
+"""Part of KgF.
+
+MIT License
+Copyright (c) 2017-2018 LordKorea
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from model.clock import Clock, VirtualClock
+from model.match import Match
+from model.participant import Participant
+from nussschale.util.locks import _LOCK_VIOLATIONS, enable_checking, locked
+
+
+card_set = ("_-0\tSTATEMENT\n_-1\tSTATEMENT\n_-2\tSTATEMENT\n_-3\tSTATEMENT\n"
+            "_-4\tSTATEMENT\n_-5\tSTATEMENT\n_-6\tSTATEMENT\n_-7\tSTATEMENT\n"
+            "_-8\tSTATEMENT\n_-9\tSTATEMENT\n"
+            "O-0\tOBJECT\nO-1\tOBJECT\nO-2\tOBJECT\nO-3\tOBJECT\nO-4\tOBJECT\n"
+            "O-5\tOBJECT\nO-6\tOBJECT\nO-7\tOBJECT\nO-8\tOBJECT\nO-9\tOBJECT\n"
+            "V-0\tVERB\nV-1\tVERB\nV-2\tVERB\nV-3\tVERB\nV-4\tVERB\n"
+            "V-5\tVERB\nV-6\tVERB\nV-7\tVERB\nV-8\tVERB\nV-9\tVERB\n")
+
+
+def setup_function(_) -> None:
+    """Enables the lock order checking."""
+    enable_checking(True)
+
+
+def teardown_function(_) -> None:
+    """Resets the match pool, the clock and the lock order checking."""
+    enable_checking(False)
+    for k in [x for x in Match._registry]:
+        del Match._registry[k]
+    Match._id_counter = 0
+    Clock.reset()
+
+
+def test_declared_order() -> None:
+    """Tests whether a round of a match only locks in the declared order."""
+    before = sum(_LOCK_VIOLATIONS.collect().values())
+    clock = VirtualClock(1000.0)
+    Clock.set_source(clock)
+    match = Match()
+    match.create_deck(card_set)
+    for i in range(3):
+        match.add_participant(Participant("ID%i" % i, "NICK%i" % i))
+    match.put_in_pool()
+    clock.advance(match.get_seconds_to_next_phase() + 1)
+    match.check_timer()
+    assert match.is_choosing()
+    assert sum(_LOCK_VIOLATIONS.collect().values()) == before
+
+
+def test_reversed_order() -> None:
+    """Tests whether locking a match while holding a participant is found."""
+    labels = ("Participant._lock", "Match._lock")
+    before = _LOCK_VIOLATIONS.collect().get(labels, 0)
+    match = Match()
+    match.create_deck(card_set)
+    part = Participant("ID", "NICK")
+    match.add_participant(part)
+    with locked(part, "test_reversed_order"):
+        match.send_message("NICK", "Hello")
+    assert _LOCK_VIOLATIONS.collect().get(labels, 0) == before + 1
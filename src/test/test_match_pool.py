@@ -21,9 +21,11 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
-from typing import Set
+from json import loads
+from typing import List, Optional, Set
 
 from model.match import Match
+from model.registry import MatchRegistry
 from model.participant import Participant
 
 
@@ -115,3 +117,135 @@ def test_get_next_id() -> None:
         new_id = Match.get_next_id()
         assert new_id not in ids
         ids.add(new_id)
+
+
+def test_listing() -> None:
+    """Tests whether the listing follows the matches in the pool."""
+    assert loads(Match.get_listing().decode()) == []
+    match = Match()
+    match.create_deck(card_set)
+    match.add_participant(Participant("ID", "NICK"))
+    match.put_in_pool()
+    listing = loads(Match.get_listing().decode())
+    assert len(listing) == 1
+    assert listing[0]["id"] == match.id
+    assert listing[0]["owner"] == "NICK"
+    assert listing[0]["participants"] == 1
+    assert listing[0]["canJoin"]
+    match.add_participant(Participant("ID2", "NICK2"))
+    listing = loads(Match.get_listing().decode())
+    assert listing[0]["participants"] == 2
+    Match.remove_match(match.id)
+    assert loads(Match.get_listing().decode()) == []
+
+
+def test_listing_cached() -> None:
+    """Tests whether only listing changes invalidate the cached listing."""
+    match = Match()
+    match.put_in_pool()
+    version = Match._registry._version
+    with match._lock:
+        match._publish()
+    assert Match._registry._version == version
+    match.add_participant(Participant("ID", "NICK"))
+    assert Match._registry._version == version + 1
+
+
+def test_listing_page() -> None:
+    """Tests paging through the listing."""
+    for _ in range(5):
+        Match().put_in_pool()
+    ids = []
+    cursor = None
+    while True:
+        page, cursor = Match.get_listing_page(2, cursor)
+        assert len(page) <= 2
+        ids.extend(entry["id"] for entry in page)
+        if cursor is None:
+            break
+    assert ids == [1, 2, 3, 4, 5]
+
+
+def test_listing_page_by_deadline() -> None:
+    """Tests paging through the listing ordered by the deadlines."""
+    matches = [Match() for _ in range(4)]
+    for i, match in enumerate(matches):
+        with match._lock:
+            match._timer = 1000 - i
+            match._publish()
+        match.put_in_pool()
+    page, cursor = Match.get_listing_page(3, by_deadline=True)
+    assert [entry["id"] for entry in page] == [4, 3, 2]
+    page, cursor = Match.get_listing_page(3, cursor, by_deadline=True)
+    assert [entry["id"] for entry in page] == [1]
+    assert cursor is None
+
+
+def test_listing_page_filters() -> None:
+    """Tests filtering the listing by state and participants."""
+    matches = [Match() for _ in range(3)]
+    for i, match in enumerate(matches):
+        match.create_deck(card_set)
+        for k in range(i + 3):
+            match.add_participant(Participant("ID%i-%i" % (i, k), "NICK"))
+        match.put_in_pool()
+    with matches[0]._lock:
+        matches[0]._set_state("CHOOSING")
+    page, _ = Match.get_listing_page(10, state="CHOOSING")
+    assert [entry["id"] for entry in page] == [matches[0].id]
+    page, _ = Match.get_listing_page(10, joinable=True)
+    assert [entry["id"] for entry in page] == [matches[1].id, matches[2].id]
+    page, _ = Match.get_listing_page(10, min_players=4, max_players=4)
+    assert [entry["id"] for entry in page] == [matches[1].id]
+    page, _ = Match.get_listing_page(10, state="ENDING")
+    assert page == []
+
+
+def _page_through(registries: List[MatchRegistry], limit: int,
+                  by_deadline: bool) -> List[List[int]]:
+    """Pages through the merged listing of several registries.
+
+    Args:
+        registries: The registries, one for every worker.
+        limit: The maximum number of matches on a page.
+        by_deadline: Whether the matches are ordered by deadline.
+
+    Returns:
+        The pages, as lists of match IDs.
+    """
+    pages = []  # type: List[List[int]]
+    cursor = None  # type: Optional[str]
+    while True:
+        parts = [registry.get_page(limit, cursor, by_deadline)
+                 for registry in registries]
+        page, cursor = Match.merge_listing_pages(parts, limit, by_deadline)
+        pages.append([entry["id"] for entry in page])
+        if cursor is None:
+            return pages
+
+
+def test_listing_pages_merged() -> None:
+    """Tests merging the listing pages of several workers."""
+    registries = [MatchRegistry(), MatchRegistry()]
+    for i in range(7):
+        match = Match()
+        with match._lock:
+            match._timer = 1000 - i
+            match._publish()
+        registries[match.id % 2].add(match.id, match,
+                                     match.get_snapshot().get_summary())
+    assert _page_through(registries, 3, False) == [[1, 2, 3], [4, 5, 6],
+                                                   [7]]
+    assert _page_through(registries, 3, True) == [[7, 6, 5], [4, 3, 2],
+                                                  [1]]
+    assert _page_through(registries, 7, False) == [[1, 2, 3, 4, 5, 6, 7]]
+
+
+def test_partition_ids() -> None:
+    """Tests restricting new match IDs to a partition."""
+    Match.partition_ids(2, 4)
+    try:
+        ids = [Match.get_next_id() for _ in range(3)]
+    finally:
+        Match.partition_ids(0, 1)
+    assert ids == [6, 10, 14]
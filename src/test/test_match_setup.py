@@ -83,3 +83,54 @@ def test_match_join_leave() -> None:
     match.abandon_participant("ID2")
     assert match.get_num_participants(True) == 0
     assert match.get_num_participants(False) == 0
+
+
+def test_deck_shares_strings() -> None:
+    """Tests whether cards share their type and duplicate texts."""
+    match = Match()
+    success, _ = match.create_deck(card_set + "O-0\tOBJECT\n")
+    assert success
+    objects = match._deck["OBJECT"]
+    assert all(card.type is objects[0].type for card in objects)
+    assert objects[0].text is objects[-1].text
+    assert objects[0].id != objects[-1].id
+
+
+def test_deck_invalid_type() -> None:
+    """Tests whether cards of unknown types are rejected."""
+    match = Match()
+    result = match.create_deck(card_set + "X\tNOUN\n")
+    assert result == (False, "invalid_type")
+
+
+def test_replenish_hands() -> None:
+    """Tests whether all hands are filled when a round starts."""
+    match = Match()
+    match.create_deck(card_set)
+    parts = [Participant("ID%i" % i, "NICK%i" % i) for i in range(4)]
+    for part in parts:
+        match.add_participant(part)
+    with match._lock:
+        match._set_state("CHOOSING")
+    for part in parts:
+        if part.picking:
+            continue
+        hand = part.get_hand()
+        for type in ("OBJECT", "VERB"):
+            ids = [card.id for _, card, _ in hand if card.type == type]
+            assert len(ids) == Participant._HAND_CARDS_PER_TYPE
+            assert len(set(ids)) == len(ids)
+
+
+def test_participants_copy_on_write() -> None:
+    """Tests whether joins and leaves do not affect earlier reads."""
+    match = Match()
+    match.create_deck(card_set)
+    match.add_participant(Participant("ID", "NICK"))
+    parts = match._participants
+    match.add_participant(Participant("ID2", "NICK2"))
+    assert list(parts) == ["ID"]
+    parts = match._participants
+    match.abandon_participant("ID")
+    assert list(parts) == ["ID", "ID2"]
+    assert [part.id for part in match.get_participants()] == ["ID2"]
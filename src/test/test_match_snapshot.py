@@ -0,0 +1,78 @@
+"""Part of KgF.
+
+MIT License
+Copyright (c) 2017-2018 LordKorea
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from model.match import Match
+from model.participant import Participant
+
+
+card_set = ("_-0\tSTATEMENT\n_-1\tSTATEMENT\n_-2\tSTATEMENT\n_-3\tSTATEMENT\n"
+            "_-4\tSTATEMENT\n_-5\tSTATEMENT\n_-6\tSTATEMENT\n_-7\tSTATEMENT\n"
+            "_-8\tSTATEMENT\n_-9\tSTATEMENT\n"
+            "O-0\tOBJECT\nO-1\tOBJECT\nO-2\tOBJECT\nO-3\tOBJECT\nO-4\tOBJECT\n"
+            "O-5\tOBJECT\nO-6\tOBJECT\nO-7\tOBJECT\nO-8\tOBJECT\nO-9\tOBJECT\n"
+            "V-0\tVERB\nV-1\tVERB\nV-2\tVERB\nV-3\tVERB\nV-4\tVERB\n"
+            "V-5\tVERB\nV-6\tVERB\nV-7\tVERB\nV-8\tVERB\nV-9\tVERB\n")
+
+
+def teardown_function(_) -> None:
+    """Resets the match pool."""
+    for k in [x for x in Match._registry]:
+        del Match._registry[k]
+    Match._id_counter = 0
+
+
+def test_snapshot_published() -> None:
+    """Tests whether changes publish a new snapshot."""
+    match = Match()
+    match.create_deck(card_set)
+    snap = match.get_snapshot()
+    assert snap.state == "PENDING" and snap.participants == ()
+    assert snap.get_owner_nick() == "<unknown>"
+    match.add_participant(Participant("ID", "NICK"))
+    assert snap.participants == ()
+    snap = match.get_snapshot()
+    assert [part.id for part in snap.participants] == ["ID"]
+    assert snap.get_owner_nick() == "NICK"
+    assert snap.can_join() and not snap.user_can_skip_phase("ID")
+    match.abandon_participant("ID")
+    assert match.get_snapshot().participants == ()
+
+
+def test_snapshot_round() -> None:
+    """Tests whether a snapshot reflects a started round."""
+    match = Match()
+    match.create_deck(card_set)
+    for i in range(3):
+        match.add_participant(Participant("ID%i" % i, "NICK%i" % i))
+    with match._lock:
+        match._set_state("CHOOSING")
+    snap = match.get_snapshot()
+    assert snap.state == "CHOOSING" and not snap.can_join()
+    assert snap.card is match.current_card
+    assert snap.count_gaps() == 1
+    assert snap.user_can_skip_phase("ID0")
+    assert not snap.user_can_skip_phase("ID1")
+    pickers = [part for part in snap.participants if part.picking]
+    assert len(pickers) == 1
+    orders = sorted(part.order for part in snap.participants)
+    assert orders == [1, 2, 3]
@@ -94,3 +94,57 @@ def test_multideck_no_duplicate() -> None:
     for i in range(deck_n - 1):
         obj = md.request(set())
         assert obj is not None and obj.id != x.id
+
+
+def test_multideck_banned_period() -> None:
+    """Tests the multideck's period when some objects are banned."""
+    md = MultiDeck[MockCard, int](deck)
+    banned = {0, 1, 2}
+    ids = set()
+    for i in range(deck_n - len(banned)):
+        obj = md.request(banned)
+        assert obj is not None and obj.id not in banned
+        ids.add(obj.id)
+    assert len(ids) == deck_n - len(banned)
+
+    # The banned objects are still in the queue and are drawn next
+    for i in range(len(banned)):
+        obj = md.request(set())
+        assert obj is not None and obj.id in banned
+
+
+def test_multideck_refill() -> None:
+    """Tests whether every period contains every object exactly once."""
+    big_deck = [MockCard(i) for i in range(9999)]
+    md = MultiDeck[MockCard, int](big_deck)
+    for period in range(3):
+        ids = set()
+        for i in range(len(big_deck)):
+            obj = md.request(set())
+            assert obj is not None
+            ids.add(obj.id)
+        assert len(ids) == len(big_deck)
+
+
+def test_multideck_request_many() -> None:
+    """Tests drawing hands for multiple requesters at once."""
+    md = MultiDeck[MockCard, int](deck)
+    hands = md.request_many([(deck_n // 4, set()) for i in range(5)])
+    all_ids = set()
+    for hand in hands:
+        ids = set(obj.id for obj in hand)
+        assert len(ids) == deck_n // 4
+        all_ids |= ids
+    assert len(all_ids) == deck_n
+
+
+def test_multideck_request_many_banned() -> None:
+    """Tests whether banned IDs are respected when drawing many objects."""
+    md = MultiDeck[MockCard, int](deck)
+    banned = set(range(deck_n - 3))
+    hands = md.request_many([(5, banned), (0, set()), (1, set())])
+    assert sorted(obj.id for obj in hands[0]) == [deck_n - 3, deck_n - 2,
+                                                  deck_n - 1]
+    assert hands[1] == []
+    assert len(hands[2]) == 1
+    assert len(banned) == deck_n - 3
@@ -0,0 +1,62 @@
+"""Part of KgF.
+
+MIT License
+Copyright (c) 2017-2018 LordKorea
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of
+this software and associated documentation files (the "Software"), to deal in
+the Software without restriction, including without limitation the rights to
+use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+of the Software, and to permit persons to whom the Software is furnished to do
+so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from model.match import Card
+from model.participant import Participant
+
+
+cards = [Card(i, "OBJECT", "O-%i" % i) for i in range(6)]
+
+
+def test_hand_snapshot_shared() -> None:
+    """Tests whether the hand snapshot is only rebuilt on changes."""
+    part = Participant("ID", "NICK")
+    part.add_hand_cards(cards)
+    hand = part.get_hand()
+    assert part.get_hand() is hand
+    assert [card for _, card, _ in hand] == cards
+    assert all(chosen is None for _, _, chosen in hand)
+
+
+def test_hand_snapshot_toggle() -> None:
+    """Tests whether choosing cards replaces the hand snapshot."""
+    part = Participant("ID", "NICK")
+    part.add_hand_cards(cards)
+    old_hand = part.get_hand()
+    old_version = part.hand_version
+    hid = old_hand[2][0]
+    part.toggle_chosen(hid, 1)
+    hand = part.get_hand()
+    assert hand is not old_hand
+    assert part.hand_version > old_version
+    assert old_hand[2][2] is None
+    assert hand[2] == (hid, cards[2], 0)
+
+
+def test_hand_snapshot_delete() -> None:
+    """Tests whether deleting chosen cards replaces the hand snapshot."""
+    part = Participant("ID", "NICK")
+    part.add_hand_cards(cards)
+    part.toggle_chosen(part.get_hand()[0][0], 1)
+    part.delete_chosen()
+    assert [card for _, card, _ in part.get_hand()] == cards[1:]